@@ -0,0 +1,86 @@
+"""
+Embedding Benchmark
+Throughput (texts/sec) of the embedding runtimes on synthetic abstracts of varied length,
+against the previous path (SentenceTransformer.encode, fixed batches of 100), with the
+cosine similarity of each runtime's embeddings to that baseline as the accuracy check.
+
+Usage (from the backend directory):
+    python -m benchmarks.embedding --texts 5000 --workers 4 --out embedding.json
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+import numpy as np
+from services.embedding_service import EmbeddingService, load_model
+from .synthetic import _text
+
+DEFAULT_TEXTS = 2000
+# Abstract lengths vary widely; fixed-size batches pad the short ones to the long ones
+MIN_WORDS, MAX_WORDS = 20, 300
+# Lowest acceptable mean cosine to the baseline
+MIN_MEAN_COSINE = 0.99
+
+def synthetic_texts(n: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [_text(rng, int(w)) for w in rng.integers(MIN_WORDS, MAX_WORDS, n)]
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+def _timed(func, texts: List[str]) -> Dict[str, Any]:
+    func(texts[:32]) # Warm-up (and pool start-up)
+    start = time.perf_counter()
+    embeddings = func(texts)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "texts_per_sec": len(texts) / seconds, "embeddings": embeddings}
+
+def run(n_texts: int, workers: int, backends: List[str]) -> List[Dict[str, Any]]:
+    texts = synthetic_texts(n_texts)
+    model = load_model("torch")
+    baseline = _timed(lambda t: model.encode(t, batch_size=100, show_progress_bar=False), texts)
+    results = [{"runtime": "baseline", "seconds": baseline["seconds"], "texts_per_sec": baseline["texts_per_sec"]}]
+
+    configs = [(backend, 1) for backend in backends]
+    if workers > 1:
+        configs += [(backend, workers) for backend in backends]
+    for backend, n_workers in configs:
+        runtime = f"{backend}, {n_workers} worker{'s' if n_workers > 1 else ''}"
+        try:
+            service = EmbeddingService(backend=backend, workers=n_workers)
+            try:
+                result = _timed(service.generate_embeddings, texts)
+            finally:
+                service.close()
+        except Exception as e:
+            results.append({"runtime": runtime, "error": repr(e)})
+            continue
+        cosine = _cosine(result.pop("embeddings"), baseline["embeddings"])
+        results.append({
+            "runtime": runtime,
+            **result,
+            "speedup": result["texts_per_sec"] / baseline["texts_per_sec"],
+            "mean_cosine": float(cosine.mean()),
+            "min_cosine": float(cosine.min()),
+            "accurate": bool(cosine.mean() >= MIN_MEAN_COSINE),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput and agreement with the baseline")
+    parser.add_argument("--texts", type=int, default=DEFAULT_TEXTS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the pooled runs")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx-int8"])
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps({"texts": args.texts, "results": run(args.texts, args.workers, args.backends)}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
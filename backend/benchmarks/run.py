@@ -0,0 +1,303 @@
+"""
+Benchmark Suite
+Times every /api/* endpoint and the heavy services on synthetic corpora of increasing size
+and reports p50/p95 latency and peak RSS as JSON, so scaling regressions show up before
+they reach production.
+
+Each size runs in its own process against a scratch SQLite database and data directory
+(never the real ones), so RSS figures and module-level caches don't leak between sizes.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --sizes 10000 100000 1000000 --out benchmark.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_REPEATS = 5
+# networkx builders are kept for reference, but don't scale to the largest corpora
+NETWORKX_MAX_PAPERS = 100000
+# Routes with side effects or that only serve operators
+SKIPPED_ROUTES = {"/api/trigger-update", "/api/profile/analyze"}
+SKIPPED_PREFIXES = ("/api/admin",)
+
+class RssSampler(threading.Thread):
+    """Peak resident set size while a benchmark runs, sampled from /proc."""
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self) -> int:
+        self.stopped.set()
+        self.join()
+        return max(self.peak, current_rss())
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # Not Linux: fall back to the process lifetime peak
+        return process_peak_rss()
+
+def process_peak_rss() -> int:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def measure(name: str, kind: str, func: Callable[[], Any], repeats: int) -> Dict[str, Any]:
+    result = {"name": name, "kind": kind, "repeats": repeats}
+    try:
+        func() # Warm-up: imports, caches, SQLite page cache
+        sampler = RssSampler()
+        sampler.start()
+        times = []
+        try:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                func()
+                times.append((time.perf_counter() - start) * 1000)
+        finally:
+            peak = sampler.stop()
+        result.update({
+            "p50_ms": float(np.percentile(times, 50)),
+            "p95_ms": float(np.percentile(times, 95)),
+            "max_ms": float(max(times)),
+            "peak_rss_mb": peak / 2**20,
+        })
+    except Exception as e:
+        logging.exception(f"Benchmark {name} failed")
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def timed_once(name: str, kind: str, func: Callable[[], Any]) -> Dict[str, Any]:
+    """Setup steps (cold cache builds, batch jobs) only run once."""
+    sampler = RssSampler()
+    sampler.start()
+    start = time.perf_counter()
+    result = {"name": name, "kind": kind, "repeats": 1}
+    try:
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        result.update({"p50_ms": elapsed, "p95_ms": elapsed, "max_ms": elapsed})
+    except Exception as e:
+        logging.exception(f"Benchmark {name} failed")
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_mb"] = sampler.stop() / 2**20
+    return result
+
+def configure_scratch(data_dir: str):
+    """
+    Point the database and every data/ path at the scratch directory. Must run before
+    main or any service is imported, since they bind DB_DIR and the engine on import.
+    """
+    from sqlalchemy import create_engine
+    import database
+
+    database.DB_DIR = data_dir
+    database.DATABASE_URL = f"sqlite:///{os.path.join(data_dir, 'conferences.db')}"
+    database.engine = create_engine(database.DATABASE_URL, connect_args={"check_same_thread": False})
+    database.SessionLocal.configure(bind=database.engine)
+
+def prepare_corpus(data_dir: str, n_papers: int, seed: int, reuse: bool) -> Optional[float]:
+    """Generate the synthetic corpus. Returns the generation time, None if an existing one was reused."""
+    from database import Base, engine
+    from .synthetic import populate
+
+    db_path = os.path.join(data_dir, "conferences.db")
+    if reuse and os.path.exists(db_path):
+        return None
+    for name in os.listdir(data_dir):
+        path = os.path.join(data_dir, name)
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    start = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    populate(db_path, n_papers, seed)
+    return time.perf_counter() - start
+
+def service_benchmarks(n_papers: int, repeats: int) -> List[Dict[str, Any]]:
+    from database import SessionLocal
+    from services.discovery_service import search_papers, get_topic_clusters
+    from services.timeseries import build_topic_month_matrix
+    from services.corpus_snapshot import CorpusSnapshot
+    from services.network_service import NetworkService, get_coauthorship_matrix
+    from services.changepoint_service import ChangepointService
+    from services.forecasting_service import ForecastingService
+    from services.keyword_service import cached_matrix
+
+    db = SessionLocal()
+    results = []
+    try:
+        snapshot = CorpusSnapshot.load()
+        topics, months, matrix = snapshot.topic_month_matrix()
+        network = NetworkService()
+        adjacency = get_coauthorship_matrix()
+        light = max(1, repeats // 2)
+
+        results.append(measure("search_papers", "service", lambda: search_papers(db, "transformer attention clinical"), repeats))
+        results.append(measure("get_topic_clusters", "service", lambda: get_topic_clusters(db), repeats))
+        results.append(measure("build_topic_month_matrix", "service", lambda: build_topic_month_matrix(db), repeats))
+        results.append(measure("snapshot.topic_month_matrix", "service", snapshot.topic_month_matrix, repeats))
+        results.append(measure("coauthorship_matrix", "service", lambda: network.coauthorship_matrix(
+            np.asarray(snapshot.author_ptr), np.asarray(snapshot.author_idx)), light))
+        results.append(measure("calculate_influence_metrics_sparse", "service",
+                               lambda: network.calculate_influence_metrics_sparse(adjacency), light))
+        results.append(measure("detect_communities_incremental", "service",
+                               lambda: network.detect_communities_incremental(adjacency), light))
+        if n_papers <= NETWORKX_MAX_PAPERS:
+            rows, authors = snapshot.paper_author_pairs()
+            papers = [{"authors": []} for _ in range(len(snapshot))]
+            for row, author in zip(rows.tolist(), authors.tolist()):
+                papers[row]["authors"].append(str(author))
+            results.append(measure("build_coauthorship_graph", "service", lambda: network.build_coauthorship_graph(papers), light))
+            graph = network.build_coauthorship_graph(papers)
+            results.append(measure("calculate_influence_metrics", "service", lambda: network.calculate_influence_metrics(graph), light))
+        results.append(measure("detect_changepoints_batch", "service",
+                               lambda: ChangepointService().detect_changepoints_batch(matrix, months, topics), light))
+        results.append(measure("detect_crossovers_all_pairs", "service",
+                               lambda: ChangepointService().detect_crossovers_all_pairs(matrix, months, topics), light))
+        results.append(measure("forecast_topics_batch", "service",
+                               lambda: ForecastingService().forecast_topics_batch(matrix, months, topics), light))
+        keywords = cached_matrix()
+        results.append(measure("emerging_keywords", "service", lambda: keywords.emerging(limit=50), repeats))
+    finally:
+        db.close()
+    return results
+
+def endpoint_benchmarks(repeats: int) -> List[Dict[str, Any]]:
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # Without the context manager, startup events (the scheduler) don't run
+    client = TestClient(app)
+    params = {"author_id": 1, "paper_id": 1, "run_id": 1}
+    bodies = {"/api/search": {"query": "transformer attention clinical", "limit": 20}}
+    results = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or not route.path.startswith("/api"):
+            continue
+        if route.path in SKIPPED_ROUTES or route.path.startswith(SKIPPED_PREFIXES):
+            continue
+        method = "POST" if "POST" in route.methods and route.path in bodies else "GET"
+        if method not in route.methods:
+            continue
+        url = route.path.format(**params)
+
+        def call(url=url, method=method, body=bodies.get(route.path)):
+            response = client.request(method, url, json=body)
+            response.raise_for_status()
+
+        results.append(measure(f"{method} {route.path}", "endpoint", call, repeats))
+    return results
+
+def run_size(n_papers: int, seed: int, data_dir: str, repeats: int, reuse: bool) -> Dict[str, Any]:
+    os.makedirs(data_dir, exist_ok=True)
+    configure_scratch(data_dir)
+    generated = prepare_corpus(data_dir, n_papers, seed, reuse)
+
+    import database
+    from database import init_db
+    from services.corpus_snapshot import run_snapshot_update
+    from services.network_service import update_coauthorship_cache, run_influence_metrics, update_communities
+    from services.changepoint_service import run_changepoint_detection
+    from services.forecasting_service import run_batch_forecasting
+    from services.keyword_service import update_keywords
+
+    def build_keywords():
+        db = database.SessionLocal()
+        try:
+            return update_keywords(db, 0, n_papers) # Synthetic ids are 1..n_papers
+        finally:
+            db.close()
+
+    init_db()
+    # Cold builds of the derived stores the endpoints read, timed once
+    results = [
+        timed_once("snapshot_update (cold)", "job", run_snapshot_update),
+        timed_once("coauthorship_cache (cold)", "job", update_coauthorship_cache),
+        timed_once("influence_metrics", "job", run_influence_metrics),
+        timed_once("communities (full)", "job", lambda: update_communities(full=True)),
+        timed_once("changepoint_detection", "job", run_changepoint_detection),
+        timed_once("batch_forecasting", "job", run_batch_forecasting),
+        timed_once("keyword_counts (cold)", "job", build_keywords),
+    ]
+    results += service_benchmarks(n_papers, repeats)
+    results += endpoint_benchmarks(repeats)
+    return {
+        "n_papers": n_papers,
+        "seed": seed,
+        "generate_seconds": generated,
+        "max_rss_mb": process_peak_rss() / 2**20,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API and services on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Corpus sizes in papers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "conference-tracker-bench"),
+                        help="Scratch directory for the generated databases")
+    parser.add_argument("--reuse", action="store_true", help="Reuse previously generated corpora of the same size")
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.child:
+        size = args.sizes[0]
+        data_dir = os.path.join(args.workdir, f"papers_{size}_seed_{args.seed}")
+        report = run_size(size, args.seed, data_dir, args.repeats, args.reuse)
+        with open(args.out, "w") as f:
+            json.dump(report, f)
+        return
+
+    runs = []
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            child_out = f.name
+        command = [sys.executable, "-m", "benchmarks.run", "--child", "--sizes", str(size), "--seed", str(args.seed),
+                   "--repeats", str(args.repeats), "--workdir", args.workdir, "--out", child_out]
+        if args.reuse:
+            command.append("--reuse")
+        print(f"Benchmarking {size} papers...", file=sys.stderr)
+        completed = subprocess.run(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if completed.returncode == 0:
+            with open(child_out) as f:
+                runs.append(json.load(f))
+        else:
+            runs.append({"n_papers": size, "seed": args.seed, "error": f"exited with {completed.returncode}"})
+        os.remove(child_out)
+
+    report = json.dumps({
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "runs": runs,
+    }, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Serialization Benchmark
+Per-row cost of building a list response, comparing the entity path list endpoints used to
+take (hydrate Paper entities, build Pydantic DTOs, jsonable_encoder, json.dumps) with the
+projection path (select the returned columns, dicts from row tuples, orjson).
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization --rows 1000 10000 --out serialization.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from database import Base, Paper
+from services.responses import FastJSONResponse
+from .run import configure_scratch
+from .synthetic import populate
+
+DEFAULT_ROWS = [100, 1000, 10000]
+DEFAULT_REPEATS = 7
+
+def _per_row_us(func: Callable[[], Any], rows: int, repeats: int) -> Dict[str, float]:
+    func() # Warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"p50_us_per_row": float(np.percentile(times, 50)) * 1e6 / rows,
+            "p95_us_per_row": float(np.percentile(times, 95)) * 1e6 / rows}
+
+def run(rows_list: List[int], repeats: int) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # Before main is imported: it initializes the configured database
+        configure_scratch(workdir)
+        import database
+        from main import ArticleDTO
+
+        Base.metadata.create_all(database.engine)
+        populate(os.path.join(workdir, "conferences.db"), max(rows_list))
+        db = database.SessionLocal()
+        try:
+            for n in rows_list:
+                def query_entities():
+                    db.expunge_all() # Hydrate fresh entities every run, as a new request would
+                    return db.query(Paper).order_by(Paper.published_date.desc()).limit(n).all()
+
+                def query_columns():
+                    return db.query(Paper.title, Paper.venue, Paper.published_date, Paper.source).order_by(
+                        Paper.published_date.desc()).limit(n).all()
+
+                def serialize_entities(papers):
+                    dtos = [ArticleDTO(title=p.title, venue=p.venue, published_date=p.published_date, source=p.source) for p in papers]
+                    return JSONResponse(jsonable_encoder(dtos)).body
+
+                def serialize_columns(rows):
+                    return FastJSONResponse([{"title": t, "venue": v, "published_date": d, "source": s}
+                                             for t, v, d, s in rows]).body
+
+                entities, columns = query_entities(), query_columns()
+                assert json.loads(serialize_entities(entities)) == json.loads(serialize_columns(columns))
+                results.append({
+                    "rows": n,
+                    "before": {
+                        "total": _per_row_us(lambda: serialize_entities(query_entities()), n, repeats),
+                        "serialize": _per_row_us(lambda: serialize_entities(entities), n, repeats),
+                    },
+                    "after": {
+                        "total": _per_row_us(lambda: serialize_columns(query_columns()), n, repeats),
+                        "serialize": _per_row_us(lambda: serialize_columns(columns), n, repeats),
+                    },
+                })
+        finally:
+            db.close()
+            database.engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list response serialization per row")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Page sizes")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps({"results": run(args.rows, args.repeats)}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
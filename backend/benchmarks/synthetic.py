@@ -0,0 +1,97 @@
+"""
+Synthetic Corpus
+Deterministic generator of papers, authors, categories and dates shaped like the collected
+data: Zipf-distributed category and author popularity, 1-8 authors per paper and yearly
+growth in publication volume. The same (n_papers, seed) always produces the same corpus.
+"""
+import sqlite3
+from datetime import date, timedelta
+from typing import Iterator, List, Tuple
+import numpy as np
+from services.abstract_store import compress, make_preview
+
+CATEGORIES = [
+    "cs.LG", "cs.AI", "cs.CV", "cs.CL", "stat.ML", "cs.RO", "cs.IR", "cs.NE", "cs.CR", "cs.HC",
+    "eess.IV", "eess.SP", "q-bio.QM", "physics.med-ph", "math.OC", "Medical AI",
+]
+VENUES = ["NEURIPS", "ICML", "ICLR", "CVPR", "ACL", "EMNLP", None, None, None, None]
+VOCABULARY = (
+    "learning deep neural network model transformer attention graph diffusion generative "
+    "language vision clinical medical patient drug prescription error detection prediction "
+    "time series longitudinal reinforcement policy robust adversarial federated privacy "
+    "retrieval augmented embedding contrastive self supervised benchmark dataset evaluation "
+    "segmentation classification regression causal inference bayesian uncertainty optimization "
+    "sparse efficient scalable multimodal representation knowledge reasoning agent planning"
+).split()
+
+START = date(2015, 1, 1)
+DAYS = (date(2025, 12, 31) - START).days
+CHUNK = 50000
+
+def _dates(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Quadratic density: later years publish more, like the real corpus
+    return (DAYS * np.sqrt(rng.random(n))).astype(np.int64)
+
+def _text(rng: np.random.Generator, n_words: int) -> str:
+    return " ".join(VOCABULARY[i] for i in rng.integers(0, len(VOCABULARY), n_words))
+
+def generate_papers(n_papers: int, seed: int = 0) -> Iterator[List[Tuple]]:
+    """Chunks of papers rows: (id, source, external_id, doi, title, abstract, published_date, categories, venue, journal_ref)."""
+    rng = np.random.default_rng(seed)
+    category_weights = 1.0 / np.arange(1, len(CATEGORIES) + 1)
+    category_weights /= category_weights.sum()
+    for start in range(0, n_papers, CHUNK):
+        n = min(CHUNK, n_papers - start)
+        days = _dates(rng, n)
+        n_categories = rng.integers(1, 4, n)
+        categories = rng.choice(len(CATEGORIES), size=(n, 3), p=category_weights)
+        venues = rng.integers(0, len(VENUES), n)
+        rows = []
+        for i in range(n):
+            paper_id = start + i + 1
+            source = "pubmed" if categories[i, 0] == len(CATEGORIES) - 1 else "arxiv"
+            external_id = f"PMID:{paper_id}" if source == "pubmed" else f"http://arxiv.org/abs/{paper_id:09d}v1"
+            cats = ", ".join(dict.fromkeys(CATEGORIES[c] for c in categories[i, :n_categories[i]]))
+            rows.append((
+                paper_id, source, external_id, f"10.5555/synthetic.{paper_id}",
+                _text(rng, 8).capitalize(), _text(rng, 120),
+                (START + timedelta(days=int(days[i]))).isoformat(),
+                cats, VENUES[venues[i]], None
+            ))
+        yield rows
+
+def generate_authorships(n_papers: int, n_authors: int, seed: int = 0) -> Iterator[List[Tuple[int, int]]]:
+    """Chunks of (paper_id, author_id); a few prolific authors, a long tail of occasional ones."""
+    rng = np.random.default_rng(seed + 1)
+    for start in range(0, n_papers, CHUNK):
+        n = min(CHUNK, n_papers - start)
+        counts = rng.integers(1, 9, n)
+        papers = np.repeat(np.arange(start + 1, start + n + 1), counts)
+        authors = (rng.zipf(1.3, len(papers)) - 1) % n_authors + 1
+        # Drop repeated authors within a paper
+        pairs = np.unique(np.stack([papers, authors], axis=1), axis=0)
+        yield [(int(p), int(a)) for p, a in pairs]
+
+def populate(db_path: str, n_papers: int, seed: int = 0):
+    """Fill an empty database (schema already created) with a synthetic corpus."""
+    n_authors = max(n_papers // 2, 1)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        for rows in generate_papers(n_papers, seed):
+            conn.executemany(
+                "INSERT INTO papers (id, source, external_id, doi, title, abstract_preview, published_date, categories, venue, journal_ref, citation_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)", [row[:5] + (make_preview(row[5]),) + row[6:] for row in rows])
+            conn.executemany("INSERT INTO paper_abstracts (paper_id, data) VALUES (?, ?)",
+                             [(row[0], compress(row[5])) for row in rows])
+            conn.executemany("INSERT INTO paper_search (rowid, abstract) VALUES (?, ?)", [(row[0], row[5]) for row in rows])
+        for start in range(0, n_authors, CHUNK):
+            conn.executemany(
+                "INSERT INTO authors (id, name, normalized_name, citation_count) VALUES (?, ?, ?, 0)",
+                [(a, f"Author {a}", f"author {a}") for a in range(start + 1, min(start + CHUNK, n_authors) + 1)])
+        for pairs in generate_authorships(n_papers, n_authors, seed):
+            conn.executemany("INSERT INTO paper_authors (paper_id, author_id) VALUES (?, ?)", pairs)
+        conn.commit()
+    finally:
+        conn.close()
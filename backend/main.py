@@ -1,6 +1,7 @@
-from fastapi import FastAPI, BackgroundTasks, Depends
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -11,16 +12,39 @@ import os
 load_dotenv()
 
 # Import DB and Services
-from database import init_db, get_db, Paper, Author, SessionLocal
-from services.scheduler import start_scheduler, run_manual_update
+from database import init_db, get_db, Paper, Author, SessionLocal, paper_authors
+from services.scheduler import start_scheduler, stop_scheduler
+from services import jobs
+from services.metrics import metrics_middleware, render_metrics, clear_multiprocess_dir, CONTENT_TYPE_LATEST
+from services import profiling
+from services import http_cache
+from services.timeseries import year_of
+from services.responses import FastJSONResponse, MAX_PAGE_SIZE
 
 app = FastAPI(title="Conference Trend Tracker API")
 
 # Initialize DB
 init_db()
 
-# Start Scheduler
-start_scheduler()
+# Start Scheduler on startup rather than import, so importing the app (tests, job worker
+# processes) doesn't schedule anything. Every API worker starts one, but only the
+# holder of the DB lease actually runs jobs.
+@app.on_event("startup")
+def on_startup():
+    # Before the scheduler and job pools start their workers
+    clear_multiprocess_dir()
+    init_user_tokens()
+    db = SessionLocal()
+    try:
+        jobs.fail_orphaned_runs(db)
+    finally:
+        db.close()
+    start_scheduler()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    stop_scheduler()
+    jobs.shutdown()
 
 # Enable CORS for the frontend
 app.add_middleware(
@@ -31,6 +55,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETags and 304s for the dashboard aggregates; inside the metrics middleware, so 304s are measured too
+app.middleware("http")(http_cache.conditional_get_middleware)
+# Per-route latency and SQL statement counts/time per request
+app.middleware("http")(metrics_middleware)
+# Opt-in handler profiling (X-Profile header or sampled), see /api/admin/profiles
+app.middleware("http")(profiling.profiling_middleware)
+# Outermost: compresses the final body (responses already brotli-encoded pass through)
+app.add_middleware(GZipMiddleware, minimum_size=http_cache.COMPRESS_MIN_BYTES)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics, aggregated across API and job worker processes."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 class ArticleDTO(BaseModel):
     title: str
     venue: Optional[str] = None
@@ -54,12 +92,17 @@ def read_root():
     return {"status": "ok", "message": "Trend Tracker API is running with Scheduler"}
 
 @app.get("/api/trigger-update")
-async def trigger_update(background_tasks: BackgroundTasks):
+def trigger_update(db: Session = Depends(get_db)):
     """
     Manually trigger data collection pipeline (FR-1.3.1)
+    Returns the job to poll at /api/jobs/{job_id}; repeated triggers join the active one.
     """
-    background_tasks.add_task(run_manual_update)
-    return {"message": "Data collection triggered in background"}
+    run, created = jobs.submit(db, "manual_update")
+    return {
+        "message": "Data collection triggered in background" if created else "Data collection already in progress",
+        "job_id": run.id,
+        "status": run.status
+    }
 
 @app.get("/api/trends", response_model=List[TrendData])
 def get_trends(db: Session = Depends(get_db)):
@@ -68,16 +111,13 @@ def get_trends(db: Session = Depends(get_db)):
     Aggregates papers by Year and Category (Topic).
     """
     # Aggregate by Year and Category
-    # SQLite doesn't have a simple 'year' extraction in common SQL across dialects easily without func, 
-    # but for SQLite we can use strftime or just fetch and process in python if dataset is small.
-    # Given we might have many papers later, SQL is better. 
-    # SQLite: strftime('%Y', published_date)
-    
+    # year_of is portable across SQLite and Postgres (EXTRACT / strftime)
+    year = year_of(Paper.published_date).label('year')
     results = db.query(
-        func.strftime('%Y', Paper.published_date).label('year'),
+        year,
         Paper.categories,
         func.count(Paper.id).label('count')
-    ).group_by('year', Paper.categories).all()
+    ).group_by(year, Paper.categories).all()
     
     data = []
     for r in results:
@@ -96,44 +136,41 @@ def get_trends(db: Session = Depends(get_db)):
     return data
 
 @app.get("/api/papers", response_model=List[ArticleDTO])
-def get_papers(db: Session = Depends(get_db)):
-    papers = db.query(Paper).order_by(Paper.published_date.desc()).limit(20).all()
-    return [
-        ArticleDTO(
-            title=p.title,
-            venue=p.venue,
-            published_date=p.published_date,
-            source=p.source
-        ) for p in papers
-    ]
+def get_papers(limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    # Only the returned columns, serialized straight from the row tuples
+    rows = db.query(Paper.title, Paper.venue, Paper.published_date, Paper.source).order_by(
+        Paper.published_date.desc()
+    ).limit(limit).all()
+    return FastJSONResponse([
+        {"title": title, "venue": venue, "published_date": published_date, "source": source}
+        for title, venue, published_date, source in rows
+    ])
 
 @app.get("/api/authors", response_model=List[AuthorDTO])
-def get_authors(db: Session = Depends(get_db)):
+def get_authors(sort_by: str = "papers", limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
     """
-    Get top authors by paper count.
+    Get top authors by paper count, or by influence score with sort_by=influence.
     """
-    # Join Author with Paper to count
-    # We want to select Author and count(Paper)
-    # This requires a join through the association table 'paper_authors' implicitly handled by relationship
-    
-    # However, doing a simple sort in python is easier for MVP if the authors table isn't huge.
-    # Or proper SQL query:
-    
-    authors = db.query(Author).all()
-    
-    # Sort by paper count
-    # This is inefficient for large DB, but fine for MVP.
-    sorted_authors = sorted(authors, key=lambda a: len(a.papers), reverse=True)[:50]
-    
-    return [
-        AuthorDTO(
-            id=a.id,
-            name=a.name,
-            paper_count=len(a.papers),
-            citations=0, # Placeholder until citations logic is added
-            influence_score=0.0 # Placeholder
-        ) for a in sorted_authors
-    ]
+    paper_count = func.count(paper_authors.c.paper_id).label('paper_count')
+    query = db.query(
+        Author.id, Author.name, paper_count, Author.citation_count, Author.influence_score
+    ).outerjoin(paper_authors, paper_authors.c.author_id == Author.id).group_by(Author.id)
+
+    if sort_by == "influence":
+        # Influence scores are precomputed by the scheduled network job (FR-4.1.2)
+        query = query.order_by(func.coalesce(Author.influence_score, 0).desc(), Author.id)
+    else:
+        query = query.order_by(paper_count.desc(), Author.id)
+
+    return FastJSONResponse([
+        {
+            "id": author_id,
+            "name": name,
+            "paper_count": count,
+            "citations": citations or 0,
+            "influence_score": influence or 0.0
+        } for author_id, name, count, citations, influence in query.limit(limit).all()
+    ])
 
 @app.get("/api/stats")
 def get_stats(db: Session = Depends(get_db)):
@@ -152,18 +189,29 @@ def get_stats(db: Session = Depends(get_db)):
         "total_topics": unique_categories
     }
 
-from services.profile_service import get_profile, update_profile, analyze_profile
+from services.profile_service import get_profile, update_profile, analyze_profile, user_key, issue_user_token, init_user_tokens
 
 # ... existing code ...
 
+def current_user(request: Request) -> str:
+    user = user_key(request)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid user token")
+    return user
+
+@app.post("/api/session")
+def create_session():
+    """A new user identity; send the token back in the X-User-Token header."""
+    return {"token": issue_user_token()}
+
 class ProfileDTO(BaseModel):
     name: str = ""
     title: str = ""
     proposal: str = ""
 
 @app.get("/api/profile")
-def read_profile(db: Session = Depends(get_db)):
-    profile = get_profile(db)
+def read_profile(user: str = Depends(current_user), db: Session = Depends(get_db)):
+    profile = get_profile(db, user)
     if not profile:
         return {"name": "", "title": "", "proposal": "", "trajectory": "", "suggested_conferences": [], "suggested_papers": []}
     
@@ -178,23 +226,24 @@ def read_profile(db: Session = Depends(get_db)):
     }
 
 @app.post("/api/profile")
-def save_profile(dto: ProfileDTO, db: Session = Depends(get_db)):
-    profile = update_profile(db, dto.name, dto.title, dto.proposal)
+def save_profile(dto: ProfileDTO, user: str = Depends(current_user), db: Session = Depends(get_db)):
+    profile = update_profile(db, dto.name, dto.title, dto.proposal, user)
+    if profile.embedding is None:
+        # Recommendations for the new text, without waiting for the next collection
+        jobs.submit(db, "recommendation_refresh")
     return {"status": "success", "id": profile.id}
 
 @app.post("/api/profile/analyze")
-def trigger_analysis(db: Session = Depends(get_db)):
-    profile = get_profile(db)
+def trigger_analysis(user: str = Depends(current_user), db: Session = Depends(get_db)):
+    """
+    Analyze the profile in the background; the result is the job's result at /api/jobs/{job_id}.
+    """
+    profile = get_profile(db, user)
     if not profile:
         return {"error": "Profile not found"}
     
-    updated_profile = analyze_profile(db, profile.id)
-    import json
-    return {
-        "trajectory": updated_profile.trajectory,
-        "suggested_conferences": json.loads(updated_profile.suggested_conferences) if updated_profile.suggested_conferences else [],
-        "suggested_papers": json.loads(updated_profile.suggested_papers) if updated_profile.suggested_papers else []
-    }
+    run, _ = jobs.submit(db, "profile_analysis", {"profile_id": profile.id}, user=user)
+    return {"job_id": run.id, "status": run.status}
 
 # ============================================================================
 # RESEARCH DISCOVERY ENDPOINTS
@@ -206,13 +255,13 @@ from services.discovery_service import (
 
 class SearchQuery(BaseModel):
     query: str
-    limit: int = 20
+    limit: int = Field(20, ge=1, le=MAX_PAGE_SIZE)
 
 @app.post("/api/search")
 def api_search_papers(body: SearchQuery, db: Session = Depends(get_db)):
     """Semantic search for papers based on query."""
     results = search_papers(db, body.query, body.limit)
-    return {"results": results, "count": len(results)}
+    return FastJSONResponse({"results": results, "count": len(results)})
 
 @app.get("/api/topics/clusters")
 def api_topic_clusters(db: Session = Depends(get_db)):
@@ -221,16 +270,16 @@ def api_topic_clusters(db: Session = Depends(get_db)):
     return {"topics": clusters}
 
 @app.get("/api/research/insights")
-def api_research_insights(db: Session = Depends(get_db)):
+def api_research_insights(user: str = Depends(current_user), db: Session = Depends(get_db)):
     """Get AI-powered research insights based on collected data and user profile."""
-    insights = get_research_insights(db)
+    insights = get_research_insights(db, user)
     return insights
 
 @app.get("/api/research/recommended")
-def api_recommended_papers(db: Session = Depends(get_db)):
+def api_recommended_papers(user: str = Depends(current_user), db: Session = Depends(get_db)):
     """Get papers recommended for the user based on their profile."""
-    papers = get_recommended_papers(db)
-    return {"papers": papers}
+    papers = get_recommended_papers(db, user=user)
+    return FastJSONResponse({"papers": papers})
 
 @app.get("/api/research/trends")
 def api_trend_analysis(db: Session = Depends(get_db)):
@@ -238,6 +287,352 @@ def api_trend_analysis(db: Session = Depends(get_db)):
     analysis = get_trend_analysis(db)
     return analysis
 
+# ============================================================================
+# ANALYTICS ENDPOINTS
+# ============================================================================
+from database import TopicChangepoint, TopicEvent, TopicForecast
+from services.data_version import get_data_version
+from services.keyword_service import cached_matrix, RECENT_MONTHS, BASELINE_MONTHS, MIN_RECENT_PAPERS
+
+@app.get("/api/changepoints")
+def api_changepoints(topic: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Get stored changepoints (FR-3.1.1), computed by the scheduled batch detection.
+    """
+    query = db.query(TopicChangepoint)
+    if topic:
+        query = query.filter(TopicChangepoint.topic == topic)
+    rows = query.order_by(TopicChangepoint.topic, TopicChangepoint.date).all()
+
+    return {
+        "data_version": get_data_version(),
+        "computed_version": max((r.data_version for r in rows), default=None),
+        "changepoints": [{
+            "topic": r.topic,
+            "date": r.date.isoformat() if r.date else None,
+            "type": r.type,
+            "p_value": r.p_value,
+            "mean_before": r.mean_before,
+            "mean_after": r.mean_after
+        } for r in rows]
+    }
+
+@app.get("/api/crossovers")
+def api_crossovers(min_magnitude: float = Query(1.0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                   db: Session = Depends(get_db)):
+    """
+    Paradigm shift detection (FR-3.1.3): crossover events between every pair of topics.
+    """
+    from services.changepoint_service import ChangepointService
+    from services.timeseries import cached_topic_month_matrix
+
+    topics, months, matrix = cached_topic_month_matrix(db)
+    crossovers = ChangepointService().detect_crossovers_all_pairs(matrix, months, topics, min_magnitude=min_magnitude)
+    crossovers.sort(key=lambda c: c["date"], reverse=True)
+    return {
+        "crossovers": [{**c, "date": c["date"].date().isoformat(), "magnitude": float(c["magnitude"])} for c in crossovers[:limit]],
+        "count": len(crossovers)
+    }
+
+@app.get("/api/changepoints/emerging")
+def api_emerging_events(limit: int = 50, db: Session = Depends(get_db)):
+    """
+    Get the latest Emergence/Explosion events flagged by the online detector at ingest time.
+    """
+    events = db.query(TopicEvent).order_by(TopicEvent.date.desc()).limit(limit).all()
+    return {
+        "events": [{
+            "topic": e.topic,
+            "date": e.date.isoformat() if e.date else None,
+            "type": e.type,
+            "mean_before": e.mean_before,
+            "mean_after": e.mean_after,
+            "detected_at": e.detected_at.isoformat() if e.detected_at else None
+        } for e in events]
+    }
+
+@app.get("/api/keywords/emerging")
+def api_emerging_keywords(limit: int = 50, recent_months: int = RECENT_MONTHS, baseline_months: int = BASELINE_MONTHS,
+                          min_papers: int = MIN_RECENT_PAPERS):
+    """
+    Terms whose share of papers spiked in the last recent_months against the baseline_months before.
+    """
+    matrix = cached_matrix()
+    if matrix is None:
+        return {"error": "Keyword counts have not been built yet"}
+    months = matrix.months()
+    return {
+        "data_version": get_data_version(),
+        "recent": months[-recent_months:],
+        "keywords": matrix.emerging(min(limit, MAX_PAGE_SIZE), recent_months, baseline_months, min_papers)
+    }
+
+@app.get("/api/forecasts")
+def api_forecasts(topic: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Get stored topic forecasts with prediction intervals (FR-3.2.1), computed nightly.
+    """
+    query = db.query(TopicForecast)
+    if topic:
+        query = query.filter(TopicForecast.topic == topic)
+    rows = query.order_by(TopicForecast.topic, TopicForecast.date).all()
+
+    forecasts = {}
+    for r in rows:
+        forecasts.setdefault(r.topic, []).append({
+            "date": r.date.isoformat(),
+            "value": r.value,
+            "lower": r.lower,
+            "upper": r.upper
+        })
+    return {
+        "data_version": get_data_version(),
+        "computed_version": max((r.data_version for r in rows), default=None),
+        "forecasts": [{"topic": t, "points": points} for t, points in forecasts.items()]
+    }
+
+@app.get("/api/jobs/history")
+def api_job_history(request: Request, job_id: Optional[str] = None, limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                    db: Session = Depends(get_db)):
+    """
+    Recent job runs, scheduled and on demand, with status and duration. Admin only: it lists every user's runs.
+    """
+    from database import JobRun
+    if not profiling.is_admin(request):
+        return _forbidden()
+    query = db.query(JobRun)
+    if job_id:
+        query = query.filter(JobRun.job_id == job_id)
+    runs = query.order_by(JobRun.started_at.desc()).limit(limit).all()
+    return {
+        "runs": [{
+            "id": r.id,
+            "job_id": r.job_id,
+            "status": r.status,
+            "started_at": r.started_at.isoformat() if r.started_at else None,
+            "finished_at": r.finished_at.isoformat() if r.finished_at else None,
+            "duration_seconds": r.duration_seconds,
+            "error": r.error,
+            "worker": r.worker
+        } for r in runs]
+    }
+
+class JobSubmitDTO(BaseModel):
+    job_id: str
+    params: Optional[dict] = None
+
+@app.post("/api/jobs")
+def api_submit_job(body: JobSubmitDTO, request: Request, user: str = Depends(current_user), db: Session = Depends(get_db)):
+    """
+    Run a registered job (e.g. topic_retraining) on demand. Returns the new or already active run.
+    """
+    if not profiling.is_admin(request):
+        return _forbidden()
+    try:
+        run, created = jobs.submit(db, body.job_id, body.params, user=user)
+    except KeyError:
+        return {"error": f"Unknown job {body.job_id}"}
+    return {"created": created, "job": jobs.serialize_run(run)}
+
+@app.get("/api/jobs/{run_id}")
+def api_job_status(run_id: int, request: Request, user: str = Depends(current_user), db: Session = Depends(get_db)):
+    """
+    Status, progress, result and timing of a job run. Another user's runs are not found.
+    """
+    from database import JobRun
+    admin = profiling.is_admin(request)
+    run = db.get(JobRun, run_id)
+    if run is None or not jobs.can_read(run, user, admin):
+        return {"error": "Job not found"}
+    return jobs.serialize_run(run, details=admin)
+
+@app.get("/api/pipeline")
+def api_pipeline(runs: int = 5, db: Session = Depends(get_db)):
+    """
+    Post-ingest pipeline: per-stage checkpoints and the stages of the most recent runs.
+    """
+    from database import PipelineCheckpoint, PipelineStageRun
+    from services.pipeline import STAGES
+    checkpoints = {c.stage: c for c in db.query(PipelineCheckpoint).all()}
+    run_ids = [r for (r,) in db.query(PipelineStageRun.run_id).group_by(PipelineStageRun.run_id).order_by(
+        func.max(PipelineStageRun.started_at).desc()
+    ).limit(runs).all()]
+    stage_runs = db.query(PipelineStageRun).filter(PipelineStageRun.run_id.in_(run_ids)).order_by(PipelineStageRun.id).all()
+    return {
+        "stages": [{
+            "name": s.name,
+            "depends_on": list(s.depends_on),
+            "last_paper_id": checkpoints[s.name].last_paper_id if s.name in checkpoints else 0,
+            "updated_at": checkpoints[s.name].updated_at.isoformat() if s.name in checkpoints else None
+        } for s in STAGES],
+        "runs": [{
+            "run_id": run_id,
+            "stages": [{
+                "stage": r.stage,
+                "status": r.status,
+                "since_paper_id": r.since_paper_id,
+                "until_paper_id": r.until_paper_id,
+                "rows": r.rows,
+                "started_at": r.started_at.isoformat() if r.started_at else None,
+                "duration_seconds": r.duration_seconds,
+                "error": r.error
+            } for r in stage_runs if r.run_id == run_id]
+        } for run_id in run_ids]
+    }
+
+# ============================================================================
+# NETWORK ENDPOINTS
+# ============================================================================
+from database import paper_authors, ResearchCommunity
+from services.network_service import MAX_SUBGRAPH_NODES
+
+@app.get("/api/network")
+def api_network(top_nodes: int = Query(100, ge=1, le=MAX_SUBGRAPH_NODES), max_edges: int = Query(500, ge=0, le=MAX_PAGE_SIZE),
+                min_weight: int = Query(1, ge=1), db: Session = Depends(get_db)):
+    """
+    Co-authorship network (FR-4.1.1) restricted to the most connected authors.
+    Served from the cached sparse adjacency, which is updated after every ingest.
+    """
+    from services.network_service import get_coauthorship_matrix, top_subgraph
+
+    nodes, strength, edges, weights = top_subgraph(get_coauthorship_matrix(), top_nodes, max_edges, min_weight)
+    node_ids = [int(n) for n in nodes]
+
+    names = dict(db.query(Author.id, Author.name).filter(Author.id.in_(node_ids)).all()) if node_ids else {}
+    paper_counts = dict(db.query(paper_authors.c.author_id, func.count(paper_authors.c.paper_id)).filter(
+        paper_authors.c.author_id.in_(node_ids)
+    ).group_by(paper_authors.c.author_id).all()) if node_ids else {}
+
+    return {
+        "nodes": [{
+            "id": n,
+            "name": names.get(n, ""),
+            "paper_count": paper_counts.get(n, 0),
+            "weighted_degree": int(s)
+        } for n, s in zip(node_ids, strength)],
+        "edges": [{"source": int(u), "target": int(v), "weight": int(w)} for (u, v), w in zip(edges, weights)]
+    }
+
+@app.get("/api/network/ego/author/{author_id}")
+def api_author_ego_network(author_id: int, hops: int = 2, max_nodes: int = 200, min_weight: int = 1, db: Session = Depends(get_db)):
+    """
+    k-hop co-authorship neighborhood of one author, for expanding the Network page around a node.
+    """
+    from services.network_service import get_coauthorship_matrix, ego_network
+
+    author = db.query(Author.id, Author.name).filter(Author.id == author_id).first()
+    if not author:
+        return {"error": "Author not found"}
+
+    distance, edges, truncated = ego_network(get_coauthorship_matrix(), author_id, min(hops, 3), min(max_nodes, MAX_SUBGRAPH_NODES), min_weight)
+    distance = distance or {author_id: 0}
+    names = dict(db.query(Author.id, Author.name).filter(Author.id.in_(list(distance))).all())
+    return {
+        "center": author_id,
+        "truncated": truncated,
+        "nodes": [{"id": n, "name": names.get(n, ""), "hops": d} for n, d in distance.items()],
+        "edges": [{"source": u, "target": v, "weight": int(w)} for u, v, w in edges]
+    }
+
+@app.get("/api/network/ego/paper/{paper_id}")
+def api_paper_ego_network(paper_id: int, hops: int = 1, max_nodes: int = 200, db: Session = Depends(get_db)):
+    """
+    k-hop citation neighborhood of one paper (citing and cited papers). Edges point from citing to cited.
+    """
+    from services.network_service import get_citation_matrix, get_cited_by_matrix, ego_network
+
+    paper = db.query(Paper.id).filter(Paper.id == paper_id).first()
+    if not paper:
+        return {"error": "Paper not found"}
+
+    distance, edges, truncated = ego_network(get_citation_matrix(), paper_id, min(hops, 3), min(max_nodes, MAX_SUBGRAPH_NODES),
+                                             reverse=get_cited_by_matrix())
+    distance = distance or {paper_id: 0}
+    titles = dict(db.query(Paper.id, Paper.title).filter(Paper.id.in_(list(distance))).all())
+    return {
+        "center": paper_id,
+        "truncated": truncated,
+        "nodes": [{"id": n, "title": titles.get(n, ""), "hops": d} for n, d in distance.items()],
+        "edges": [{"source": u, "target": v} for u, v, _ in edges]
+    }
+
+@app.get("/api/communities")
+def api_communities(limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Research communities (FR-4.1.3), largest first, as stored by the incremental detection.
+    """
+    import json
+    communities = db.query(ResearchCommunity).order_by(ResearchCommunity.size.desc()).limit(limit).all()
+    return {
+        "communities": [{
+            "id": c.id,
+            "size": c.size,
+            "top_authors": json.loads(c.top_authors) if c.top_authors else [],
+            "dominant_categories": json.loads(c.dominant_categories) if c.dominant_categories else [],
+            "updated_at": c.updated_at.isoformat() if c.updated_at else None
+        } for c in communities]
+    }
+
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+from fastapi.responses import JSONResponse
+
+class ProfilingSettingsDTO(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    slow_query_ms: Optional[float] = None
+
+def _forbidden():
+    return JSONResponse({"error": "Admin token required"}, status_code=403)
+
+@app.get("/api/admin/profiling")
+def api_profiling_settings(request: Request):
+    if not profiling.is_admin(request):
+        return _forbidden()
+    return profiling.settings
+
+@app.post("/api/admin/profiling")
+def api_update_profiling_settings(dto: ProfilingSettingsDTO, request: Request):
+    """
+    Toggle sampled profiling and set the slow query threshold (this API process only).
+    """
+    if not profiling.is_admin(request):
+        return _forbidden()
+    return profiling.update_settings(dto.enabled, dto.sample_rate, dto.slow_query_ms)
+
+@app.get("/api/admin/profiles")
+def api_profiles(request: Request):
+    """
+    Recent request profiles, newest first, without the function tables.
+    """
+    if not profiling.is_admin(request):
+        return _forbidden()
+    return {
+        "profiles": [{k: v for k, v in p.items() if k != "profile"} for p in reversed(profiling.profiles)]
+    }
+
+@app.get("/api/admin/profiles/{profile_id}")
+def api_profile(profile_id: int, request: Request):
+    if not profiling.is_admin(request):
+        return _forbidden()
+    for p in profiling.profiles:
+        if p["id"] == profile_id:
+            return p
+    return {"error": "Profile not found"}
+
+@app.get("/api/admin/slow-queries")
+def api_slow_queries(request: Request):
+    """
+    SQL statements over the slow query threshold with their query plans, newest first.
+    """
+    if not profiling.is_admin(request):
+        return _forbidden()
+    return {"threshold_ms": profiling.settings["slow_query_ms"], "queries": list(reversed(profiling.slow_queries))}
+
+# Every route is registered by now
+profiling.instrument_routes(app)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,139 @@
+"""
+Schema Migrations
+Versioned changes to existing tables, applied in order by init_db() after create_all().
+Applied versions are recorded in schema_migrations.
+
+To change the schema, update the model in database.py and append a migration here; never
+edit or reorder migrations that have shipped. Migrations must be idempotent: on a fresh
+database create_all() has already built the current schema, and SQLite has no advisory
+lock to keep two starting workers from racing.
+"""
+import logging
+import os
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from database import Base, SchemaMigration, PaperAbstract, DB_DIR
+from services.abstract_store import abstract_row, make_preview
+
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every process migrating this database
+ADVISORY_LOCK_KEY = 4104201
+LOCK_FILE = os.path.join(DB_DIR, "migrations.lock")
+
+def add_missing_columns(conn: Connection):
+    """Columns added to the models before migrations were versioned (citation counts, influence metrics, topic ids)."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def index_paper_authors(conn: Connection):
+    """Author and paper lookups through the association table were full scans."""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_paper_authors_paper_id ON paper_authors (paper_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_paper_authors_author_id ON paper_authors (author_id)"))
+
+def move_abstracts(conn: Connection):
+    """Compress abstracts into paper_abstracts and keep only a preview in papers."""
+    add_missing_columns(conn) # papers.abstract_preview
+    if "abstract" not in {c["name"] for c in inspect(conn).get_columns("papers")}:
+        return # Created after the change
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, abstract FROM papers WHERE id > :last_id AND abstract IS NOT NULL ORDER BY id LIMIT 5000"
+        ), {"last_id": last_id}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        conn.execute(PaperAbstract.__table__.insert(), [abstract_row(r.id, r.abstract) for r in rows])
+        conn.execute(text("UPDATE papers SET abstract_preview = :preview WHERE id = :id"),
+                     [{"id": r.id, "preview": make_preview(r.abstract)} for r in rows])
+    if conn.dialect.name == "sqlite" and conn.dialect.dbapi.sqlite_version_info < (3, 35):
+        conn.execute(text("UPDATE papers SET abstract = NULL")) # No DROP COLUMN before SQLite 3.35
+    else:
+        conn.execute(text("ALTER TABLE papers DROP COLUMN abstract"))
+
+def track_jobs(conn: Connection):
+    """Status, progress and deduplication of on-demand jobs."""
+    add_missing_columns(conn)
+    # ADD COLUMN can't add the unique constraint
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_job_runs_dedup_key ON job_runs (dedup_key)"))
+
+def key_profiles_by_user(conn: Connection):
+    """Profiles belong to a request identity; the existing single profile becomes the default user's."""
+    from services.profile_service import DEFAULT_USER
+    add_missing_columns(conn)
+    conn.execute(text(
+        "UPDATE user_profiles SET user_key = :user WHERE id = (SELECT MIN(id) FROM user_profiles) AND user_key IS NULL"
+    ), {"user": DEFAULT_USER})
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_user_profiles_user_key ON user_profiles (user_key)"))
+
+def normalize_dois(conn: Connection):
+    """DOIs are matched across sources (dedup_service): store them normalized and index them."""
+    from services.citation_importer import normalize_doi
+    rows = conn.execute(text("SELECT id, doi FROM papers WHERE doi IS NOT NULL")).all()
+    changed = [{"id": r.id, "doi": normalize_doi(r.doi)} for r in rows if normalize_doi(r.doi) != r.doi]
+    if changed:
+        conn.execute(text("UPDATE papers SET doi = :doi WHERE id = :id"), changed)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_papers_doi ON papers (doi)"))
+
+def index_abstract_text(conn: Connection):
+    """Keyword search matched only abstract previews: index the full abstracts."""
+    from services.search_index import create_search_table, backfill
+    create_search_table(conn) # Already created by create_all() on this version
+    backfill(conn)
+
+def move_data_versions(conn: Connection):
+    """Data versions were files in the data directory: carry their counts over to data_versions."""
+    for name, file_name in (("data", "data_version"), ("analytics", "analytics_version")):
+        try:
+            with open(os.path.join(DB_DIR, file_name)) as f:
+                version = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            continue
+        if conn.execute(text("SELECT 1 FROM data_versions WHERE name = :name"), {"name": name}).first():
+            continue
+        conn.execute(text(
+            "INSERT INTO data_versions (name, version, changed_at) VALUES (:name, :version, CURRENT_TIMESTAMP)"
+        ), {"name": name, "version": version})
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Add columns introduced before versioned migrations", add_missing_columns),
+    (2, "Index paper_authors by paper and author", index_paper_authors),
+    (3, "Move abstracts to compressed paper_abstracts", move_abstracts),
+    (4, "Track on-demand job progress and results", track_jobs),
+    (5, "Key profiles by user and store their embeddings", key_profiles_by_user),
+    (6, "Normalize and index paper DOIs", normalize_dois),
+    (7, "Track the papers counted by online changepoint detection", add_missing_columns),
+    (8, "Record which process queued each job run", add_missing_columns),
+    (9, "Index full abstracts for keyword search", index_abstract_text),
+    (10, "Record which user submitted each job run", add_missing_columns),
+    (11, "Keep data versions in the database", move_data_versions),
+]
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in one transaction. Returns the versions applied."""
+    with open(LOCK_FILE, "w") as lock_file:
+        if fcntl and engine.dialect.name == "sqlite":
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Serializes workers starting together; released at commit
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            applied = {v for (v,) in conn.execute(SchemaMigration.__table__.select().with_only_columns(SchemaMigration.version))}
+            pending = [m for m in MIGRATIONS if m[0] not in applied]
+            for version, description, migrate in pending:
+                logger.info(f"Applying schema migration {version}: {description}")
+                migrate(conn)
+                conn.execute(SchemaMigration.__table__.insert().values(version=version, description=description))
+    return [version for version, _, _ in pending]
@@ -0,0 +1,179 @@
+"""
+Abstract Storage
+Abstracts are the bulk of a paper row but only the detail views need them in full, so they
+live zstd-compressed in paper_abstracts; papers keeps a short abstract_preview for lists.
+
+Abstracts are short and share most of their vocabulary, so they compress far better with a
+dictionary trained on the corpus than one by one. Collectors write them without one; the
+pipeline's "abstracts" stage trains a dictionary once enough abstracts exist and
+recompresses papers with it. Dictionaries are never modified or deleted, so every stored
+frame stays readable.
+
+Abstracts written through the ORM are added to the search index (see search_index) by the
+mapper events below; recompression doesn't change the text, so it leaves the index alone.
+"""
+import logging
+import random
+import threading
+from typing import Dict, Optional, Tuple
+import zstandard
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session, object_session
+from database import Paper, PaperAbstract, AbstractDictionary
+from .search_index import index_abstracts, unindex_abstracts
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 300 # Characters kept in papers.abstract_preview
+COMPRESSION_LEVEL = 9
+DICTIONARY_SIZE = 64 * 1024
+TRAINING_SAMPLES = 20000
+MIN_TRAINING_SAMPLES = 2000 # Fewer gives a dictionary that barely helps
+RECOMPRESS_BATCH = 5000
+
+# Dictionaries by id; ids are random, so they don't collide across databases
+_dictionaries: Dict[int, zstandard.ZstdCompressionDict] = {}
+# zstd compressor and decompressor objects must not be shared between threads
+_local = threading.local()
+
+def make_preview(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return text[:PREVIEW_LENGTH] + "..." if len(text) > PREVIEW_LENGTH else text
+
+def truncate(preview: Optional[str], length: int) -> Optional[str]:
+    """Shorter excerpt of a preview, for views that show less than PREVIEW_LENGTH."""
+    if not preview or len(preview) <= length:
+        return preview
+    return preview[:length] + "..."
+
+def _codec(dictionary_id: Optional[int]) -> Tuple[zstandard.ZstdCompressor, zstandard.ZstdDecompressor]:
+    codecs = _local.__dict__.setdefault("codecs", {})
+    if dictionary_id not in codecs:
+        dictionary = _dictionaries[dictionary_id] if dictionary_id else None
+        codecs[dictionary_id] = (
+            zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary),
+            zstandard.ZstdDecompressor(dict_data=dictionary),
+        )
+    return codecs[dictionary_id]
+
+def _load_dictionary(db: Optional[Session], dictionary_id: Optional[int]):
+    if dictionary_id and dictionary_id not in _dictionaries:
+        data = db.execute(select(AbstractDictionary.data).where(AbstractDictionary.id == dictionary_id)).scalar_one()
+        _dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(data)
+
+def compress(text: str, dictionary_id: Optional[int] = None) -> bytes:
+    """dictionary_id must have been loaded (see current_dictionary)."""
+    return _codec(dictionary_id)[0].compress(text.encode("utf-8"))
+
+def decompress(db: Optional[Session], data: bytes, dictionary_id: Optional[int]) -> str:
+    _load_dictionary(db, dictionary_id)
+    return _codec(dictionary_id)[1].decompress(data).decode("utf-8")
+
+def abstract_row(paper_id: int, text: str) -> Dict:
+    """paper_abstracts row for bulk inserts; compressed without a dictionary, like collector writes."""
+    return {"paper_id": paper_id, "data": compress(text), "dictionary_id": None}
+
+def read_abstract(paper: Paper) -> Optional[str]:
+    record = paper.abstract_record
+    if record is None:
+        return None
+    return decompress(object_session(paper), record.data, record.dictionary_id)
+
+def write_abstract(paper: Paper, text: Optional[str]):
+    paper.abstract_preview = make_preview(text)
+    if text is None:
+        paper.abstract_record = None
+        return
+    if paper.abstract_record is None:
+        paper.abstract_record = PaperAbstract()
+    paper.abstract_record.data = compress(text)
+    paper.abstract_record.dictionary_id = None
+
+def _stored_text(conn, paper_id: int) -> Optional[str]:
+    row = conn.execute(select(PaperAbstract.data, PaperAbstract.dictionary_id).where(PaperAbstract.paper_id == paper_id)).first()
+    return decompress(conn, row.data, row.dictionary_id) if row is not None and row.data else None
+
+@event.listens_for(PaperAbstract, "after_insert")
+def _index_inserted(mapper, conn, record: PaperAbstract):
+    if record.data:
+        index_abstracts(conn, [(record.paper_id, decompress(conn, record.data, record.dictionary_id))])
+
+@event.listens_for(PaperAbstract, "before_update")
+def _reindex_updated(mapper, conn, record: PaperAbstract):
+    if not inspect(record).attrs.data.history.has_changes():
+        return
+    previous = _stored_text(conn, record.paper_id)
+    if previous is not None:
+        unindex_abstracts(conn, [(record.paper_id, previous)])
+    if record.data:
+        index_abstracts(conn, [(record.paper_id, decompress(conn, record.data, record.dictionary_id))])
+
+@event.listens_for(PaperAbstract, "before_delete")
+def _unindex_deleted(mapper, conn, record: PaperAbstract):
+    previous = _stored_text(conn, record.paper_id)
+    if previous is not None:
+        unindex_abstracts(conn, [(record.paper_id, previous)])
+
+def current_dictionary(db: Session) -> Optional[int]:
+    """Id of the newest dictionary, loaded and ready for compress(); None if none was trained yet."""
+    dictionary_id = db.execute(
+        select(AbstractDictionary.id).order_by(AbstractDictionary.created_at.desc()).limit(1)
+    ).scalar()
+    _load_dictionary(db, dictionary_id)
+    return dictionary_id
+
+def train_dictionary(db: Session) -> Optional[int]:
+    """Train a dictionary on a random sample of stored abstracts. None if there are too few."""
+    ids = [i for (i,) in db.execute(select(PaperAbstract.paper_id))]
+    if len(ids) < MIN_TRAINING_SAMPLES:
+        logger.info(f"Only {len(ids)} abstracts stored; not training a dictionary yet.")
+        return None
+    sample = sorted(random.sample(ids, min(TRAINING_SAMPLES, len(ids))))
+    texts = []
+    for start in range(0, len(sample), 500):
+        rows = db.execute(select(PaperAbstract.data, PaperAbstract.dictionary_id)
+                          .where(PaperAbstract.paper_id.in_(sample[start:start + 500]))).all()
+        texts += [decompress(db, r.data, r.dictionary_id).encode("utf-8") for r in rows]
+
+    dictionary_id = random.randint(1, 2**31 - 1)
+    dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, texts, dict_id=dictionary_id, level=COMPRESSION_LEVEL)
+    db.add(AbstractDictionary(id=dictionary_id, data=dictionary.as_bytes(), samples=len(texts)))
+    db.commit()
+    _dictionaries[dictionary_id] = dictionary
+    logger.info(f"Trained abstract dictionary {dictionary_id} on {len(texts)} abstracts")
+    return dictionary_id
+
+def recompress_abstracts(db: Session, since_id: int, until_id: int) -> int:
+    """
+    Recompress the abstracts of papers since_id < id <= until_id with the current dictionary,
+    training it first if there is none yet. Returns the number of abstracts rewritten.
+    """
+    dictionary_id = current_dictionary(db)
+    if dictionary_id is None:
+        dictionary_id = train_dictionary(db)
+        if dictionary_id is None:
+            return 0
+        since_id = 0 # Everything stored so far was written without it
+
+    rewritten = 0
+    last_id = since_id
+    while True:
+        rows = db.execute(
+            select(PaperAbstract.paper_id, PaperAbstract.data, PaperAbstract.dictionary_id)
+            .where(PaperAbstract.paper_id > last_id, PaperAbstract.paper_id <= until_id)
+            .order_by(PaperAbstract.paper_id).limit(RECOMPRESS_BATCH)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].paper_id
+        updates = [{
+            "paper_id": r.paper_id,
+            "data": compress(decompress(db, r.data, r.dictionary_id), dictionary_id),
+            "dictionary_id": dictionary_id,
+        } for r in rows if r.dictionary_id != dictionary_id]
+        if updates:
+            db.execute(update(PaperAbstract), updates)
+            db.commit()
+            rewritten += len(updates)
+    return rewritten
@@ -4,6 +4,10 @@ import logging
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from database import Paper, Author, SessionLocal
+from .citation_importer import normalize_doi
+from .data_version import bump_data_version
+from .dedup_service import DuplicateResolver
+from .metrics import COLLECTOR_PAPERS, COLLECTOR_RATE_LIMIT_SECONDS
 from dateutil import parser
 import random
 
@@ -12,11 +16,38 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 CATEGORIES = ["cs.LG", "cs.AI", "cs.CV", "cs.CL", "stat.ML"]
+VENUE_KEYWORDS = ["neurips", "icml", "iclr", "cvpr", "acl", "emnlp"]
+
+def extract_venue(journal_ref, comment):
+    """FR-1.1.4: The journal reference, else a conference named in the comments."""
+    if journal_ref:
+        return journal_ref
+    if comment:
+        # Simple heuristic for venue in comments
+        comments = comment.lower()
+        for v in VENUE_KEYWORDS:
+            if v in comments:
+                return v.upper()
+    return None
+
+class MeteredClient(arxiv.Client):
+    """
+    arxiv.Client that records the time its rate limiter is about to sleep before each page.
+    _parse_feed is private: arxiv is pinned in requirements.txt, check it on upgrades.
+    """
+    def _parse_feed(self, url, first_page=True, _try_index=0):
+        # Retries call _parse_feed again: count each page once
+        if _try_index == 0 and self._last_request_dt is not None:
+            wait = self.delay_seconds - (datetime.now() - self._last_request_dt).total_seconds()
+            if wait > 0:
+                COLLECTOR_RATE_LIMIT_SECONDS.labels("arxiv").inc(wait)
+        return super()._parse_feed(url, first_page=first_page, _try_index=_try_index)
 
 class ArxivCollector:
     def __init__(self, db: Session):
         self.db = db
-        self.client = arxiv.Client(
+        self.duplicates = DuplicateResolver(db)
+        self.client = MeteredClient(
             page_size=100,
             delay_seconds=3.0,  # FR-1.1.1: Respect rate limit of 1 request per 3 seconds
             num_retries=3
@@ -52,47 +83,50 @@ class ArxivCollector:
         )
 
         count = 0
+        inserted = 0
         try:
             for result in self.client.results(search):
-                self._process_paper(result)
+                COLLECTOR_PAPERS.labels("arxiv", "fetched").inc()
+                if self._process_paper(result):
+                    inserted += 1
                 count += 1
                 if count % 10 == 0:
                     logger.info(f"Processed {count} papers...")
         except Exception as e:
+            COLLECTOR_PAPERS.labels("arxiv", "error").inc()
             logger.error(f"Error during fetching: {e}")
             # FR-1.1.1: Retry logic is handled by arxiv.Client(num_retries=3), 
             # but we catch top level errors here.
+        return inserted
 
     def _process_paper(self, result):
         try:
             # FR-1.2.1: Deduplication
             # Check ID
             existing = self.db.query(Paper).filter(Paper.external_id == result.entry_id).first()
-            if existing:
+            if existing or self.duplicates.seen(result.entry_id):
+                COLLECTOR_PAPERS.labels("arxiv", "duplicate").inc()
                 return # Skip duplicate
 
             # Validate FR-1.2.2
-            if not result.title or not result.authors:
+            if not result.title or not result.authors or len(result.summary) < 50:
+                COLLECTOR_PAPERS.labels("arxiv", "invalid").inc()
                 return
-            if len(result.summary) < 50:
+
+            # Same work from another source: link it instead of inserting
+            match = self.duplicates.find(result.doi, result.title, result.summary)
+            if match:
+                self.duplicates.record("arxiv", result.entry_id, result.doi, match)
+                COLLECTOR_PAPERS.labels("arxiv", "duplicate").inc()
                 return
 
             # Venue extraction (FR-1.1.4)
-            venue = None
-            if result.journal_ref:
-                venue = result.journal_ref
-            elif result.comment:
-                # Simple heuristic for venue in comments
-                comments = result.comment.lower()
-                for v in ["neurips", "icml", "iclr", "cvpr", "acl", "emnlp"]:
-                    if v in comments:
-                        venue = v.upper()
-                        break
+            venue = extract_venue(result.journal_ref, result.comment)
 
             paper = Paper(
                 source="arxiv",
                 external_id=result.entry_id,
-                doi=result.doi,
+                doi=normalize_doi(result.doi),
                 title=result.title,
                 abstract=result.summary,
                 published_date=result.published.date(),
@@ -116,9 +150,14 @@ class ArxivCollector:
             
             paper.authors = paper_authors
             self.db.add(paper)
+            self.db.flush()
+            self.duplicates.index(paper.id, result.title, result.summary)
             self.db.commit()
+            COLLECTOR_PAPERS.labels("arxiv", "inserted").inc()
+            return True
 
         except Exception as e:
+            COLLECTOR_PAPERS.labels("arxiv", "error").inc()
             logger.error(f"Failed to process paper {result.entry_id}: {e}")
             self.db.rollback()
 
@@ -127,6 +166,7 @@ def run_arxiv_collection():
     try:
         collector = ArxivCollector(db)
         # Testing with small number of days and results first
-        collector.fetch_papers(days_back=7, max_results=50)
+        if collector.fetch_papers(days_back=7, max_results=50):
+            bump_data_version()
     finally:
         db.close()
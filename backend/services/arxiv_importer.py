@@ -0,0 +1,250 @@
+"""
+arXiv Snapshot Importer
+Backfills papers from the public arXiv metadata snapshot (one JSON record per line, as
+distributed on Kaggle), optionally gzipped, instead of paging through the rate-limited API.
+
+    {"id": "2401.01234", "title": "...", "abstract": "...", "categories": "cs.LG stat.ML",
+     "authors_parsed": [["Last", "First", ""]], "comments": "...", "journal-ref": "...",
+     "doi": "...", "versions": [{"version": "v1", "created": "Mon, 1 Jan 2024 00:00:00 GMT"}]}
+
+Records are parsed in a process pool into the rows ArxivCollector._process_paper builds
+(FR-1.1.4 venue heuristic and FR-1.2.2 validation included) and bulk-loaded one batch
+per transaction. Only a bounded number of batches is in flight, so memory does not grow
+with the file; deduplication keeps one 8-byte hash per existing arXiv paper.
+
+Usage (from the backend directory):
+    python -m services.arxiv_importer /path/to/arxiv-metadata-oai-snapshot.json [--all-categories]
+"""
+import argparse
+import gzip
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import Paper, PaperAbstract, Author, paper_authors, SessionLocal, init_db
+from .abstract_store import abstract_row, make_preview
+from .search_index import index_abstracts
+from .arxiv_collector import CATEGORIES, extract_venue
+from .citation_importer import insert_ignore, normalize_arxiv_id, normalize_doi
+from .data_version import bump_data_version
+from .metrics import COLLECTOR_PAPERS, init_worker_process
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20000 # Papers per transaction
+CHUNK_LINES = 5000 # Lines per worker task
+MAX_PENDING = 4 # Chunks in flight per worker
+IN_CLAUSE = 500 # Bound parameters per IN (...) lookup
+AUTHOR_CACHE_SIZE = 200000
+ABS_URL = "http://arxiv.org/abs/"
+SOURCE = "arxiv_snapshot"
+
+# Paper columns in the order workers emit them
+FIELDS = ("external_id", "doi", "title", "abstract", "published_date", "categories", "venue", "journal_ref")
+
+def parse_record(record: Dict, categories: Optional[frozenset] = None) -> Optional[Tuple[tuple, List[str]]]:
+    """Snapshot record -> (paper row in FIELDS order, author names), or None if it is filtered out."""
+    paper_categories = (record.get("categories") or "").split()
+    if categories and not categories.intersection(paper_categories):
+        return None
+
+    title = " ".join((record.get("title") or "").split())
+    abstract = (record.get("abstract") or "").strip()
+    authors = [" ".join(part for part in (a[1] if len(a) > 1 else "", a[0], a[2] if len(a) > 2 else "") if part)
+               for a in record.get("authors_parsed") or []]
+    authors = [a for a in dict.fromkeys(authors) if a]
+    # Same validation as the API collector (FR-1.2.2)
+    if not title or not authors or len(abstract) < 50:
+        return None
+
+    versions = record.get("versions") or []
+    version = versions[-1]["version"] if versions else "v1"
+    published = None
+    if versions:
+        try:
+            published = parsedate_to_datetime(versions[0]["created"]).date()
+        except (TypeError, ValueError, KeyError):
+            pass
+    if published is None and record.get("update_date"):
+        published = datetime.strptime(record["update_date"], "%Y-%m-%d").date()
+
+    journal_ref = record.get("journal-ref") or None
+    row = (
+        # Same form as arxiv.Result.entry_id
+        f"{ABS_URL}{record['id']}{version}",
+        normalize_doi(record.get("doi")),
+        title,
+        abstract,
+        published,
+        ", ".join(paper_categories),
+        extract_venue(journal_ref, record.get("comments")),
+        journal_ref,
+    )
+    return row, authors
+
+def _parse_chunk(args) -> Tuple[List[Tuple[tuple, List[str]]], int]:
+    """Process pool worker: parse a chunk of lines. Returns (parsed papers, lines seen)."""
+    lines, categories = args
+    parsed = []
+    for line in lines:
+        try:
+            record = _loads(line)
+        except ValueError:
+            continue
+        if record.get("id"):
+            result = parse_record(record, categories)
+            if result is not None:
+                parsed.append(result)
+    return parsed, len(lines)
+
+def iter_chunks(path: str, size: int = CHUNK_LINES) -> Iterator[List[bytes]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        chunk = []
+        for line in f:
+            if line.strip():
+                chunk.append(line)
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+def load_existing_ids(db: Session) -> np.ndarray:
+    """Sorted hashes of the version-less arXiv ids already stored (API or earlier imports)."""
+    hashes = [hash(normalize_arxiv_id(e)) for (e,) in db.query(Paper.external_id).filter(Paper.source == "arxiv").yield_per(50000)]
+    return np.unique(np.array(hashes, dtype=np.int64))
+
+class AuthorResolver:
+    """Name -> author id, creating missing authors in bulk. The cache is bounded."""
+    def __init__(self, db: Session):
+        self.db = db
+        self.cache: Dict[str, int] = {}
+
+    def resolve(self, names: List[str]) -> Dict[str, int]:
+        missing = [n for n in dict.fromkeys(names) if n not in self.cache]
+        if len(self.cache) + len(missing) > AUTHOR_CACHE_SIZE:
+            self.cache.clear()
+            missing = list(dict.fromkeys(names))
+        if missing:
+            insert_ignore(self.db, Author.__table__, [{"name": n, "normalized_name": n.lower()} for n in missing])
+            for start in range(0, len(missing), IN_CLAUSE):
+                chunk = missing[start:start + IN_CLAUSE]
+                self.cache.update(self.db.execute(select(Author.name, Author.id).where(Author.name.in_(chunk))).all())
+        return self.cache
+
+def _paper_ids(db: Session, external_ids: List[str]) -> Dict[str, int]:
+    paper_ids = {}
+    for start in range(0, len(external_ids), IN_CLAUSE):
+        chunk = external_ids[start:start + IN_CLAUSE]
+        paper_ids.update(db.execute(select(Paper.external_id, Paper.id).where(Paper.external_id.in_(chunk))).all())
+    return paper_ids
+
+def load_batch(db: Session, batch: List[Tuple[tuple, List[str]]], authors: AuthorResolver) -> int:
+    """
+    Insert one batch of new papers with their authorships in a single transaction.
+    Returns the number inserted: papers another version or process already stored are
+    skipped by the insert, and so are their authorships and abstracts.
+    """
+    rows = []
+    for row, _ in batch:
+        paper = dict(zip(FIELDS, row), source="arxiv", citation_count=0)
+        paper["abstract_preview"] = make_preview(paper.pop("abstract"))
+        rows.append(paper)
+    external_ids = [r["external_id"] for r in rows]
+    stored = _paper_ids(db, external_ids)
+    insert_ignore(db, Paper.__table__, rows)
+    paper_ids = {k: v for k, v in _paper_ids(db, external_ids).items() if k not in stored}
+    batch = [(row, names) for row, names in batch if row[0] in paper_ids]
+    if not batch:
+        db.commit()
+        return 0
+
+    author_ids = authors.resolve([name for _, names in batch for name in names])
+    links = [{"paper_id": paper_ids[row[0]], "author_id": author_ids[name]}
+             for row, names in batch for name in names]
+    if links:
+        db.execute(paper_authors.insert(), links)
+    db.execute(PaperAbstract.__table__.insert(), [abstract_row(paper_ids[row[0]], row[3]) for row, _ in batch])
+    index_abstracts(db, [(paper_ids[row[0]], row[3]) for row, _ in batch])
+    db.commit()
+    return len(batch)
+
+def import_snapshot(db: Session, path: str, categories: Optional[List[str]] = CATEGORIES,
+                    max_workers: Optional[int] = None) -> Dict[str, int]:
+    existing = load_existing_ids(db)
+    logger.info(f"{len(existing)} arXiv papers already stored")
+    wanted = frozenset(categories) if categories else None
+    authors = AuthorResolver(db)
+    stats = {"lines": 0, "parsed": 0, "duplicates": 0, "inserted": 0}
+    batch: List[Tuple[tuple, List[str]]] = []
+
+    def consume(parsed):
+        nonlocal batch
+        for row, names in parsed:
+            # Any stored version of the paper counts as a duplicate
+            key = hash(normalize_arxiv_id(row[0]))
+            i = np.searchsorted(existing, key)
+            if i < len(existing) and existing[i] == key:
+                stats["duplicates"] += 1
+                continue
+            batch.append((row, names))
+        if len(batch) >= BATCH_SIZE:
+            stats["inserted"] += load_batch(db, batch, authors)
+            batch = []
+            logger.info(f"Imported {stats['inserted']} papers ({stats['lines']} records read)")
+
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_process) as pool:
+        pending = []
+        # Bounded window of in-flight chunks: constant memory whatever the file size
+        for chunk in iter_chunks(path):
+            pending.append(pool.submit(_parse_chunk, (chunk, wanted)))
+            if len(pending) >= workers * MAX_PENDING:
+                parsed, lines = pending.pop(0).result()
+                stats["lines"] += lines
+                stats["parsed"] += len(parsed)
+                consume(parsed)
+        for future in pending:
+            parsed, lines = future.result()
+            stats["lines"] += lines
+            stats["parsed"] += len(parsed)
+            consume(parsed)
+    if batch:
+        stats["inserted"] += load_batch(db, batch, authors)
+
+    COLLECTOR_PAPERS.labels(SOURCE, "fetched").inc(stats["parsed"])
+    COLLECTOR_PAPERS.labels(SOURCE, "duplicate").inc(stats["duplicates"])
+    COLLECTOR_PAPERS.labels(SOURCE, "inserted").inc(stats["inserted"])
+    if stats["inserted"]:
+        bump_data_version()
+    logger.info(f"Snapshot import finished: {stats}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import papers from the arXiv metadata snapshot")
+    parser.add_argument("path", help="Path to arxiv-metadata-oai-snapshot.json (optionally .gz)")
+    parser.add_argument("--all-categories", action="store_true",
+                        help=f"Import every category, not only {', '.join(CATEGORIES)}")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        print(import_snapshot(db, args.path, None if args.all_categories else CATEGORIES, args.workers))
+    finally:
+        db.close()
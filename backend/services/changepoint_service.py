@@ -1,30 +1,61 @@
 import ruptures as rpt
 import numpy as np
 import pandas as pd
-from scipy import stats
+from scipy import stats, special
 import logging
-from typing import List, Dict, Any
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from database import TopicChangepoint, TopicStreamState, TopicEvent, Paper, SessionLocal
+from .metrics import init_worker_process
 
 logger = logging.getLogger(__name__)
 
+# The "rbf" kernel cost is quadratic in the number of samples; above this length
+# we fall back to a linear-cost model ("l2" = mean shift, "normal" = mean/variance shift)
+LONG_SERIES_THRESHOLD = 200
+LONG_SERIES_MODEL = "l2"
+
+# Upper bound on pairwise-difference elements held in memory at once (~160MB of float64)
+MAX_CHUNK_ELEMENTS = 20_000_000
+
+# Online detection: only buckets at least this old are consumed, giving late papers time to arrive.
+# The collectors fetch the last 7 days, and PubMed publication dates lag behind that.
+SETTLE_DAYS = 10
+# Papers that still arrive for an already consumed bucket are counted in the next bucket fed,
+# unless they are older than this: back-filled history (bulk imports) is not news
+LATE_ARRIVAL_DAYS = 30
+# Zero-count buckets fed to a newly seen topic so that its appearance can register as "Emergence"
+NEW_TOPIC_BASELINE = 14
+EMERGING_TYPES = ("Emergence", "Explosion")
+
+# Batches smaller than this are not worth the process pool startup cost
+MIN_PARALLEL_TOPICS = 8
+
 class ChangepointService:
-    def detect_changepoints(self, time_series: List[float], dates: List[pd.Timestamp]) -> List[Dict[str, Any]]:
+    def detect_changepoints(self, time_series: List[float], dates: List[pd.Timestamp], model: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         FR-3.1.1: Statistical Changepoint Detection
         Uses PELT algorithm to detect mean shifts.
+        model: ruptures cost model; defaults to "rbf", or LONG_SERIES_MODEL for long series.
         """
         if len(time_series) < 10:
             logger.warning("Not enough data points for changepoint detection.")
             return []
 
-        signal = np.array(time_series)
+        signal = np.asarray(time_series, dtype=float)
+        if model is None:
+            model = "rbf" if len(signal) <= LONG_SERIES_THRESHOLD else LONG_SERIES_MODEL
         
         # FR-3.1.1: Apply PELT algorithm
         # "rbf" model allows detecting non-linear changes (Kernel-based)
-        algo = rpt.Pelt(model="rbf").fit(signal)
+        algo = rpt.Pelt(model=model).fit(signal)
         try:
-            # Penalty selection is heuristic; 2*log(n) is standard-ish like AIC
-            result_indices = algo.predict(pen=10)
+            result_indices = algo.predict(pen=self._penalty(signal, model))
         except Exception as e:
             logger.error(f"PELT prediction failed: {e}")
             return []
@@ -35,7 +66,7 @@ class ChangepointService:
         # We want the start of the new segment (changepoint location).
         
         previous_idx = 0
-        for idx in result_indices[:-1]: # Last index is usually end of signal
+        for pos, idx in enumerate(result_indices[:-1]): # Last index is usually end of signal
             if idx >= len(dates):
                 continue
                 
@@ -45,9 +76,8 @@ class ChangepointService:
             # Compare mean of segment before vs segment after
             # Define window size for comparison (e.g., 5 points or full segment)
             seg_before = signal[previous_idx:idx]
-            # Next segment end
-            next_idx_in_result = [i for i in result_indices if i > idx]
-            next_idx = next_idx_in_result[0] if next_idx_in_result else len(signal)
+            # Next segment end (breakpoints are sorted, so it is the next entry)
+            next_idx = result_indices[pos + 1]
             seg_after = signal[idx:next_idx]
 
             if len(seg_before) > 2 and len(seg_after) > 2:
@@ -71,6 +101,50 @@ class ChangepointService:
             
         return changepoints
 
+    def _penalty(self, signal: np.ndarray, model: str) -> float:
+        """
+        Penalty selection is heuristic. The rbf cost is bounded, so a constant works;
+        l2 cost scales with the noise variance, so use a BIC-style 2*log(n)*sigma^2.
+        """
+        if model == "rbf":
+            return 10
+        if model == "l2":
+            return 2 * np.log(len(signal)) * max(self._noise_variance(signal), 1e-8)
+        return 2 * np.log(len(signal))
+
+    @staticmethod
+    def _noise_variance(signal: np.ndarray) -> float:
+        """
+        Noise variance from the median absolute first difference (MAD estimator; a difference
+        of two noise terms has twice their variance). Unlike the total variance it isn't
+        inflated by the shifts being detected. Falls back to the total variance when most
+        differences are zero (sparse counts).
+        """
+        diffs = np.abs(np.diff(signal))
+        sigma2 = (np.median(diffs) / 0.6745) ** 2 / 2 if len(diffs) else 0.0
+        return float(sigma2) if sigma2 > 0 else float(np.var(signal))
+
+    def detect_changepoints_batch(self, matrix: np.ndarray, dates: List[pd.Timestamp], topics: List[str],
+                                  model: Optional[str] = None, max_workers: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        FR-3.1.1: Changepoint detection for every topic of a topic x time count matrix.
+        Rows are processed in a process pool since PELT is CPU-bound.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        dates = list(dates)
+        args = [(row, dates, model) for row in matrix]
+
+        if len(topics) < MIN_PARALLEL_TOPICS or max_workers == 1:
+            results = [_detect_row(a) for a in args]
+        else:
+            workers = max_workers or os.cpu_count() or 1
+            # Spawned, not forked: the pipeline calls this from one of several threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=init_worker_process) as pool:
+                results = list(pool.map(_detect_row, args, chunksize=max(1, len(args) // (4 * workers))))
+
+        return dict(zip(topics, results))
+
     def _classify_changepoint(self, before: np.ndarray, after: np.ndarray) -> str:
         """
         FR-3.1.2: Changepoint Classification
@@ -101,7 +175,8 @@ class ChangepointService:
         # Simplified here as small change relative to variance.
         return "Plateau" if abs(pct_change) < 0.1 else "Shift"
 
-    def detect_crossovers(self, topic_a_series: pd.Series, topic_b_series: pd.Series) -> List[Dict]:
+    def detect_crossovers(self, topic_a_series: pd.Series, topic_b_series: pd.Series,
+                          topic_a_name: str = "Topic A", topic_b_name: str = "Topic B") -> List[Dict]:
         """
         FR-3.1.3: Paradigm Shift Detection (Crossover events)
         topic_a_series and topic_b_series should be aligned by date index.
@@ -115,8 +190,8 @@ class ChangepointService:
         for idx in sign_changes:
             date = diff.index[idx]
             # Determine winner
-            winner = "Topic A" if diff.iloc[idx+1] > 0 else "Topic B"
-            loser = "Topic B" if winner == "Topic A" else "Topic A"
+            winner = topic_a_name if diff.iloc[idx+1] > 0 else topic_b_name
+            loser = topic_b_name if winner == topic_a_name else topic_a_name
             
             crossovers.append({
                 "date": date,
@@ -125,3 +200,295 @@ class ChangepointService:
             })
             
         return crossovers
+
+    def detect_crossovers_all_pairs(self, matrix: np.ndarray, dates: List[pd.Timestamp], topics: List[str],
+                                    min_magnitude: float = 0.0, max_chunk_elements: int = MAX_CHUNK_ELEMENTS) -> List[Dict]:
+        """
+        FR-3.1.3: Crossover events for every pair of topics of a topic x time matrix.
+        Same semantics as detect_crossovers, but pairwise differences are computed with
+        NumPy broadcasting, a block of rows at a time so memory stays bounded.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        dates = list(dates)
+        n_topics, n_steps = matrix.shape
+        if n_topics < 2 or n_steps < 2:
+            return []
+
+        crossovers = []
+        rows_per_chunk = max(1, max_chunk_elements // (n_topics * n_steps))
+        for start in range(0, n_topics - 1, rows_per_chunk):
+            stop = min(start + rows_per_chunk, n_topics - 1)
+            # diff[a, b - start - 1, t] = topic a minus topic b, for b > a only
+            diff = matrix[start:stop, None, :] - matrix[None, start + 1:, :]
+            signs = np.sign(diff)
+            changed = signs[:, :, 1:] != signs[:, :, :-1]
+            # Keep the upper triangle (b > a) within this block
+            changed &= (np.arange(start, stop)[:, None] < np.arange(start + 1, n_topics)[None, :])[:, :, None]
+
+            a_idx, b_off, t_idx = np.nonzero(changed)
+            after = diff[a_idx, b_off, t_idx + 1]
+            keep = np.abs(after) >= min_magnitude
+            a_idx, b_idx, t_idx, after = a_idx[keep] + start, b_off[keep] + start + 1, t_idx[keep], after[keep]
+
+            for a, b, t, d in zip(a_idx.tolist(), b_idx.tolist(), t_idx.tolist(), after.tolist()):
+                winner, loser = (topics[a], topics[b]) if d > 0 else (topics[b], topics[a])
+                crossovers.append({
+                    "date": dates[t],
+                    "topic_a": topics[a],
+                    "topic_b": topics[b],
+                    "winner": winner,
+                    "event": f"{winner} overtook {loser}",
+                    "magnitude": abs(d)
+                })
+
+        return crossovers
+
+class OnlineChangepointDetector:
+    """
+    FR-3.1.1 (streaming): Bayesian online changepoint detection (Adams & MacKay 2007)
+    for one topic's bucketed paper counts, using a Poisson-Gamma conjugate model.
+
+    The run-length distribution is truncated to MAX_RUN_LENGTH, so both the state
+    and the cost of update() are bounded regardless of how long the topic has been tracked.
+    """
+    MAX_RUN_LENGTH = 120
+    HAZARD = 1 / 60 # Prior expectation of a regime change every ~60 buckets
+    PRIOR_ALPHA = 1.0
+    PRIOR_BETA = 1.0
+    MIN_SEGMENT = 3 # Buckets a new regime must last before it is classified
+    HISTORY_LENGTH = 240 # Raw counts kept for before/after comparisons
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state or {}
+        self.t = state.get("t", 0)
+        self.log_probs = np.array(state.get("log_probs", [0.0]))
+        self.alpha = np.array(state.get("alpha", [self.PRIOR_ALPHA]))
+        self.beta = np.array(state.get("beta", [self.PRIOR_BETA]))
+        self.history = list(state.get("history", []))
+        self.segment_start = state.get("segment_start", 0)
+        self.previous_segment_start = state.get("previous_segment_start", 0)
+        self.flagged = state.get("flagged", True)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "t": self.t,
+            "log_probs": self.log_probs.tolist(),
+            "alpha": self.alpha.tolist(),
+            "beta": self.beta.tolist(),
+            "history": self.history,
+            "segment_start": self.segment_start,
+            "previous_segment_start": self.previous_segment_start,
+            "flagged": self.flagged
+        }
+
+    def update(self, count: float) -> Optional[Dict[str, Any]]:
+        """
+        Consume the count of the next time bucket.
+        Returns a classified changepoint once a new regime has lasted MIN_SEGMENT buckets.
+        """
+        # Negative binomial posterior predictive of the count under each run length
+        p = self.beta / (self.beta + 1)
+        log_pred = (special.gammaln(count + self.alpha) - special.gammaln(self.alpha) - special.gammaln(count + 1)
+                    + self.alpha * np.log(p) + count * np.log1p(-p))
+
+        log_growth = self.log_probs + log_pred + np.log1p(-self.HAZARD)
+        log_cp = special.logsumexp(self.log_probs + log_pred + np.log(self.HAZARD))
+        log_probs = np.append(log_cp, log_growth)
+        alpha = np.append(self.PRIOR_ALPHA, self.alpha + count)
+        beta = np.append(self.PRIOR_BETA, self.beta + 1)
+
+        if len(log_probs) > self.MAX_RUN_LENGTH:
+            # Fold the tail mass into the longest kept run length
+            log_probs[self.MAX_RUN_LENGTH - 1] = special.logsumexp(log_probs[self.MAX_RUN_LENGTH - 1:])
+            log_probs, alpha, beta = (a[:self.MAX_RUN_LENGTH] for a in (log_probs, alpha, beta))
+
+        self.log_probs = log_probs - special.logsumexp(log_probs)
+        self.alpha, self.beta = alpha, beta
+
+        self.history.append(float(count))
+        if len(self.history) > self.HISTORY_LENGTH:
+            self.history.pop(0)
+
+        # Most probable run length tells us where the current regime started.
+        # A MAP at the truncation boundary means "longer than we track", i.e. no new regime,
+        # and small jitters of the estimated start are not treated as a new regime either.
+        run_length = int(np.argmax(self.log_probs)) # Number of latest buckets in the current regime
+        start = self.t - run_length + 1
+        if run_length < self.MAX_RUN_LENGTH - 1 and start >= self.segment_start + self.MIN_SEGMENT:
+            self.previous_segment_start, self.segment_start = self.segment_start, start
+            self.flagged = False
+
+        event = None
+        if not self.flagged and self.t - self.segment_start + 1 >= self.MIN_SEGMENT:
+            self.flagged = True
+            offset = self.t + 1 - len(self.history) # Absolute index of history[0]
+            before = np.array(self.history[max(self.previous_segment_start - offset, 0):max(self.segment_start - offset, 0)])
+            after = np.array(self.history[self.segment_start - offset:])
+            if len(before) > 0:
+                event = {
+                    "index": self.segment_start,
+                    "type": ChangepointService()._classify_changepoint(before, after),
+                    "mean_before": float(np.mean(before)),
+                    "mean_after": float(np.mean(after))
+                }
+
+        self.t += 1
+        return event
+
+
+def _detect_row(args) -> List[Dict[str, Any]]:
+    """Process pool worker: detect changepoints for one topic row."""
+    row, dates, model = args
+    return ChangepointService().detect_changepoints(row, dates, model=model)
+
+def persist_changepoints(db: Session, results: Dict[str, List[Dict[str, Any]]], data_version: int):
+    """Replace the stored changepoints of the given topics with fresh results."""
+    if results:
+        db.query(TopicChangepoint).filter(TopicChangepoint.topic.in_(list(results.keys()))).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(TopicChangepoint, [
+        {
+            "topic": topic,
+            "date": pd.Timestamp(cp["date"]).date(),
+            "series_index": int(cp["index"]),
+            "type": cp["type"],
+            "p_value": float(cp["p_value"]),
+            "mean_before": float(cp["mean_before"]),
+            "mean_after": float(cp["mean_after"]),
+            "data_version": data_version,
+            "detected_at": now
+        }
+        for topic, cps in results.items() for cp in cps
+    ])
+    db.commit()
+
+def run_changepoint_detection(max_workers: Optional[int] = None, until_id: Optional[int] = None) -> int:
+    """
+    Scheduled job: detect changepoints for all topics and persist them. Returns the number of topics.
+    max_workers: processes of the detection pool, all cores by default.
+    until_id: count only papers with ids up to it.
+    """
+    from .timeseries import load_topic_month_matrix
+    from .data_version import get_data_version
+
+    db = SessionLocal()
+    try:
+        version = get_data_version()
+        topics, months, matrix = load_topic_month_matrix(db, until_id)
+        if not topics:
+            logger.info("No papers available for changepoint detection.")
+            return 0
+        results = ChangepointService().detect_changepoints_batch(matrix, months, topics, max_workers=max_workers)
+        persist_changepoints(db, results, version)
+        logger.info(f"Stored changepoints for {len(topics)} topics (data version {version}).")
+        return len(topics)
+    finally:
+        db.close()
+
+def _late_arrivals(db: Session, states: Dict[str, TopicStreamState], until_id: int) -> Dict[str, float]:
+    """Per topic, papers added since its last update whose bucket it had already consumed."""
+    from .timeseries import primary_category
+
+    tracked = [s for s in states.values() if s.last_paper_id is not None]
+    if not tracked:
+        return {}
+    # Every update advances all topics together, so their marks agree
+    since_id = min(s.last_paper_id for s in tracked)
+    oldest = min(s.last_bucket for s in tracked) - timedelta(days=LATE_ARRIVAL_DAYS)
+    rows = db.query(Paper.published_date, Paper.categories, func.count(Paper.id).label('count')).filter(
+        Paper.id > since_id, Paper.id <= until_id, Paper.published_date > oldest,
+        Paper.published_date <= max(s.last_bucket for s in tracked)
+    ).group_by(Paper.published_date, Paper.categories).all()
+
+    late: Dict[str, float] = {}
+    for r in rows:
+        record = states.get(primary_category(r.categories))
+        if (record is not None and record.last_paper_id is not None and r.published_date <= record.last_bucket
+                and r.published_date > record.last_bucket - timedelta(days=LATE_ARRIVAL_DAYS)):
+            late[record.topic] = late.get(record.topic, 0) + r.count
+    return late
+
+def run_online_changepoint_update(db: Optional[Session] = None, until_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Ingest hook: feed every closed daily bucket since the last update into each topic's
+    online detector and store emerging events. Returns the new events.
+
+    Papers up to until_id (default: the newest) are counted. A paper added after its
+    bucket was consumed is counted in the first bucket of the next update.
+    """
+    import json
+    from .corpus_snapshot import committed_paper_id
+    from .timeseries import primary_category
+
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        states = {s.topic: s for s in db.query(TopicStreamState).all()}
+        last_closed = date.today() - timedelta(days=SETTLE_DAYS)
+        if until_id is None:
+            until_id = committed_paper_id(db)
+
+        if states:
+            cursor = min(s.last_bucket for s in states.values())
+        else:
+            first = db.query(func.min(Paper.published_date)).scalar()
+            if first is None:
+                return []
+            cursor = first - timedelta(days=1)
+        if cursor >= last_closed:
+            # Nothing to feed; late arrivals wait for the next bucket
+            return []
+
+        # Papers above until_id are left for the next update, as late arrivals if need be
+        rows = db.query(Paper.published_date, Paper.categories, func.count(Paper.id).label('count')).filter(
+            Paper.published_date > cursor, Paper.published_date <= last_closed, Paper.id <= until_id
+        ).group_by(Paper.published_date, Paper.categories).all()
+
+        counts: Dict[str, Dict[date, float]] = {}
+        for r in rows:
+            by_day = counts.setdefault(primary_category(r.categories), {})
+            by_day[r.published_date] = by_day.get(r.published_date, 0) + r.count
+        late = _late_arrivals(db, states, until_id)
+
+        events = []
+        now = datetime.utcnow()
+        for topic in set(states) | set(counts):
+            record = states.get(topic)
+            if record is None:
+                detector = OnlineChangepointDetector()
+                if states:
+                    # Topic appeared after tracking started: it had no papers before
+                    for _ in range(NEW_TOPIC_BASELINE):
+                        detector.update(0)
+                start = min(counts[topic])
+                record = TopicStreamState(topic=topic)
+                db.add(record)
+            else:
+                detector = OnlineChangepointDetector(json.loads(record.state))
+                start = record.last_bucket + timedelta(days=1)
+
+            by_day = counts.get(topic, {})
+            day = start
+            while day <= last_closed:
+                count = by_day.get(day, 0) + (late.pop(topic, 0) if day == start else 0)
+                event = detector.update(count)
+                if event and event["type"] in EMERGING_TYPES:
+                    event_date = day - timedelta(days=detector.t - 1 - event["index"])
+                    events.append({"topic": topic, "date": event_date, **event})
+                    db.add(TopicEvent(topic=topic, date=event_date, type=event["type"],
+                                      mean_before=event["mean_before"], mean_after=event["mean_after"], detected_at=now))
+                day += timedelta(days=1)
+
+            record.state = json.dumps(detector.to_state())
+            if start <= last_closed: # Its late arrivals were fed
+                record.last_paper_id = until_id
+            record.last_bucket = last_closed
+            record.updated_at = now
+
+        db.commit()
+        if events:
+            logger.info(f"Online changepoint detection flagged {len(events)} emerging events.")
+        return events
+    finally:
+        if own_session:
+            db.close()
@@ -0,0 +1,196 @@
+"""
+Citation Importer
+Streams a local citation dump (OpenAlex / Semantic Scholar style JSONL, optionally gzipped)
+and loads the citation edges between papers of our corpus (FR-4.2.1).
+
+Each line is one work, e.g.
+    {"id": "W123", "doi": "https://doi.org/10.1/x", "ids": {"pmid": "...", "arxiv": "..."},
+     "referenced_works": ["W456", ...]}
+Semantic Scholar's "externalids" / "references" keys are accepted as well.
+
+Two passes over the file keep memory bounded by the size of our corpus, not the dump:
+1. match dump works to Paper rows by DOI, PubMed id or arXiv id
+2. stream references, counting citations of our papers and inserting edges between them
+
+Usage (from the backend directory):
+    python -m services.citation_importer /path/to/works.jsonl.gz
+"""
+import argparse
+import gzip
+import json
+import logging
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import Paper, Author, paper_authors, citations, SessionLocal, init_db
+from .data_version import bump_analytics_version
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50000
+ARXIV_DOI_PREFIX = "10.48550/arxiv."
+ARXIV_ID = re.compile(r"(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(v\d+)?$", re.IGNORECASE)
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    if not doi:
+        return None
+    doi = doi.strip().lower()
+    for prefix in ("https://doi.org/", "http://doi.org/", "doi:"):
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi or None
+
+def normalize_arxiv_id(value: Optional[str]) -> Optional[str]:
+    """'http://arxiv.org/abs/2401.01234v2', 'arXiv:2401.01234' -> '2401.01234'"""
+    if not value:
+        return None
+    match = ARXIV_ID.search(value.strip())
+    return match.group(1).lower() if match else None
+
+def normalize_pmid(value) -> Optional[str]:
+    if not value:
+        return None
+    digits = re.search(r"(\d+)/?$", str(value).strip())
+    return digits.group(1) if digits else None
+
+def paper_keys(source: str, external_id: str, doi: Optional[str]) -> List[Tuple[str, str]]:
+    """Match keys for one of our papers, in the same form as work_keys produces."""
+    keys = []
+    if doi:
+        keys.append(("doi", normalize_doi(doi)))
+    if source == "arxiv":
+        arxiv_id = normalize_arxiv_id(external_id)
+        if arxiv_id:
+            keys.append(("arxiv", arxiv_id))
+    elif external_id and external_id.startswith("PMID:"):
+        keys.append(("pmid", external_id[len("PMID:"):]))
+    elif external_id and external_id.startswith("DOI:"):
+        keys.append(("doi", normalize_doi(external_id[len("DOI:"):])))
+    return keys
+
+def work_keys(work: Dict) -> List[Tuple[str, str]]:
+    ids = {k.lower(): v for k, v in (work.get("ids") or work.get("externalids") or {}).items()}
+    keys = []
+    doi = normalize_doi(work.get("doi") or ids.get("doi"))
+    if doi:
+        keys.append(("doi", doi))
+        if doi.startswith(ARXIV_DOI_PREFIX):
+            keys.append(("arxiv", doi[len(ARXIV_DOI_PREFIX):]))
+    pmid = normalize_pmid(ids.get("pmid") or ids.get("pubmed"))
+    if pmid:
+        keys.append(("pmid", pmid))
+    arxiv_id = normalize_arxiv_id(ids.get("arxiv"))
+    if arxiv_id:
+        keys.append(("arxiv", arxiv_id))
+    return keys
+
+def work_id(work: Dict) -> Optional[str]:
+    value = work.get("id") or work.get("corpusid") or work.get("paperId")
+    return str(value) if value is not None else None
+
+def work_references(work: Dict) -> List[str]:
+    refs = work.get("referenced_works") or work.get("references") or []
+    # Semantic Scholar nests references as objects
+    return [str(r.get("paperId") or r.get("corpusid")) if isinstance(r, dict) else str(r) for r in refs]
+
+def iter_works(path: str) -> Iterator[Dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed line {line_number}")
+
+def load_paper_index(db: Session) -> Dict[Tuple[str, str], int]:
+    index = {}
+    for paper_id, source, external_id, doi in db.query(Paper.id, Paper.source, Paper.external_id, Paper.doi).yield_per(BATCH_SIZE):
+        for key in paper_keys(source, external_id, doi):
+            index[key] = paper_id
+    return index
+
+def insert_ignore(db: Session, table, rows: List[Dict]):
+    """Bulk insert, skipping rows that violate the primary key (re-imports are idempotent)."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.execute(insert(table).on_conflict_do_nothing(), rows)
+
+def import_citations(db: Session, path: str) -> Dict[str, int]:
+    paper_index = load_paper_index(db)
+    logger.info(f"Indexed {len(paper_index)} match keys for our papers")
+
+    # Pass 1: dump work id -> our paper id
+    work_to_paper: Dict[str, int] = {}
+    for work in iter_works(path):
+        wid = work_id(work)
+        if wid is None:
+            continue
+        for key in work_keys(work):
+            if key in paper_index:
+                work_to_paper[wid] = paper_index[key]
+                break
+    logger.info(f"Matched {len(work_to_paper)} dump works to papers")
+
+    # Pass 2: count citations of our papers and insert edges between them
+    max_paper_id = db.query(func.max(Paper.id)).scalar() or 0
+    counts = np.zeros(max_paper_id + 1, dtype=np.int64)
+    batch, edges, works = [], 0, 0
+    for work in iter_works(path):
+        works += 1
+        citing = work_to_paper.get(work_id(work))
+        cited_ids = {work_to_paper[r] for r in work_references(work) if r in work_to_paper}
+        for cited in cited_ids:
+            counts[cited] += 1
+            if citing is not None and citing != cited:
+                batch.append({"citing_paper_id": citing, "cited_paper_id": cited})
+        if len(batch) >= BATCH_SIZE:
+            insert_ignore(db, citations, batch)
+            db.commit()
+            edges += len(batch)
+            batch = []
+    insert_ignore(db, citations, batch)
+    edges += len(batch)
+
+    cited = np.flatnonzero(counts)
+    for start in range(0, len(cited), BATCH_SIZE):
+        ids = cited[start:start + BATCH_SIZE]
+        db.bulk_update_mappings(Paper, [{"id": int(i), "citation_count": int(counts[i])} for i in ids])
+    db.commit()
+
+    update_author_citation_counts(db)
+    bump_analytics_version()
+    logger.info(f"Imported {edges} citation edges from {works} works; {len(cited)} papers cited")
+    return {"works": works, "matched": len(work_to_paper), "edges": edges, "cited_papers": int(len(cited))}
+
+def update_author_citation_counts(db: Session):
+    """Author.citation_count = sum of citation_count over the author's papers, in one statement."""
+    total = db.query(func.coalesce(func.sum(Paper.citation_count), 0)).join(
+        paper_authors, paper_authors.c.paper_id == Paper.id
+    ).filter(paper_authors.c.author_id == Author.id).scalar_subquery()
+    db.query(Author).update({Author.citation_count: total}, synchronize_session=False)
+    db.commit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import citations from a local JSONL dump")
+    parser.add_argument("path", help="Path to a .jsonl or .jsonl.gz works dump")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        print(import_citations(db, args.path))
+        from .network_service import update_citation_cache
+        update_citation_cache(db)
+    finally:
+        db.close()
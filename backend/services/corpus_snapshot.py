@@ -0,0 +1,240 @@
+"""
+Corpus Snapshot
+Columnar, memory-mapped copy of the paper corpus for analytics jobs.
+
+Each column is a raw little-endian binary file under data/snapshot/, appended to after
+every ingest. meta.json records how many rows are valid and is replaced atomically last,
+so readers (any number of worker processes mapping the files read-only) never observe
+a half-written append.
+
+Appends, like the pipeline checkpoints, only move forward through paper ids, so they must
+never pass an id that can still be committed: see committed_paper_id.
+"""
+import json
+import os
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import DB_DIR, Paper, paper_authors, SessionLocal
+from .timeseries import primary_category
+
+try:
+    import fcntl
+except ImportError: # Windows: fall back to the in-process lock only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join(DB_DIR, "snapshot")
+MISSING_DATE = np.iinfo(np.int32).min
+EPOCH = pd.Timestamp("1970-01-01").date()
+
+# Column name -> dtype. author_ptr has one more entry than there are papers (CSR offsets).
+COLUMNS = {
+    "ids": np.int64,
+    "dates": np.int32, # Days since 1970-01-01, MISSING_DATE if unknown
+    "category_codes": np.int32, # Index into meta["categories"] (primary category)
+    "source_codes": np.int8, # Index into meta["sources"]
+    "author_ptr": np.int64, # Papers i's authors are author_idx[author_ptr[i]:author_ptr[i + 1]]
+    "author_idx": np.int64, # Author ids
+}
+
+# How long an ingest transaction may stay open after inserting a paper (see committed_paper_id)
+COMMIT_GRACE = timedelta(seconds=int(os.environ.get("COMMIT_GRACE_SECONDS", "300")))
+
+_write_lock = threading.Lock()
+
+def committed_paper_id(db: Session) -> int:
+    """
+    Highest paper id below which no more papers can appear: the high-water mark for
+    incremental consumers. SQLite has one writer at a time, so ids commit in order and
+    it is the newest id. Elsewhere ids are drawn from a sequence when a paper is inserted
+    but become visible when its transaction commits, possibly after a higher id of another
+    collector; only papers inserted at least COMMIT_GRACE ago are assumed committed.
+    """
+    query = db.query(func.max(Paper.id))
+    if db.get_bind().dialect.name != "sqlite":
+        query = query.filter(Paper.ingestion_date <= datetime.utcnow() - COMMIT_GRACE)
+    return query.scalar() or 0
+
+class CorpusSnapshot:
+    def __init__(self, path: str, meta: Dict):
+        self.path = path
+        self.meta = meta
+        self.categories: List[str] = meta["categories"]
+        self.sources: List[str] = meta["sources"]
+        n = meta["n_papers"]
+        lengths = {name: n for name in COLUMNS}
+        lengths["author_ptr"] = n + 1
+        lengths["author_idx"] = meta["n_author_links"]
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, _map_column(path, name, dtype, lengths[name]))
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, until_id: Optional[int] = None) -> Optional["CorpusSnapshot"]:
+        """
+        Map the snapshot read-only. Returns None if no snapshot has been built yet.
+        until_id: only papers with ids up to it, so a pipeline run sees the corpus it started with.
+        """
+        path = path or SNAPSHOT_DIR
+        meta = _read_meta(path)
+        if not meta:
+            return None
+        snapshot = cls(path, meta)
+        if until_id is not None:
+            snapshot = snapshot.head(int(np.searchsorted(snapshot.ids, until_id, side='right')))
+        return snapshot
+
+    def head(self, n_papers: int) -> "CorpusSnapshot":
+        """The first n_papers papers (rows are in id order)."""
+        if n_papers >= len(self):
+            return self
+        n_links = int(self.author_ptr[n_papers]) if n_papers else 0
+        return CorpusSnapshot(self.path, {**self.meta, "n_papers": n_papers, "n_author_links": n_links})
+
+    def __len__(self) -> int:
+        return self.meta["n_papers"]
+
+    def months(self) -> np.ndarray:
+        """Month index (months since 1970-01) per paper, -1 where the date is missing."""
+        valid = self.dates != MISSING_DATE
+        months = np.full(len(self), -1, dtype=np.int64)
+        months[valid] = self.dates[valid].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return months
+
+    def topic_month_matrix(self) -> Tuple[List[str], pd.DatetimeIndex, np.ndarray]:
+        """Vectorized equivalent of timeseries.build_topic_month_matrix."""
+        months = self.months()
+        valid = months >= 0
+        if not valid.any():
+            return [], pd.DatetimeIndex([]), np.zeros((0, 0))
+
+        months, codes = months[valid], self.category_codes[valid]
+        first = months.min()
+        n_months = int(months.max() - first + 1)
+        flat = np.bincount(codes * n_months + (months - first), minlength=len(self.categories) * n_months)
+        matrix = flat.reshape(len(self.categories), n_months).astype(float)
+
+        # Keep the alphabetical topic order of the ORM path, dropping categories with no dated papers
+        order = [i for i in np.argsort(self.categories) if matrix[i].any()]
+        index = pd.date_range(pd.Timestamp(np.datetime64(int(first), 'M')), periods=n_months, freq='MS')
+        return [self.categories[i] for i in order], index, matrix[order]
+
+    def paper_author_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(paper row, author id) for every authorship, expanded from the CSR arrays."""
+        counts = np.diff(self.author_ptr)
+        return np.repeat(np.arange(len(self)), counts), np.asarray(self.author_idx)
+
+def _map_column(path: str, name: str, dtype, length: int) -> np.ndarray:
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(length,))
+
+def _read_meta(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_meta(path: str, meta: Dict):
+    tmp_path = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+def update_snapshot(db: Session, path: Optional[str] = None, batch_size: int = 50000,
+                    until_id: Optional[int] = None) -> int:
+    """
+    Append papers ingested since the last update (ids are monotonic) to the snapshot, up to
+    until_id, by default the committed_paper_id. Returns the number of appended papers.
+    """
+    path = path or SNAPSHOT_DIR
+    if until_id is None:
+        until_id = committed_paper_id(db)
+    os.makedirs(path, exist_ok=True)
+    with _write_lock, open(os.path.join(path, ".lock"), "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        meta = _read_meta(path) or {
+            "n_papers": 0, "n_author_links": 0, "last_paper_id": 0, "categories": [], "sources": []
+        }
+        # Drop bytes from any append that crashed before meta.json was replaced
+        _truncate_columns(path, meta)
+
+        category_codes = {c: i for i, c in enumerate(meta["categories"])}
+        source_codes = {s: i for i, s in enumerate(meta["sources"])}
+        appended = 0
+
+        while True:
+            rows = db.query(Paper.id, Paper.published_date, Paper.categories, Paper.source).filter(
+                Paper.id > meta["last_paper_id"], Paper.id <= until_id
+            ).order_by(Paper.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            ids = np.array([r.id for r in rows], dtype=np.int64)
+            links = db.query(paper_authors.c.paper_id, paper_authors.c.author_id).filter(
+                paper_authors.c.paper_id.between(int(ids[0]), int(ids[-1]))
+            ).order_by(paper_authors.c.paper_id).all()
+            link_papers = np.array([l.paper_id for l in links], dtype=np.int64)
+            link_authors = np.array([l.author_id for l in links], dtype=np.int64)
+
+            columns = {
+                "ids": ids,
+                "dates": np.array([(r.published_date - EPOCH).days if r.published_date else MISSING_DATE for r in rows], dtype=np.int32),
+                "category_codes": np.array([_code(category_codes, primary_category(r.categories)) for r in rows], dtype=np.int32),
+                "source_codes": np.array([_code(source_codes, r.source or "") for r in rows], dtype=np.int8),
+                # Offsets continue from the last stored one; the first snapshot also writes the leading 0
+                "author_ptr": meta["n_author_links"] + np.cumsum(np.searchsorted(link_papers, ids, side='right') - np.searchsorted(link_papers, ids, side='left')),
+                "author_idx": link_authors,
+            }
+            if meta["n_papers"] == 0:
+                columns["author_ptr"] = np.concatenate([[0], columns["author_ptr"]])
+
+            for name, values in columns.items():
+                with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                    f.write(np.ascontiguousarray(values, dtype=COLUMNS[name]).tobytes())
+
+            meta.update({
+                "n_papers": meta["n_papers"] + len(ids),
+                "n_author_links": meta["n_author_links"] + len(link_authors),
+                "last_paper_id": int(ids[-1]),
+                "categories": list(category_codes),
+                "sources": list(source_codes),
+            })
+            _write_meta(path, meta)
+            appended += len(ids)
+
+        if appended:
+            logger.info(f"Appended {appended} papers to the corpus snapshot ({meta['n_papers']} total).")
+        return appended
+
+def _code(codes: Dict[str, int], value: str) -> int:
+    if value not in codes:
+        codes[value] = len(codes)
+    return codes[value]
+
+def _truncate_columns(path: str, meta: Dict):
+    lengths = {name: meta["n_papers"] for name in COLUMNS}
+    lengths["author_ptr"] = meta["n_papers"] + 1 if meta["n_papers"] else 0
+    lengths["author_idx"] = meta["n_author_links"]
+    for name, dtype in COLUMNS.items():
+        file_path = os.path.join(path, f"{name}.bin")
+        expected = lengths[name] * np.dtype(dtype).itemsize
+        if os.path.exists(file_path) and os.path.getsize(file_path) != expected:
+            os.truncate(file_path, expected)
+
+def run_snapshot_update():
+    """Ingest hook: bring the columnar snapshot up to date."""
+    db = SessionLocal()
+    try:
+        update_snapshot(db)
+    finally:
+        db.close()
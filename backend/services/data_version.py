@@ -0,0 +1,81 @@
+"""
+Data Version
+A monotonically increasing counter that changes whenever new papers are ingested.
+Derived artifacts (changepoints, forecasts, ...) are stored together with the version
+they were computed from, so readers can tell whether they are stale.
+Together with the analytics version they also validate cached API responses (http_cache).
+
+The counters are rows of data_versions rather than files in the data directory: with a
+shared database, collectors and API workers on different hosts see the same versions.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from database import DataVersion, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DATA = "data"
+# Changes when derived columns the API serves (citation counts, influence scores) are recomputed
+ANALYTICS = "analytics"
+
+def _read_all() -> Dict[str, Tuple[int, float]]:
+    """Counter name -> (version, time it last changed)."""
+    db = SessionLocal()
+    try:
+        return {r.name: (r.version or 0, r.changed_at.replace(tzinfo=timezone.utc).timestamp() if r.changed_at else 0.0)
+                for r in db.query(DataVersion).all()}
+    finally:
+        db.close()
+
+def _bump(name: str) -> int:
+    """Increment a counter in one UPDATE, so concurrent bumps from several hosts all count."""
+    db = SessionLocal()
+    try:
+        for _ in range(2):
+            now = datetime.utcnow()
+            updated = db.execute(update(DataVersion).where(DataVersion.name == name).values(
+                version=DataVersion.version + 1, changed_at=now))
+            if updated.rowcount:
+                db.commit()
+                return db.get(DataVersion, name).version
+            db.add(DataVersion(name=name, version=1, changed_at=now))
+            try:
+                db.commit()
+                return 1
+            except IntegrityError:
+                # Another process created the row first: increment it
+                db.rollback()
+        raise RuntimeError(f"Could not bump the {name} version")
+    finally:
+        db.close()
+
+def versions() -> Tuple[int, int, float]:
+    """(data version, analytics version, time either last changed), in one query."""
+    rows = _read_all()
+    data, data_changed = rows.get(DATA, (0, 0.0))
+    analytics, analytics_changed = rows.get(ANALYTICS, (0, 0.0))
+    return data, analytics, max(data_changed, analytics_changed)
+
+def get_data_version() -> int:
+    """Return the current data version (0 if nothing has been ingested yet)."""
+    return versions()[0]
+
+def bump_data_version() -> int:
+    """Increment the data version after an ingest."""
+    version = _bump(DATA)
+    logger.info(f"Data version bumped to {version}")
+    return version
+
+def get_analytics_version() -> int:
+    return versions()[1]
+
+def bump_analytics_version() -> int:
+    """Increment the analytics version after derived columns were updated."""
+    return _bump(ANALYTICS)
+
+def last_changed() -> float:
+    """Time either version last changed (0 if neither has)."""
+    return versions()[2]
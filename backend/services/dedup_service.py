@@ -0,0 +1,146 @@
+"""
+Cross-Source Duplicate Detection (FR-1.2.1)
+The same work often arrives from arXiv and from PubMed under different external ids. Before
+a collector inserts a paper, DuplicateResolver looks for the work already in the corpus:
+1. an indexed match on the normalized DOI
+2. a MinHash signature of the title and abstract, looked up in a banded LSH index
+   (minhash_buckets) and confirmed by the estimated Jaccard similarity of the signatures
+
+Each step is a handful of indexed lookups, so the cost per new paper does not grow with the
+corpus. A match is recorded in paper_duplicates, linked to the canonical paper, instead of
+being inserted. Papers that are inserted are added to the index; the signatures pipeline
+stage indexes papers loaded by other means (bulk imports, papers from before this existed).
+"""
+import hashlib
+import logging
+import re
+import zlib
+from typing import List, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from database import Paper, PaperAbstract, PaperDuplicate, PaperSignature, minhash_buckets
+from .citation_importer import insert_ignore, normalize_doi
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 16 # x 8 rows: pairs above ~0.7 Jaccard become candidates
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+DUPLICATE_THRESHOLD = 0.8
+MAX_CANDIDATES = 50
+INDEX_BATCH = 2000 # Papers per transaction when backfilling signatures
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures are persisted and must stay comparable across processes
+_rng = np.random.RandomState(20240101)
+_A = _rng.randint(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+class Match(NamedTuple):
+    canonical_id: int
+    method: str
+    similarity: float
+
+def normalize_text(text: Optional[str]) -> List[str]:
+    return re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split()
+
+def shingles(text: str) -> np.ndarray:
+    """32-bit hashes of the word n-grams (the words themselves for very short texts)."""
+    words = normalize_text(text)
+    if len(words) >= SHINGLE_WORDS:
+        words = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    # crc32, not hash(): str hashes are salted per process
+    return np.unique(np.array([zlib.crc32(w.encode()) for w in words], dtype=np.uint64))
+
+def minhash(title: str, abstract: Optional[str]) -> Optional[np.ndarray]:
+    """NUM_PERM uint32 minimums of universal hashes (a*x + b) mod p over the shingles, None for empty text."""
+    values = shingles(f"{title or ''} {abstract or ''}")
+    if not len(values):
+        return None
+    # a, x < 2^32, so a*x + b fits in uint64
+    hashed = (np.outer(_A, values) + _B[:, None]) % np.uint64(_PRIME) & _MAX_HASH
+    return hashed.min(axis=1).astype(np.uint32)
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """Signed 64-bit key of each band (fits a BIGINT column)."""
+    return [int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "little", signed=True)
+            for band in signature.reshape(BANDS, ROWS)]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity: the share of equal minimums."""
+    return float(np.mean(a == b))
+
+def index_signature(db: Session, paper_id: int, signature: np.ndarray):
+    insert_ignore(db, PaperSignature.__table__, [{"paper_id": paper_id, "signature": signature.tobytes()}])
+    insert_ignore(db, minhash_buckets, [{"band": band, "bucket": key, "paper_id": paper_id}
+                                        for band, key in enumerate(band_keys(signature))])
+
+class DuplicateResolver:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def seen(self, external_id: str) -> bool:
+        """Already recorded as a duplicate by an earlier run."""
+        return self.db.query(PaperDuplicate.id).filter(PaperDuplicate.external_id == external_id).first() is not None
+
+    def find(self, doi: Optional[str], title: str, abstract: Optional[str]) -> Optional[Match]:
+        doi = normalize_doi(doi)
+        if doi:
+            paper_id = self.db.query(Paper.id).filter(Paper.doi == doi).order_by(Paper.id).limit(1).scalar()
+            if paper_id is not None:
+                return Match(paper_id, "doi", 1.0)
+
+        signature = minhash(title, abstract)
+        if signature is None:
+            return None
+        keys = band_keys(signature)
+        candidates = select(minhash_buckets.c.paper_id).where(or_(*[
+            and_(minhash_buckets.c.band == band, minhash_buckets.c.bucket == key) for band, key in enumerate(keys)
+        ])).distinct().limit(MAX_CANDIDATES)
+        best = None
+        for paper_id, data in self.db.query(PaperSignature.paper_id, PaperSignature.signature).filter(
+            PaperSignature.paper_id.in_(candidates)
+        ):
+            score = similarity(signature, np.frombuffer(data, dtype=np.uint32))
+            if score >= DUPLICATE_THRESHOLD and (best is None or score > best.similarity):
+                best = Match(paper_id, "minhash", score)
+        return best
+
+    def record(self, source: str, external_id: str, doi: Optional[str], match: Match) -> PaperDuplicate:
+        duplicate = PaperDuplicate(source=source, external_id=external_id, doi=normalize_doi(doi),
+                                   canonical_id=match.canonical_id, method=match.method, similarity=match.similarity)
+        self.db.add(duplicate)
+        self.db.commit()
+        logger.info(f"{external_id} duplicates paper {match.canonical_id} ({match.method}, {match.similarity:.2f})")
+        return duplicate
+
+    def index(self, paper_id: int, title: str, abstract: Optional[str]):
+        """Add a newly inserted (flushed) paper to the LSH index."""
+        signature = minhash(title, abstract)
+        if signature is not None:
+            index_signature(self.db, paper_id, signature)
+
+def index_papers(db: Session, since_id: int, until_id: int) -> int:
+    """Index papers in the id range that have no signature yet, a batch per transaction. Returns the number indexed."""
+    from .abstract_store import decompress
+
+    indexed = 0
+    last_id = since_id
+    while True:
+        rows = db.query(Paper.id, Paper.title, PaperAbstract.data, PaperAbstract.dictionary_id).outerjoin(
+            PaperAbstract, PaperAbstract.paper_id == Paper.id
+        ).outerjoin(PaperSignature, PaperSignature.paper_id == Paper.id).filter(
+            Paper.id > last_id, Paper.id <= until_id, PaperSignature.paper_id.is_(None)
+        ).order_by(Paper.id).limit(INDEX_BATCH).all()
+        if not rows:
+            return indexed
+        last_id = rows[-1].id
+        for paper_id, title, data, dictionary_id in rows:
+            signature = minhash(title, decompress(db, data, dictionary_id) if data else None)
+            if signature is not None:
+                index_signature(db, paper_id, signature)
+                indexed += 1
+        db.commit()
@@ -8,10 +8,18 @@ import logging
 from typing import List, Dict
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, func, desc
-from database import Paper, UserProfile
+from database import Paper, ProfileRecommendation
+from .metrics import track_llm_call
+from .timeseries import year_of, month_of
+from .abstract_store import truncate
+from .search_index import abstract_matches
+from .profile_service import get_profile, DEFAULT_USER
 
 logger = logging.getLogger(__name__)
 
+# Columns of paper list items, selected instead of whole entities
+LIST_COLUMNS = (Paper.id, Paper.title, Paper.abstract_preview, Paper.venue, Paper.source, Paper.published_date)
+
 # Try to import Gemini
 try:
     import google.generativeai as genai
@@ -32,26 +40,20 @@ def search_papers(db: Session, query: str, limit: int = 20) -> List[Dict]:
     if not keywords:
         return []
     
-    # Build OR filter for title and abstract
-    filters = []
-    for kw in keywords:
-        filters.append(Paper.title.ilike(f"%{kw}%"))
-        filters.append(Paper.abstract.ilike(f"%{kw}%"))
-    
-    papers = db.query(Paper).filter(or_(*filters)).order_by(desc(Paper.published_date)).limit(limit).all()
-    
-    results = []
-    for p in papers:
-        results.append({
-            "id": p.id,
-            "title": p.title,
-            "abstract": p.abstract[:300] + "..." if p.abstract and len(p.abstract) > 300 else p.abstract,
-            "venue": p.venue or p.source.upper(),
-            "date": p.published_date.isoformat() if p.published_date else None,
-            "categories": p.categories
-        })
+    # Build OR filter for title and abstract (full abstracts are stored compressed: their words are indexed)
+    filters = [Paper.title.ilike(f"%{kw}%") for kw in keywords]
+    filters.append(abstract_matches(db, keywords))
+    
+    rows = db.query(*LIST_COLUMNS, Paper.categories).filter(or_(*filters)).order_by(desc(Paper.published_date)).limit(limit).all()
     
-    return results
+    return [{
+        "id": paper_id,
+        "title": title,
+        "abstract": preview,
+        "venue": venue or source.upper(),
+        "date": published_date.isoformat() if published_date else None,
+        "categories": categories
+    } for paper_id, title, preview, venue, source, published_date, categories in rows]
 
 def get_topic_clusters(db: Session) -> List[Dict]:
     """
@@ -72,7 +74,7 @@ def get_topic_clusters(db: Session) -> List[Dict]:
         primary_cat = r.categories.split(',')[0].strip()
         
         # Get sample papers for this topic
-        sample_papers = db.query(Paper).filter(
+        sample_papers = db.query(Paper.id, Paper.title).filter(
             Paper.categories.like(f"%{primary_cat}%")
         ).order_by(desc(Paper.published_date)).limit(3).all()
         
@@ -84,12 +86,12 @@ def get_topic_clusters(db: Session) -> List[Dict]:
     
     return topics
 
-def get_research_insights(db: Session) -> Dict:
+def get_research_insights(db: Session, user: str = DEFAULT_USER) -> Dict:
     """
     Generate research insights using LLM based on collected papers and user profile.
     """
     # Get user profile
-    profile = db.query(UserProfile).first()
+    profile = get_profile(db, user)
     user_interests = ""
     if profile:
         user_interests = f"Title: {profile.title}\nProposal: {profile.proposal}"
@@ -140,7 +142,8 @@ Provide a JSON response with:
 RESPOND WITH RAW JSON ONLY. NO MARKDOWN.
 """
             
-            response = model.generate_content(prompt)
+            with track_llm_call("research_insights"):
+                response = model.generate_content(prompt)
             content = response.text.replace("```json", "").replace("```", "").strip()
             result = json.loads(content)
             
@@ -161,15 +164,34 @@ RESPOND WITH RAW JSON ONLY. NO MARKDOWN.
     
     return insights
 
-def get_recommended_papers(db: Session, limit: int = 10) -> List[Dict]:
+def get_recommended_papers(db: Session, limit: int = 10, user: str = DEFAULT_USER) -> List[Dict]:
     """
     Get papers recommended for the user based on their profile.
     """
-    profile = db.query(UserProfile).first()
-    
+    profile = get_profile(db, user)
+    
+    if profile is not None:
+        # Precomputed by the recommendations stage (see recommendation_service)
+        scored = db.query(*LIST_COLUMNS, ProfileRecommendation.score).join(
+            ProfileRecommendation, ProfileRecommendation.paper_id == Paper.id
+        ).filter(ProfileRecommendation.profile_id == profile.id).order_by(
+            ProfileRecommendation.score.desc()
+        ).limit(limit).all()
+        if scored:
+            return [{
+                "id": paper_id,
+                "title": title,
+                "abstract": truncate(preview, 200),
+                "venue": venue or source.upper(),
+                "date": published_date.isoformat() if published_date else None,
+                "relevance": "High",
+                "score": score
+            } for paper_id, title, preview, venue, source, published_date, score in scored]
+    
+    # Until then, keyword matching
     if not profile or not profile.title:
         # Return recent papers if no profile
-        papers = db.query(Paper).order_by(desc(Paper.published_date)).limit(limit).all()
+        rows = db.query(*LIST_COLUMNS).order_by(desc(Paper.published_date)).limit(limit).all()
     else:
         # Extract keywords from profile
         keywords = []
@@ -179,39 +201,41 @@ def get_recommended_papers(db: Session, limit: int = 10) -> List[Dict]:
             keywords.extend([w for w in profile.proposal.split()[:20] if len(w) > 4])
         
         if keywords:
-            filters = []
-            for kw in keywords[:10]:  # Limit keywords
-                filters.append(Paper.title.ilike(f"%{kw}%"))
-                filters.append(Paper.abstract.ilike(f"%{kw}%"))
+            keywords = keywords[:10]  # Limit keywords
+            filters = [Paper.title.ilike(f"%{kw}%") for kw in keywords]
+            filters.append(abstract_matches(db, keywords))
             
-            papers = db.query(Paper).filter(or_(*filters)).order_by(desc(Paper.published_date)).limit(limit).all()
+            rows = db.query(*LIST_COLUMNS).filter(or_(*filters)).order_by(desc(Paper.published_date)).limit(limit).all()
         else:
-            papers = db.query(Paper).order_by(desc(Paper.published_date)).limit(limit).all()
+            rows = db.query(*LIST_COLUMNS).order_by(desc(Paper.published_date)).limit(limit).all()
     
+    relevance = "High" if profile and profile.title else "Recent"
     return [{
-        "id": p.id,
-        "title": p.title,
-        "abstract": p.abstract[:200] + "..." if p.abstract and len(p.abstract) > 200 else p.abstract,
-        "venue": p.venue or p.source.upper(),
-        "date": p.published_date.isoformat() if p.published_date else None,
-        "relevance": "High" if profile and profile.title else "Recent"
-    } for p in papers]
+        "id": paper_id,
+        "title": title,
+        "abstract": truncate(preview, 200),
+        "venue": venue or source.upper(),
+        "date": published_date.isoformat() if published_date else None,
+        "relevance": relevance
+    } for paper_id, title, preview, venue, source, published_date in rows]
 
 def get_trend_analysis(db: Session) -> Dict:
     """
     Analyze publication trends over time.
     """
     # Monthly publication counts
+    year, month = year_of(Paper.published_date).label('year'), month_of(Paper.published_date).label('month')
     monthly = db.query(
-        func.strftime('%Y-%m', Paper.published_date).label('month'),
+        year,
+        month,
         func.count(Paper.id).label('count')
-    ).group_by('month').order_by('month').all()
+    ).group_by(year, month).order_by(year, month).all()
     
     # Topic growth (compare recent vs older)
     total = db.query(Paper).count()
     
     return {
-        "monthly_counts": [{"month": m.month, "count": m.count} for m in monthly if m.month],
+        "monthly_counts": [{"month": f"{m.year:04d}-{m.month:02d}", "count": m.count} for m in monthly if m.year],
         "total_papers": total,
         "growth_rate": "Calculating..." if total < 50 else f"{total // 12} papers/month average"
     }
@@ -1,8 +1,12 @@
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import logging
-from typing import List
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
 import os
+from .metrics import EMBEDDING_TEXTS, EMBEDDING_SECONDS, init_worker_process
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -12,21 +16,112 @@ logger = logging.getLogger(__name__)
 # 'all-MiniLM-L6-v2' is standard for speed/performance trade-off (384 dimensions)
 MODEL_NAME = 'all-MiniLM-L6-v2'
 
+# CPU inference settings:
+# - EMBEDDING_BACKEND: torch, onnx, or onnx-int8 (the model's dynamically quantized ONNX
+#   export; needs onnxruntime, `pip install sentence-transformers[onnx]`, else torch is used).
+#   Check speed and agreement with torch on the target CPU with benchmarks.embedding
+# - EMBEDDING_WORKERS: encoding processes, 0 (default) for one per core
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_INT8_FILE = os.environ.get("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_WORKERS = int(os.environ.get("EMBEDDING_WORKERS", 0))
+# Batches are cut by padded tokens (size x longest text), not by count
+TOKEN_BUDGET = 16384
+MAX_BATCH = 256
+
+def load_model(backend: str = EMBEDDING_BACKEND) -> SentenceTransformer:
+    if backend.startswith("onnx"):
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            logger.warning("onnxruntime is not installed; using the torch backend.")
+            backend = "torch"
+    if backend == "onnx-int8":
+        return SentenceTransformer(MODEL_NAME, backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE})
+    if backend == "onnx":
+        return SentenceTransformer(MODEL_NAME, backend="onnx")
+    return SentenceTransformer(MODEL_NAME)
+
+def token_batches(lengths: np.ndarray, token_budget: int = TOKEN_BUDGET, max_batch: int = MAX_BATCH) -> List[np.ndarray]:
+    """
+    Text indices grouped into batches of similar length, longest first. A batch holds as many
+    texts as fit token_budget once padded to its longest, so short texts go in large batches
+    and no batch pads a short text to a long one.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch, token_budget // longest))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+# Pool workers load their own model once
+_worker_model = None
+
+def _init_worker(backend: str, threads: int):
+    global _worker_model
+    import torch
+    init_worker_process()
+    # Cores are split between the workers instead of every worker using all of them
+    torch.set_num_threads(threads)
+    _worker_model = load_model(backend)
+
+def _encode(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    return model.encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _encode(_worker_model, texts)
+
 class EmbeddingService:
-    def __init__(self):
-        logger.info(f"Loading SentenceTransformer model: {MODEL_NAME}")
+    def __init__(self, backend: str = EMBEDDING_BACKEND, workers: Optional[int] = None):
+        logger.info(f"Loading SentenceTransformer model: {MODEL_NAME} ({backend})")
         # In a real production environment, we might host this separately or use an API
         # For this setup, we load it in-memory.
-        self.model = SentenceTransformer(MODEL_NAME)
-        
-    def generate_embeddings(self, texts: List[str], batch_size: int = 100) -> np.ndarray:
+        self.model = load_model(backend)
+        self.backend = backend
+        workers = EMBEDDING_WORKERS if workers is None else workers
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn: torch's thread pools don't survive fork
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(self.backend, threads))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def generate_embeddings(self, texts: List[str], batch_size: int = MAX_BATCH) -> np.ndarray:
         """
-        Generate 384-dimensional embeddings for a list of texts (abstracts).
-        FR-2.1.1: Batch process embeddings (100 papers/batch)
+        Generate 384-dimensional embeddings for a list of texts (abstracts), in input order.
+        FR-2.1.1: Batch process embeddings, at most batch_size texts per batch
         """
-        logger.info(f"Generating embeddings for {len(texts)} texts with batch size {batch_size}")
+        logger.info(f"Generating embeddings for {len(texts)} texts")
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
         try:
-            embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=True)
+            start = time.perf_counter()
+            lengths = np.array([len(ids) for ids in self.model.tokenizer(
+                texts, truncation=True, max_length=self.model.max_seq_length)["input_ids"]])
+            batches = token_batches(lengths, max_batch=batch_size)
+            inputs = [[texts[i] for i in batch] for batch in batches]
+            if self.workers > 1 and len(batches) > 1:
+                results = self._get_pool().map(_encode_in_worker, inputs)
+            else:
+                results = (_encode(self.model, batch) for batch in inputs)
+
+            embeddings = np.empty((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            for batch, vectors in zip(batches, results):
+                embeddings[batch] = vectors
+            EMBEDDING_SECONDS.inc(time.perf_counter() - start)
+            EMBEDDING_TEXTS.inc(len(texts))
             return embeddings
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
@@ -0,0 +1,84 @@
+"""
+Embedding Store
+Append-only, memory-mapped store of paper embeddings (FR-2.1.1), laid out like the
+corpus snapshot: ids.bin (int64, ascending paper ids) and vectors.bin (float32 rows),
+with meta.json replaced last so readers never see a partial append.
+"""
+import json
+import os
+import threading
+import logging
+from typing import Dict, Optional
+import numpy as np
+from database import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIR = os.path.join(DB_DIR, "embeddings")
+
+_write_lock = threading.Lock()
+
+class EmbeddingStore:
+    def __init__(self, path: str, meta: Dict):
+        self.path = path
+        self.meta = meta
+        n, dim = meta["n"], meta["dim"]
+        if n:
+            self.ids = np.memmap(os.path.join(path, "ids.bin"), dtype=np.int64, mode='r', shape=(n,))
+            self.vectors = np.memmap(os.path.join(path, "vectors.bin"), dtype=np.float32, mode='r', shape=(n, dim))
+        else:
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["EmbeddingStore"]:
+        path = path or EMBEDDING_DIR
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return cls(path, json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def __len__(self) -> int:
+        return self.meta["n"]
+
+    @property
+    def last_paper_id(self) -> int:
+        return int(self.ids[-1]) if len(self) else 0
+
+    def lookup(self, paper_ids: np.ndarray) -> np.ndarray:
+        """Rows for the given paper ids (which must be present)."""
+        return np.asarray(self.vectors[np.searchsorted(self.ids, paper_ids)])
+
+def append_embeddings(paper_ids: np.ndarray, vectors: np.ndarray, model_name: str, path: Optional[str] = None) -> int:
+    """Append embeddings of papers newer than the last stored id. Returns the number appended."""
+    path = path or EMBEDDING_DIR
+    paper_ids = np.asarray(paper_ids, dtype=np.int64)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    os.makedirs(path, exist_ok=True)
+    with _write_lock:
+        store = EmbeddingStore.load(path)
+        meta = store.meta if store else {"n": 0, "dim": int(vectors.shape[1]), "model": model_name}
+        if meta["dim"] != vectors.shape[1] or meta["model"] != model_name:
+            raise ValueError(f"Embedding store holds {meta['model']} ({meta['dim']}d) vectors")
+
+        # Ids stay ascending so lookups can binary search
+        keep = paper_ids > (store.last_paper_id if store else 0)
+        paper_ids, vectors = paper_ids[keep], vectors[keep]
+        if len(paper_ids) == 0:
+            return 0
+
+        for name, values, itemsize in (("ids.bin", paper_ids, 8), ("vectors.bin", vectors, 4 * meta["dim"])):
+            file_path = os.path.join(path, name)
+            # Drop bytes from an append that crashed before meta.json was replaced
+            if os.path.exists(file_path) and os.path.getsize(file_path) != meta["n"] * itemsize:
+                os.truncate(file_path, meta["n"] * itemsize)
+            with open(file_path, "ab") as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+
+        meta["n"] += len(paper_ids)
+        tmp_path = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, "meta.json"))
+        return len(paper_ids)
@@ -1,37 +1,171 @@
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
+import numpy as np
 import pandas as pd
+import json
 import logging
-from typing import Dict, Any, List
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+from database import TopicForecast, ForecastModel, SessionLocal
+from .metrics import init_worker_process
 
 logger = logging.getLogger(__name__)
 
+SEASONAL_PERIODS = 12
+# ~95% prediction interval
+CONFIDENCE_Z = 1.96
+# Batches smaller than this are not worth the process pool startup cost
+MIN_PARALLEL_TOPICS = 8
+
 class ForecastingService:
-    def forecast_topic_trend(self, time_series: pd.Series, periods: int = 12) -> Dict[str, Any]:
+    def forecast_topic_trend(self, time_series: pd.Series, periods: int = 12, start_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         FR-3.2.1: Time-Series Prediction
         Note: Using Exponential Smoothing (Holt-Winters) as a robust alternative to ARIMA/Prophet
         that works well with smaller datasets and is lightweight. Prophet can be added if requirements strictly demand.
+        start_params: model_params of a previous fit, used to warm-start the optimizer.
         """
         if len(time_series) < 12:
              # Need enough data for seasonality
              return {"error": "Insufficient data"}
-             
+
         try:
             # Additive trend and seasonality
             model = ExponentialSmoothing(
-                time_series, 
-                seasonal_periods=12, 
-                trend='add', 
+                time_series,
+                seasonal_periods=SEASONAL_PERIODS,
+                trend='add',
                 seasonal='add'
-            ).fit()
-            
+            )
+            warm_start = self._start_vector(start_params)
+            if warm_start is not None:
+                # Skipping the brute-force grid search is where most of the time goes
+                model = model.fit(start_params=warm_start, use_brute=False)
+            else:
+                model = model.fit()
+
             forecast = model.forecast(periods)
-            
+
+            # Approximate prediction interval from the in-sample residual variance,
+            # widening with the square root of the horizon
+            sigma = np.sqrt(model.sse / len(time_series))
+            spread = CONFIDENCE_Z * sigma * np.sqrt(np.arange(1, periods + 1))
+
             return {
                 "forecast_dates": forecast.index.strftime('%Y-%m-%d').tolist(),
                 "forecast_values": forecast.values.tolist(),
-                "model_params": model.params
+                "lower": np.maximum(forecast.values - spread, 0).tolist(),
+                "upper": (forecast.values + spread).tolist(),
+                "sse": float(model.sse),
+                "model_params": self._params_to_dict(model.params)
             }
         except Exception as e:
             logger.error(f"Forecasting failed: {e}")
             return {"error": str(e)}
+
+    def _params_to_dict(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert statsmodels' params (NumPy scalars/arrays) into JSON-friendly values."""
+        result = {}
+        for key, value in params.items():
+            if isinstance(value, np.ndarray):
+                result[key] = [float(v) for v in value]
+            elif isinstance(value, (bool, np.bool_)) or value is None:
+                result[key] = None if value is None else bool(value)
+            else:
+                value = float(value)
+                result[key] = value if np.isfinite(value) else None
+        return result
+
+    def _start_vector(self, params: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Order expected by ExponentialSmoothing.fit(start_params=...) for an additive,
+        undamped trend + seasonal model: [alpha, beta, gamma, l0, b0, s0..s(m-1)].
+        """
+        if not params:
+            return None
+        keys = ["smoothing_level", "smoothing_trend", "smoothing_seasonal", "initial_level", "initial_trend"]
+        seasons = params.get("initial_seasons") or []
+        if any(params.get(k) is None for k in keys) or len(seasons) != SEASONAL_PERIODS:
+            return None
+        return np.array([params[k] for k in keys] + list(seasons))
+
+    def forecast_topics_batch(self, matrix: np.ndarray, months: pd.DatetimeIndex, topics: List[str], periods: int = 12,
+                              previous_params: Optional[Dict[str, Dict[str, Any]]] = None,
+                              max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        FR-3.2.1: Forecast every topic of a topic x month count matrix in a process pool,
+        warm-starting each fit from the previous run's parameters when available.
+        """
+        previous_params = previous_params or {}
+        months = pd.DatetimeIndex(months, freq='MS')
+        args = [(np.asarray(row, dtype=float), months, periods, previous_params.get(topic)) for topic, row in zip(topics, matrix)]
+
+        if len(topics) < MIN_PARALLEL_TOPICS or max_workers == 1:
+            results = [_forecast_row(a) for a in args]
+        else:
+            workers = max_workers or os.cpu_count() or 1
+            # Spawned, not forked: the pipeline calls this from one of several threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=init_worker_process) as pool:
+                results = list(pool.map(_forecast_row, args, chunksize=max(1, len(args) // (4 * workers))))
+
+        return dict(zip(topics, results))
+
+def _forecast_row(args) -> Dict[str, Any]:
+    """Process pool worker: forecast one topic row."""
+    row, months, periods, start_params = args
+    return ForecastingService().forecast_topic_trend(pd.Series(row, index=months), periods, start_params=start_params)
+
+def persist_forecasts(db: Session, results: Dict[str, Dict[str, Any]], data_version: int):
+    """Replace the stored forecasts and model parameters of the successfully fitted topics."""
+    fitted = {topic: r for topic, r in results.items() if "error" not in r}
+    if not fitted:
+        return
+
+    now = datetime.utcnow()
+    db.query(TopicForecast).filter(TopicForecast.topic.in_(list(fitted.keys()))).delete(synchronize_session=False)
+    db.query(ForecastModel).filter(ForecastModel.topic.in_(list(fitted.keys()))).delete(synchronize_session=False)
+    db.bulk_insert_mappings(ForecastModel, [{
+        "topic": topic,
+        "params": json.dumps(r["model_params"]),
+        "sse": r["sse"],
+        "data_version": data_version,
+        "fitted_at": now
+    } for topic, r in fitted.items()])
+    db.bulk_insert_mappings(TopicForecast, [{
+        "topic": topic,
+        "date": datetime.strptime(d, '%Y-%m-%d').date(),
+        "value": float(v),
+        "lower": float(lo),
+        "upper": float(hi),
+        "data_version": data_version
+    } for topic, r in fitted.items() for d, v, lo, hi in zip(r["forecast_dates"], r["forecast_values"], r["lower"], r["upper"])])
+    db.commit()
+
+def run_batch_forecasting(periods: int = 12, max_workers: Optional[int] = None, until_id: Optional[int] = None) -> int:
+    """
+    Scheduled job: forecast all topics, warm-started from the stored parameters. Returns the number fitted.
+    max_workers: processes of the forecasting pool, all cores by default.
+    until_id: count only papers with ids up to it.
+    """
+    from .timeseries import load_topic_month_matrix
+    from .data_version import get_data_version
+
+    db = SessionLocal()
+    try:
+        version = get_data_version()
+        topics, months, matrix = load_topic_month_matrix(db, until_id)
+        if not topics:
+            logger.info("No papers available for forecasting.")
+            return 0
+        previous = {m.topic: json.loads(m.params) for m in db.query(ForecastModel).all() if m.params}
+        results = ForecastingService().forecast_topics_batch(matrix, months, topics, periods, previous_params=previous, max_workers=max_workers)
+        persist_forecasts(db, results, version)
+        fitted = sum(1 for r in results.values() if "error" not in r)
+        logger.info(f"Stored forecasts for {fitted}/{len(topics)} topics (data version {version}).")
+        return fitted
+    finally:
+        db.close()
@@ -0,0 +1,88 @@
+"""
+HTTP Caching for Dashboard Aggregates
+The dashboard endpoints in CACHED_PATHS only change when papers are ingested or derived
+columns are recomputed, so their ETag is built from the data and analytics versions, and
+Last-Modified from when either last changed. A request whose If-None-Match (or, without
+one, If-Modified-Since) still matches gets a 304 before the handler runs: no query, no
+serialization. Clients revalidate on every use (Cache-Control: no-cache), so a new ingest
+is visible immediately.
+
+Full responses of these endpoints are brotli-compressed for clients that accept it when the
+optional brotli package is installed; everything else is left to GZipMiddleware.
+"""
+import logging
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Tuple
+from fastapi import Request, Response
+from .data_version import versions
+from .metrics import HTTP_CONDITIONAL_RESPONSES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CACHED_PATHS = frozenset({"/api/trends", "/api/stats", "/api/authors", "/api/topics/clusters"})
+# Smaller bodies aren't worth compressing
+COMPRESS_MIN_BYTES = 1024
+BROTLI_QUALITY = 5 # Of 11: the higher levels are too slow for per-request compression
+
+def validators() -> Tuple[str, float]:
+    """(weak ETag, last modified timestamp). Weak: the same data is served gzip, brotli or plain."""
+    data, analytics, changed = versions()
+    return f'W/"{data}.{analytics}"', changed
+
+def _opaque(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+def is_not_modified(request: Request, etag: str, modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [_opaque(t) for t in if_none_match.split(",")]
+        return "*" in tags or _opaque(etag) in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds
+        return datetime.fromtimestamp(int(modified), timezone.utc) <= since
+    return False
+
+async def _compress_brotli(response: Response) -> Response:
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+        headers["content-encoding"] = "br"
+        headers["vary"] = "Accept-Encoding"
+    return Response(body, status_code=response.status_code, headers=headers)
+
+async def conditional_get_middleware(request: Request, call_next):
+    path = request.url.path
+    if request.method not in ("GET", "HEAD") or path not in CACHED_PATHS:
+        return await call_next(request)
+
+    # Read before the handler runs: data changing meanwhile gets the older tag and is refetched next time
+    etag, modified = validators()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified:
+        headers["Last-Modified"] = formatdate(modified, usegmt=True)
+    if is_not_modified(request, etag, modified):
+        HTTP_CONDITIONAL_RESPONSES.labels(path, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    HTTP_CONDITIONAL_RESPONSES.labels(path, "full").inc()
+    response.headers.update(headers)
+    if brotli and "br" in request.headers.get("accept-encoding", ""):
+        response = await _compress_brotli(response)
+    return response
@@ -0,0 +1,198 @@
+"""
+On-Demand Jobs
+Manual collection, profile analysis and topic model retraining run as jobs instead of inside
+the request: submit() records a queued JobRun and hands it to a bounded process pool, and
+clients poll /api/jobs/{id} for status, progress, result and timing.
+
+Submitting a job while the same job with the same parameters is queued or running returns
+that run instead of starting another. The active run holds a unique dedup_key, cleared when
+it finishes, so this holds across API workers. Runs whose worker stopped sending heartbeats,
+or that sat in a queue that no longer exists, are marked failed and no longer block.
+
+A queued run lives only in the pool of the API process that submitted it, recorded as its
+owner. When that process is gone (crashed or restarted) on this host, the run is failed at
+startup or on the next submission; runs owned by other hosts expire after STALE_QUEUED_AFTER.
+
+Jobs in USER_JOBS work on one user's data; their runs record the submitting user, and only
+that user (or an admin) may read them.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import JobRun, SessionLocal
+from .metrics import init_worker_process
+from .scheduler import JOB_FUNCTIONS, JOB_HEARTBEAT_SECONDS, run_job
+
+logger = logging.getLogger(__name__)
+
+JOB_POOL_WORKERS = 2
+# A running job refreshes updated_at every JOB_HEARTBEAT_SECONDS
+STALE_RUNNING_AFTER = timedelta(seconds=JOB_HEARTBEAT_SECONDS * 10)
+STALE_QUEUED_AFTER = timedelta(hours=12)
+USER_JOBS = frozenset({"profile_analysis"})
+
+HOST = socket.gethostname()
+# The instance part tells this process from an earlier one that had the same pid (containers)
+OWNER = f"{HOST}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, like the scheduler: forking a process with live DB connections and threads is unsafe
+            _pool = ProcessPoolExecutor(JOB_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker_process)
+        return _pool
+
+def _dedup_key(job_id: str, params: Optional[Dict]) -> str:
+    return f"{job_id}:{json.dumps(params or {}, sort_keys=True)}"
+
+def _finish(db: Session, run: JobRun, error: str):
+    run.status = "failed"
+    run.error = error
+    run.finished_at = run.updated_at = datetime.utcnow()
+    run.dedup_key = None
+    db.commit()
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: # Alive, owned by another user
+        return True
+    return True
+
+def _owner_gone(owner: Optional[str]) -> bool:
+    """Whether the process that queued a run is known to be gone. Other hosts can't be checked."""
+    try:
+        host, pid, _ = owner.split(":")
+    except (AttributeError, ValueError):
+        return False
+    if host != HOST:
+        return False
+    if int(pid) == os.getpid():
+        return owner != OWNER
+    return not _pid_alive(int(pid))
+
+def _active_run(db: Session, key: str) -> Optional[JobRun]:
+    run = db.query(JobRun).filter(JobRun.dedup_key == key).first()
+    if run is None:
+        return None
+    if run.status == "queued" and _owner_gone(run.owner):
+        logger.warning(f"Job run {run.id} ({run.job_id}) was queued by a process that is gone; marking it failed.")
+        _finish(db, run, "Abandoned: the process that queued it stopped")
+        return None
+    last_seen = run.updated_at or run.submitted_at or run.started_at
+    stale_after = STALE_RUNNING_AFTER if run.status == "running" else STALE_QUEUED_AFTER
+    if last_seen and datetime.utcnow() - last_seen > stale_after:
+        logger.warning(f"Job run {run.id} ({run.job_id}) is stale; marking it failed.")
+        _finish(db, run, "Abandoned: its worker stopped responding")
+        return None
+    return run
+
+def submit(db: Session, job_id: str, params: Optional[Dict] = None, executor=None,
+           user: Optional[str] = None) -> Tuple[JobRun, bool]:
+    """
+    Queue a job unless an equivalent one is already queued or running.
+    Returns (run, created); created is False when the submission collapsed into an active run.
+    user: the submitting user, required for USER_JOBS.
+    """
+    if job_id not in JOB_FUNCTIONS:
+        raise KeyError(job_id)
+    if job_id in USER_JOBS and user is None:
+        raise ValueError(f"Job {job_id} needs the submitting user")
+    # Users' runs never collapse into each other
+    key = _dedup_key(job_id, params) + (f":{user}" if job_id in USER_JOBS else "")
+    for _ in range(3):
+        run = _active_run(db, key)
+        if run is not None:
+            return run, False
+        now = datetime.utcnow()
+        run = JobRun(job_id=job_id, status="queued", params=json.dumps(params) if params else None,
+                     dedup_key=key, owner=OWNER, user_key=user if job_id in USER_JOBS else None, submitted_at=now, updated_at=now, progress=0.0)
+        db.add(run)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # Another worker queued it first; return that run (or retry if it already finished)
+            db.rollback()
+    else:
+        raise RuntimeError(f"Could not submit job {job_id}")
+
+    future = (executor or _get_pool()).submit(run_job, job_id, run.id, params)
+    future.add_done_callback(lambda f, run_id=run.id: _on_done(run_id, f))
+    return run, True
+
+def _on_done(run_id: int, future: Future):
+    """run_job records its own outcome; this only catches runs that never got to (cancelled, crashed worker)."""
+    if not future.cancelled() and future.exception() is None:
+        return
+    db = SessionLocal()
+    try:
+        run = db.get(JobRun, run_id)
+        if run is not None and run.status in ("queued", "running"):
+            _finish(db, run, "Cancelled" if future.cancelled() else f"Worker failed: {future.exception()!r}")
+    finally:
+        db.close()
+
+def fail_orphaned_runs(db: Session) -> int:
+    """At startup: fail the queued runs of processes on this host that are gone. Returns how many."""
+    runs = db.query(JobRun).filter(JobRun.status == "queued", JobRun.owner.like(f"{HOST}:%")).all()
+    orphaned = [run for run in runs if _owner_gone(run.owner)]
+    for run in orphaned:
+        _finish(db, run, "Abandoned: the process that queued it stopped")
+    if orphaned:
+        logger.warning(f"Failed {len(orphaned)} job runs queued by stopped processes.")
+    return len(orphaned)
+
+def shutdown():
+    """Cancel queued jobs of this process and stop the pool without waiting for running ones."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def can_read(run: JobRun, user: str, admin: bool = False) -> bool:
+    """Runs of USER_JOBS are visible to their user only; other runs to everyone."""
+    return admin or run.user_key is None or run.user_key == user
+
+def serialize_run(run: JobRun, details: bool = True) -> Dict[str, Any]:
+    """details=False: the error without its traceback, for callers who aren't admins."""
+    queue_seconds = None
+    if run.submitted_at:
+        started = datetime.utcnow() if run.status == "queued" else run.started_at
+        queue_seconds = (started - run.submitted_at).total_seconds()
+    return {
+        "id": run.id,
+        "job_id": run.job_id,
+        "status": run.status,
+        "params": json.loads(run.params) if run.params else None,
+        "progress": run.progress,
+        "message": run.message,
+        "result": json.loads(run.result) if run.result else None,
+        "error": run.error if details or not run.error else run.error.strip().splitlines()[-1],
+        "submitted_at": _iso(run.submitted_at),
+        "started_at": _iso(run.started_at) if run.status != "queued" else None,
+        "finished_at": _iso(run.finished_at),
+        "queue_seconds": queue_seconds,
+        "duration_seconds": run.duration_seconds,
+        "worker": run.worker
+    }
@@ -0,0 +1,209 @@
+"""
+Emerging Keywords
+Which terms are suddenly spiking. A sparse term x month matrix of document frequencies
+(papers per month whose title or abstract contains the term) is extended at ingest with
+the new papers only, tokenized like the topic model's c-TF-IDF keywords. Ranking scores
+every term at once from two column sums, so it costs milliseconds for 100k terms.
+
+The matrix, its vocabulary and the papers per month live in one .npz file replaced
+atomically, so API workers always read a consistent version. Terms seen in fewer than
+MIN_TERM_PAPERS papers and not at all in the last PRUNE_AFTER_MONTHS are dropped at each
+update (typos, identifiers, one-off names), which keeps the vocabulary from growing with
+every ingest; a dropped term that comes back starts counting again from zero.
+"""
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from sqlalchemy.orm import Session
+from database import DB_DIR, Paper, PaperAbstract
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS_FILE = os.path.join(DB_DIR, "keywords.npz")
+RECENT_MONTHS = 3
+BASELINE_MONTHS = 12
+MIN_RECENT_PAPERS = 5
+MIN_TERM_PAPERS = 3
+PRUNE_AFTER_MONTHS = 24 # Longer than RECENT_MONTHS + BASELINE_MONTHS: rankings with the defaults are unaffected
+
+def make_vectorizer() -> CountVectorizer:
+    """FR-2.1.3: Tokenization of topic keywords, shared with TopicModelingService."""
+    return CountVectorizer(stop_words="english")
+
+def _month_index(value) -> int:
+    """Months since 1970-01."""
+    return (value.year - 1970) * 12 + value.month - 1
+
+class TermMonthMatrix:
+    def __init__(self, terms: np.ndarray, counts: sp.csc_matrix, papers: np.ndarray, first_month: int):
+        # Vocabulary, in order of first appearance. Objects, not fixed-width strings: one long
+        # term would pad every other to its length
+        self.terms = np.asarray(terms, dtype=object)
+        self.counts = counts # terms x months document frequencies; CSC, months are sliced
+        self.papers = papers # Papers per month
+        self.first_month = first_month # Month index of column 0
+
+    @classmethod
+    def empty(cls) -> "TermMonthMatrix":
+        return cls(np.array([], dtype=object), sp.csc_matrix((0, 0), dtype=np.int32), np.zeros(0, dtype=np.int64), 0)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["TermMonthMatrix"]:
+        path = path or KEYWORDS_FILE
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as f:
+            shape = tuple(f["shape"])
+            counts = sp.csc_matrix((f["data"], f["indices"], f["indptr"]), shape=shape)
+            if "terms" in f: # Written as fixed-width strings by earlier versions
+                terms = f["terms"]
+            else:
+                blob, offsets = f["term_bytes"].tobytes(), f["term_offsets"].tolist()
+                terms = [blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+            return cls(terms, counts, f["papers"], int(f["first_month"]))
+
+    def save(self, path: Optional[str] = None):
+        path = path or KEYWORDS_FILE
+        # np.savez appends .npz to names without it
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        # Terms as concatenated UTF-8 and offsets: object arrays would need pickle to load
+        encoded = [term.encode("utf-8") for term in self.terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        np.savez(tmp_path, term_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8), term_offsets=offsets, data=self.counts.data, indices=self.counts.indices,
+                 indptr=self.counts.indptr, shape=np.array(self.counts.shape), papers=self.papers,
+                 first_month=self.first_month)
+        os.replace(tmp_path, path)
+
+    def months(self) -> List[str]:
+        return [f"{1970 + m // 12:04d}-{m % 12 + 1:02d}" for m in range(self.first_month, self.first_month + len(self.papers))]
+
+    def add(self, texts: List[str], months: List[int]):
+        """Count each text's distinct terms in its month."""
+        if not texts:
+            return
+        analyze = make_vectorizer().build_analyzer()
+        vocabulary = {term: i for i, term in enumerate(self.terms.tolist())}
+        new_terms = []
+        rows, cols = [], []
+        for text, month in zip(texts, months):
+            for term in set(analyze(text)):
+                row = vocabulary.get(term)
+                if row is None:
+                    row = vocabulary[term] = len(vocabulary)
+                    new_terms.append(term)
+                rows.append(row)
+                cols.append(month)
+
+        first = min(months) if not len(self.papers) else min(self.first_month, min(months))
+        last = max(max(months), self.first_month + len(self.papers) - 1)
+        n_months = last - first + 1
+        shift = self.first_month - first if len(self.papers) else 0
+
+        counts = self.counts
+        if shift:
+            # Papers older than any seen so far: prepend empty months
+            counts = sp.hstack([sp.csc_matrix((counts.shape[0], shift), dtype=np.int32), counts], format="csc")
+        counts = sp.csc_matrix((counts.data, counts.indices, np.append(counts.indptr, [counts.nnz] * (n_months - counts.shape[1]))),
+                               shape=(len(vocabulary), n_months))
+        delta = sp.csc_matrix((np.ones(len(rows), dtype=np.int32), (rows, np.asarray(cols) - first)),
+                              shape=(len(vocabulary), n_months))
+        self.counts = (counts + delta).tocsc()
+
+        papers = np.zeros(n_months, dtype=np.int64)
+        papers[shift:shift + len(self.papers)] = self.papers
+        np.add.at(papers, np.asarray(months) - first, 1)
+        self.papers = papers
+        self.first_month = first
+        self.terms = np.concatenate([self.terms, np.array(new_terms, dtype=object)]) if new_terms else self.terms
+
+    def prune(self, min_papers: int = MIN_TERM_PAPERS, after_months: int = PRUNE_AFTER_MONTHS) -> int:
+        """Drop terms in fewer than min_papers papers and none of the last after_months. Returns the number dropped."""
+        recent = np.asarray(self.counts[:, max(len(self.papers) - after_months, 0):].sum(axis=1)).ravel()
+        total = np.asarray(self.counts.sum(axis=1)).ravel()
+        keep = (recent > 0) | (total >= min_papers)
+        dropped = int(len(keep) - keep.sum())
+        if dropped:
+            self.terms = self.terms[keep]
+            self.counts = self.counts[keep].tocsc()
+        return dropped
+
+    def burst_scores(self, recent_months: int = RECENT_MONTHS, baseline_months: int = BASELINE_MONTHS) -> Dict[str, np.ndarray]:
+        """
+        Per term: papers in the last recent_months, in the baseline_months before, the growth of
+        its share of papers, and a Poisson z-score of the recent count against the count
+        expected at the baseline share (add-one smoothed, so new terms score finitely).
+        """
+        end = len(self.papers)
+        split = max(end - recent_months, 0)
+        start = max(split - baseline_months, 0)
+        recent = np.asarray(self.counts[:, split:end].sum(axis=1)).ravel()
+        baseline = np.asarray(self.counts[:, start:split].sum(axis=1)).ravel()
+        recent_papers = self.papers[split:end].sum()
+        baseline_rate = (baseline + 1) / (self.papers[start:split].sum() + 1)
+        expected = baseline_rate * recent_papers
+        return {
+            "recent": recent,
+            "baseline": baseline,
+            "growth": recent / max(recent_papers, 1) / baseline_rate,
+            "score": (recent - expected) / np.sqrt(expected),
+        }
+
+    def emerging(self, limit: int = 50, recent_months: int = RECENT_MONTHS, baseline_months: int = BASELINE_MONTHS,
+                 min_recent: int = MIN_RECENT_PAPERS) -> List[Dict]:
+        if not len(self.terms) or not len(self.papers):
+            return []
+        scores = self.burst_scores(recent_months, baseline_months)
+        score = np.where(scores["recent"] >= min_recent, scores["score"], -np.inf)
+        limit = min(limit, int(np.isfinite(score).sum()))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-score, limit - 1)[:limit]
+        top = top[np.argsort(-score[top], kind="stable")]
+        return [{
+            "term": str(self.terms[i]),
+            "recent": int(scores["recent"][i]),
+            "baseline": int(scores["baseline"][i]),
+            "growth": float(scores["growth"][i]),
+            "score": float(scores["score"][i]),
+        } for i in top]
+
+def _paper_rows(db: Session, since_id: int, until_id: int) -> Tuple[List[str], List[int]]:
+    from .abstract_store import decompress
+
+    rows = db.query(Paper.title, Paper.published_date, PaperAbstract.data, PaperAbstract.dictionary_id).outerjoin(
+        PaperAbstract, PaperAbstract.paper_id == Paper.id
+    ).filter(Paper.id > since_id, Paper.id <= until_id, Paper.published_date.isnot(None)).order_by(Paper.id).all()
+    texts = [f"{r.title} {decompress(db, r.data, r.dictionary_id)}" if r.data else r.title for r in rows]
+    return texts, [_month_index(r.published_date) for r in rows]
+
+def update_keywords(db: Session, since_id: int, until_id: int, path: Optional[str] = None, batch_size: int = 20000) -> int:
+    """Add papers since_id < id <= until_id to the matrix. Returns the number of papers added."""
+    matrix = TermMonthMatrix.load(path) or TermMonthMatrix.empty()
+    added = 0
+    for start in range(since_id, until_id, batch_size):
+        texts, months = _paper_rows(db, start, min(start + batch_size, until_id))
+        matrix.add(texts, months)
+        added += len(texts)
+    dropped = matrix.prune()
+    matrix.save(path)
+    logger.info(f"Keyword matrix: {added} papers added, {dropped} rare terms dropped, {len(matrix.terms)} terms, "
+                f"{len(matrix.papers)} months")
+    return added
+
+_cache: Dict[str, Tuple[float, TermMonthMatrix]] = {}
+
+def cached_matrix(path: Optional[str] = None) -> Optional[TermMonthMatrix]:
+    """The matrix, reloaded only when the file has been replaced."""
+    path = path or KEYWORDS_FILE
+    try:
+        mtime = os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+    cached = _cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _cache[path] = (mtime, TermMonthMatrix.load(path))
+    return cached[1]
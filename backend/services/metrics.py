@@ -0,0 +1,249 @@
+"""
+Metrics
+Prometheus metrics for the API, database, collectors, LLM calls, embeddings and jobs,
+served in the text exposition format at /metrics.
+
+Jobs run in scheduler worker processes, and uvicorn may run several API workers, so the
+client runs in multiprocess mode: every process writes its samples to memory-mapped files
+under PROMETHEUS_MULTIPROC_DIR (data/metrics by default) and /metrics aggregates them.
+
+Pool workers come and go, each leaving files named after its pid. The API clears the
+directory at startup, and every scrape first folds the files of exited processes into one
+archive file per metric type, so the directory holds the live processes plus the archive.
+"""
+import glob
+import json
+import multiprocessing.util
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from database import DB_DIR, engine
+
+try:
+    import fcntl
+except ImportError: # Windows: compaction is not serialized across processes
+    fcntl = None
+
+# Must be set before prometheus_client is imported
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(DB_DIR, "metrics"))
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from prometheus_client.mmap_dict import MmapedDict
+from sqlalchemy import event
+
+# Summed across processes, so the samples of exited ones can be added into the archive
+ARCHIVED_TYPES = ("counter", "histogram")
+ARCHIVE_ID = "archive"
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "route", "status"])
+HTTP_REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per API request", ["method", "route"], buckets=QUERY_BUCKETS)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per API request", ["method", "route"])
+# result is not_modified (304, no handler ran) or full
+HTTP_CONDITIONAL_RESPONSES = Counter(
+    "http_conditional_responses_total", "Responses of endpoints served with ETags", ["route", "result"])
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed, in and outside requests")
+DB_QUERY_SECONDS = Counter("db_query_seconds_total", "Time spent in SQL statements")
+
+# FR-1.2.1: outcome is fetched, duplicate, invalid, inserted or error
+COLLECTOR_PAPERS = Counter("collector_papers_total", "Papers seen by the collectors", ["source", "outcome"])
+COLLECTOR_RATE_LIMIT_SECONDS = Counter(
+    "collector_rate_limit_wait_seconds_total", "Time collectors spent waiting on source rate limits", ["source"])
+
+LLM_REQUEST_SECONDS = Histogram("llm_request_duration_seconds", "LLM call latency", ["operation", "outcome"])
+EMBEDDING_TEXTS = Counter("embedding_texts_total", "Texts embedded")
+EMBEDDING_SECONDS = Counter("embedding_seconds_total", "Time spent generating embeddings")
+
+JOB_SECONDS = Histogram("scheduler_job_duration_seconds", "Scheduled job duration", ["job_id", "status"], buckets=JOB_BUCKETS)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "pipeline_stage_duration_seconds", "Post-ingest pipeline stage duration", ["stage", "status"], buckets=JOB_BUCKETS)
+
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# Set by the request middleware; shared with the threadpool running sync endpoints
+_request_queries: ContextVar[Optional[QueryStats]] = ContextVar("request_queries", default=None)
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.inc(elapsed)
+    stats = _request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+async def metrics_middleware(request, call_next):
+    stats = QueryStats()
+    token = _request_queries.set(stats)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _request_queries.reset(token)
+        # Route templates, not raw paths, to keep label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        if route != "/metrics":
+            HTTP_REQUEST_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
+            HTTP_REQUEST_QUERIES.labels(request.method, route).observe(stats.count)
+            HTTP_REQUEST_DB_SECONDS.labels(request.method, route).observe(stats.seconds)
+
+@contextmanager
+def track_llm_call(operation: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        LLM_REQUEST_SECONDS.labels(operation, outcome).observe(time.perf_counter() - start)
+
+def _multiproc_dir() -> str:
+    return os.environ["PROMETHEUS_MULTIPROC_DIR"]
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: # Alive, owned by another user
+        return True
+    return True
+
+def _process_files(path: str) -> List[Tuple[str, str, Optional[int]]]:
+    """(file, type, pid) of every sample file; pid is None for the archive."""
+    files = []
+    for f in glob.glob(os.path.join(path, "*.db")):
+        typ, _, ident = os.path.basename(f)[:-3].rpartition("_")
+        if ident == ARCHIVE_ID:
+            files.append((f, typ, None))
+        elif ident.isdigit():
+            files.append((f, typ, int(ident)))
+    return files
+
+@contextmanager
+def _dir_lock(path: str):
+    with open(os.path.join(path, "compact.lock"), "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def _finish_compaction(path: str):
+    """
+    Complete or roll back a compaction interrupted by a crash: the journal lists the
+    merged files, and the archive was replaced iff its temporary file is gone.
+    """
+    journal = os.path.join(path, "compact.json")
+    if not os.path.exists(journal):
+        return
+    with open(journal) as f:
+        pending = json.load(f)
+    for tmp_path, merged in pending.items():
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        else:
+            for f in merged:
+                if os.path.exists(f):
+                    os.remove(f)
+    os.remove(journal)
+
+def compact_dead_processes(path: Optional[str] = None) -> int:
+    """Add the samples of exited processes into the archive files. Returns the number of files folded in."""
+    path = path or _multiproc_dir()
+    with _dir_lock(path):
+        _finish_compaction(path)
+        dead = defaultdict(list)
+        archives = {}
+        for f, typ, pid in _process_files(path):
+            if typ not in ARCHIVED_TYPES:
+                continue
+            if pid is None:
+                archives[typ] = f
+            elif pid != os.getpid() and not _pid_alive(pid):
+                dead[typ].append(f)
+        if not dead:
+            return 0
+
+        # Counter and histogram samples (raw, per bucket) are sums over processes
+        pending: Dict[str, List[str]] = {}
+        for typ, files in dead.items():
+            totals: Dict[str, float] = defaultdict(float)
+            for f in files + ([archives[typ]] if typ in archives else []):
+                for key, value, _, _ in MmapedDict.read_all_values_from_file(f):
+                    totals[key] += value
+            tmp_path = os.path.join(path, f"{typ}_{ARCHIVE_ID}.db.{os.getpid()}.tmp")
+            archive = MmapedDict(tmp_path)
+            try:
+                for key, value in totals.items():
+                    archive.write_value(key, value, 0.0)
+            finally:
+                archive.close()
+            pending[tmp_path] = files
+
+        journal = os.path.join(path, "compact.json")
+        with open(f"{journal}.tmp", "w") as f:
+            json.dump(pending, f)
+        os.replace(f"{journal}.tmp", journal)
+        for tmp_path in pending:
+            typ = os.path.basename(tmp_path).split("_", 1)[0]
+            os.replace(tmp_path, os.path.join(path, f"{typ}_{ARCHIVE_ID}.db"))
+        _finish_compaction(path)
+        return sum(len(files) for files in pending.values())
+
+def clear_multiprocess_dir(path: Optional[str] = None):
+    """
+    At API startup, before any pool starts: drop the samples of earlier runs. Another API
+    worker that is already up keeps its files, and exited processes are folded in instead.
+    """
+    path = path or _multiproc_dir()
+    files = _process_files(path)
+    if any(pid not in (None, os.getpid()) and _pid_alive(pid) for _, _, pid in files):
+        compact_dead_processes(path)
+        return
+    with _dir_lock(path):
+        for f, _, pid in files:
+            # Our own files are open and still written to
+            if pid != os.getpid():
+                os.remove(f)
+        for f in glob.glob(os.path.join(path, "*.tmp")) + glob.glob(os.path.join(path, "compact.json")):
+            os.remove(f)
+
+def init_worker_process():
+    """
+    Pool worker initializer: tell prometheus_client when the worker exits. Workers end
+    through multiprocessing's exit handlers, not atexit.
+    """
+    multiprocessing.util.Finalize(None, multiprocess.mark_process_dead, args=(os.getpid(),), exitpriority=10)
+
+def render_metrics() -> bytes:
+    compact_dead_processes()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
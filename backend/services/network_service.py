@@ -1,11 +1,37 @@
 import networkx as nx
 import community.community_louvain as community_louvain
+import itertools
+import json
 import logging
-from typing import List, Dict, Any
+import os
+import threading
+import numpy as np
+from scipy import sparse
+from typing import List, Dict, Any, Optional, Tuple
 from collections import Counter
+from database import DB_DIR
+
+try:
+    import fcntl
+except ImportError: # Windows: fall back to the in-process lock only
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+NETWORK_DIR = os.path.join(DB_DIR, "network")
+# Also holds n_papers, the number of snapshot papers the matrix covers
+COAUTHOR_MATRIX_FILE = os.path.join(NETWORK_DIR, "coauthor_matrix.npz")
+CITATION_MATRIX_FILE = os.path.join(NETWORK_DIR, "citation_matrix.npz")
+# The partition and the number of snapshot papers it covers, in one file so they always agree
+PARTITION_FILE = os.path.join(NETWORK_DIR, "communities.npz")
+# Papers with more authors than this (consortium papers) would add O(k^2) edges that say
+# little about collaboration, so they are left out of the co-authorship graph
+MAX_AUTHORS_PER_PAPER = 50
+# Largest subgraph the API returns (top_subgraph, ego_network)
+MAX_SUBGRAPH_NODES = 1000
+
+_coauthor_lock = threading.Lock()
+
 class NetworkService:
     def __init__(self):
         pass
@@ -14,29 +40,54 @@ class NetworkService:
         """
         FR-4.1.1: Co-authorship Graph Construction
         """
-        G = nx.Graph()
+        paper_counts = Counter()
+        weights = Counter()
         
         for paper in papers:
             authors = paper.get("authors", [])
             # authors is list of strings or objects with names
             author_names = [a if isinstance(a, str) else a.name for a in authors]
+            paper_counts.update(author_names)
             
-            # Add nodes
-            for author in author_names:
-                if not G.has_node(author):
-                    G.add_node(author, paper_count=0)
-                G.nodes[author]['paper_count'] += 1
-            
-            # Add edges (cliques for each paper)
-            import itertools
-            for u, v in itertools.combinations(author_names, 2):
-                if G.has_edge(u, v):
-                    G[u][v]['weight'] += 1
-                else:
-                    G.add_edge(u, v, weight=1)
+            # Edges (cliques for each paper), keyed in sorted order so (u, v) == (v, u)
+            for u, v in itertools.combinations(sorted(author_names), 2):
+                weights[(u, v)] += 1
         
+        G = nx.Graph()
+        G.add_nodes_from((author, {"paper_count": count}) for author, count in paper_counts.items())
+        G.add_weighted_edges_from((u, v, w) for (u, v), w in weights.items())
         return G
 
+    def coauthorship_matrix(self, author_ptr: np.ndarray, author_idx: np.ndarray, n_authors: Optional[int] = None) -> sparse.csr_matrix:
+        """
+        FR-4.1.1: Weighted co-authorship adjacency from CSR paper->author arrays
+        (see CorpusSnapshot). Entry (u, v) counts the papers authors u and v share.
+        Pairs are expanded with NumPy, one group of papers with the same author count at a time.
+        """
+        author_ptr = np.asarray(author_ptr)
+        author_idx = np.asarray(author_idx)
+        if n_authors is None:
+            n_authors = int(author_idx.max()) + 1 if len(author_idx) else 0
+
+        counts = np.diff(author_ptr)
+        rows, cols = [], []
+        for k in np.unique(counts):
+            if k < 2 or k > MAX_AUTHORS_PER_PAPER:
+                continue
+            starts = author_ptr[:-1][counts == k]
+            # (papers, k) block of author ids, then every i < j column pair
+            block = author_idx[starts[:, None] + np.arange(k)]
+            i, j = np.triu_indices(k, 1)
+            rows.append(block[:, i].ravel())
+            cols.append(block[:, j].ravel())
+
+        if not rows:
+            return sparse.csr_matrix((n_authors, n_authors), dtype=np.int32)
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        upper = sparse.coo_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n_authors, n_authors)).tocsr()
+        # Duplicate (u, v) entries are summed by tocsr(); symmetrize for an undirected graph
+        return (upper + upper.T).tocsr()
+
     def calculate_influence_metrics(self, G: nx.Graph) -> Dict[str, Dict]:
         """
         FR-4.1.2: Author Influence Metrics
@@ -47,7 +98,8 @@ class NetworkService:
         betweenness = nx.betweenness_centrality(G, k=min(100, len(G))) # Approx for speed if large
         try:
             eigenvector = nx.eigenvector_centrality(G, max_iter=100)
-        except:
+        except nx.PowerIterationFailedConvergence as e:
+            logger.warning(f"Eigenvector centrality did not converge, using zeros: {e}")
             eigenvector = {n: 0 for n in G.nodes()} # Fallback if fails to converge
             
         pagerank = nx.pagerank(G)
@@ -62,6 +114,58 @@ class NetworkService:
             }
         return results
 
+    def calculate_influence_metrics_sparse(self, A: sparse.csr_matrix, damping: float = 0.85,
+                                           max_iter: int = 100, tol: float = 1e-6) -> Tuple[Dict[str, np.ndarray], Dict[str, Dict]]:
+        """
+        FR-4.1.2: Author Influence Metrics on a sparse weighted adjacency (see coauthorship_matrix).
+        Degree, eigenvector and PageRank centrality via sparse power iteration, so graphs with
+        millions of edges stay in C loops. Betweenness has no cheap sparse equivalent and is
+        left to calculate_influence_metrics on small graphs.
+        Returns (metrics, convergence) where metrics maps name -> per-node array.
+        """
+        A = sparse.csr_matrix(A, dtype=np.float64)
+        n = A.shape[0]
+        if n == 0:
+            empty = np.zeros(0)
+            return {"degree": empty, "eigenvector": empty, "pagerank": empty}, {}
+
+        degree = np.diff(A.indptr).astype(float) / max(n - 1, 1)
+
+        # Eigenvector: iterate (A + I) x like networkx, which avoids oscillation on bipartite components
+        x = np.full(n, 1.0 / n)
+        eigen_report = {"converged": False}
+        for i in range(1, max_iter + 1):
+            x_last = x
+            x = A @ x_last + x_last
+            x /= np.linalg.norm(x) or 1.0
+            error = np.abs(x - x_last).sum()
+            if error < n * tol:
+                eigen_report = {"converged": True}
+                break
+        eigen_report.update({"iterations": i, "error": float(error)})
+
+        # PageRank: row-normalized transitions; dangling nodes teleport uniformly
+        strength = np.asarray(A.sum(axis=1)).ravel()
+        dangling = strength == 0
+        inv_strength = np.divide(1.0, strength, out=np.zeros(n), where=~dangling)
+        AT = A.T.tocsr()
+        p = np.full(n, 1.0 / n)
+        pagerank_report = {"converged": False}
+        for i in range(1, max_iter + 1):
+            p_last = p
+            p = damping * (AT @ (p_last * inv_strength)) + (damping * p_last[dangling].sum() + 1 - damping) / n
+            error = np.abs(p - p_last).sum()
+            if error < n * tol:
+                pagerank_report = {"converged": True}
+                break
+        pagerank_report.update({"iterations": i, "error": float(error)})
+
+        for name, report in (("eigenvector", eigen_report), ("pagerank", pagerank_report)):
+            if not report["converged"]:
+                logger.warning(f"{name} power iteration did not converge: {report}")
+
+        return {"degree": degree, "eigenvector": x, "pagerank": p}, {"eigenvector": eigen_report, "pagerank": pagerank_report}
+
     def detect_communities(self, G: nx.Graph) -> Dict[str, int]:
         """
         FR-4.1.3: Research Community Detection
@@ -73,6 +177,61 @@ class NetworkService:
         partition = community_louvain.best_partition(G, weight='weight')
         return partition
 
+    def detect_communities_incremental(self, A: sparse.csr_matrix, previous: Optional[np.ndarray] = None,
+                                       changed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FR-4.1.3: Louvain on a sparse adjacency, warm-started from a previous partition.
+        previous[i] is author i's community id (-1 for none). Only the communities that
+        contain a changed author (plus the changed authors themselves) are re-detected;
+        every other author keeps its community.
+        Returns (partition, affected) where affected lists the re-detected authors.
+        Community ids are kept stable where a re-detected community is mostly an old one.
+        """
+        A = sparse.csr_matrix(A)
+        n = A.shape[0]
+        connected = np.diff(A.indptr) > 0
+        partition = np.full(n, -1, dtype=np.int64)
+
+        if previous is None or changed is None:
+            affected = np.flatnonzero(connected)
+        else:
+            partition[:min(n, len(previous))] = previous[:n]
+            touched = np.unique(partition[changed])
+            affected = np.union1d(changed, np.flatnonzero(np.isin(partition, touched[touched >= 0])))
+            affected = affected[connected[affected]]
+        if len(affected) == 0:
+            return partition, affected
+
+        G = nx.from_scipy_sparse_array(A[affected][:, affected])
+        # Warm start: keep old communities, new authors start as singletons
+        next_label = int(partition.max()) + 1
+        init = {}
+        for local, author in enumerate(affected):
+            if partition[author] >= 0:
+                init[local] = int(partition[author])
+            else:
+                init[local] = next_label
+                next_label += 1
+        local_partition = community_louvain.best_partition(G, partition=init, weight='weight', random_state=42)
+
+        labels = np.array([local_partition[i] for i in range(len(affected))])
+        old_ids = partition[affected].copy()
+        partition[affected] = -1
+        used = set(np.unique(partition[partition >= 0]).tolist())
+        next_id = max(int(old_ids.max()) if len(old_ids) else -1, int(partition.max())) + 1
+        # Largest new communities claim their majority old id first
+        for label in sorted(np.unique(labels), key=lambda l: -np.count_nonzero(labels == l)):
+            members = labels == label
+            olds = old_ids[members]
+            olds = olds[olds >= 0]
+            candidate = int(np.bincount(olds).argmax()) if len(olds) else -1
+            if candidate < 0 or candidate in used:
+                candidate, next_id = next_id, next_id + 1
+            used.add(candidate)
+            partition[affected[members]] = candidate
+
+        return partition, affected
+
     def build_citation_network(self, papers: List[Dict]) -> nx.DiGraph:
         """
         FR-4.2.1: Citation Graph Construction (Directed)
@@ -91,3 +250,342 @@ class NetworkService:
                 G.add_edge(paper_id, cited_id)
                 
         return G
+
+def update_coauthorship_cache(until_id: Optional[int] = None) -> sparse.csr_matrix:
+    """
+    Ingest hook: add the co-authorship edges of papers appended to the corpus snapshot
+    since the last update (up to until_id if given) to the cached adjacency matrix.
+    The only writer of the cache; readers use get_coauthorship_matrix.
+    """
+    os.makedirs(NETWORK_DIR, exist_ok=True)
+    with _coauthor_lock, open(os.path.join(NETWORK_DIR, "coauthor.lock"), "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return _update_coauthorship_cache(until_id)
+
+def _update_coauthorship_cache(until_id: Optional[int]) -> sparse.csr_matrix:
+    from .corpus_snapshot import CorpusSnapshot
+
+    snapshot = CorpusSnapshot.load(until_id=until_id)
+    matrix, done = _load_cached_matrix()
+    if snapshot is None or len(snapshot) <= done:
+        return matrix
+
+    ptr = np.asarray(snapshot.author_ptr[done:])
+    new_idx = np.asarray(snapshot.author_idx[ptr[0]:ptr[-1]])
+    n_authors = max(matrix.shape[0], int(new_idx.max()) + 1 if len(new_idx) else 0)
+    delta = NetworkService().coauthorship_matrix(ptr - ptr[0], new_idx, n_authors)
+
+    matrix = _resize(matrix, n_authors) + delta
+    tmp_path = f"{COAUTHOR_MATRIX_FILE}.{os.getpid()}.tmp.npz"
+    # save_npz's layout plus the paper count: one file replaced atomically, so a crash can't
+    # leave a matrix and a count that disagree (and the next run re-adding the same papers)
+    np.savez(tmp_path, format=matrix.format.encode("ascii"), shape=matrix.shape, data=matrix.data,
+             indices=matrix.indices, indptr=matrix.indptr, n_papers=len(snapshot))
+    os.replace(tmp_path, COAUTHOR_MATRIX_FILE)
+    logger.info(f"Co-authorship cache updated with {len(snapshot) - done} papers ({matrix.nnz // 2} edges).")
+    return matrix
+
+def _resize(matrix: sparse.csr_matrix, n: int) -> sparse.csr_matrix:
+    if matrix.shape[0] == n:
+        return matrix
+    matrix = matrix.copy()
+    matrix.resize((n, n))
+    return matrix
+
+def _load_cached_matrix() -> Tuple[sparse.csr_matrix, int]:
+    """Cached adjacency and the number of snapshot papers it covers."""
+    try:
+        with np.load(COAUTHOR_MATRIX_FILE) as f:
+            if "n_papers" not in f:
+                # Written before the count moved into the file: rebuild rather than double count
+                return sparse.csr_matrix((0, 0), dtype=np.int32), 0
+            done = int(f["n_papers"])
+        return sparse.load_npz(COAUTHOR_MATRIX_FILE).tocsr(), done
+    except FileNotFoundError:
+        return sparse.csr_matrix((0, 0), dtype=np.int32), 0
+
+_matrix_cache: Dict[str, Tuple[float, sparse.csr_matrix]] = {}
+
+def _load_matrix_file(path: str) -> sparse.csr_matrix:
+    """Cached matrix for API reads, reloaded only when the file changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except FileNotFoundError:
+        return sparse.csr_matrix((0, 0), dtype=np.int32)
+    cached = _matrix_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, sparse.load_npz(path).tocsr())
+        _matrix_cache[path] = cached
+    return cached[1]
+
+def get_coauthorship_matrix() -> sparse.csr_matrix:
+    return _load_matrix_file(COAUTHOR_MATRIX_FILE)
+
+def get_citation_matrix() -> sparse.csr_matrix:
+    """Directed citation adjacency: row = citing paper id, column = cited paper id."""
+    return _load_matrix_file(CITATION_MATRIX_FILE)
+
+_transpose_cache: Dict[int, sparse.csr_matrix] = {}
+
+def get_cited_by_matrix() -> sparse.csr_matrix:
+    """Transpose of the citation matrix (row = cited paper), cached alongside it."""
+    matrix = get_citation_matrix()
+    if id(matrix) not in _transpose_cache:
+        _transpose_cache.clear()
+        _transpose_cache[id(matrix)] = matrix.T.tocsr()
+    return _transpose_cache[id(matrix)]
+
+def ego_network(adjacency: sparse.csr_matrix, center: int, hops: int = 1, max_nodes: int = 200, min_weight: float = 1,
+                reverse: Optional[sparse.csr_matrix] = None) -> Tuple[Dict[int, int], List[Tuple[int, int, float]], bool]:
+    """
+    Bounded breadth-first expansion around center, reading neighbor lists straight from CSR rows,
+    so the cost depends on the size of the neighborhood rather than the graph.
+    Stronger ties are visited first when max_nodes cuts a hop short.
+    reverse: transposed adjacency of a directed graph, so incoming edges are followed too.
+    Returns (node -> hop distance, edges among the nodes, truncated).
+    """
+    if center < 0 or center >= adjacency.shape[0]:
+        return {}, [], False
+
+    def neighbors(matrix, u):
+        start, end = matrix.indptr[u], matrix.indptr[u + 1]
+        nbrs, weights = matrix.indices[start:end], matrix.data[start:end]
+        keep = weights >= min_weight
+        return nbrs[keep], weights[keep]
+
+    def all_neighbors(u):
+        nbrs, weights = neighbors(adjacency, u)
+        if reverse is not None:
+            in_nbrs, in_weights = neighbors(reverse, u)
+            nbrs, weights = np.concatenate([nbrs, in_nbrs]), np.concatenate([weights, in_weights])
+        return nbrs[np.argsort(-weights, kind='stable')]
+
+    distance = {center: 0}
+    frontier = [center]
+    truncated = False
+    for depth in range(1, hops + 1):
+        next_frontier = []
+        for u in frontier:
+            for v in all_neighbors(u).tolist():
+                if v in distance:
+                    continue
+                if len(distance) >= max_nodes:
+                    truncated = True
+                    break
+                distance[v] = depth
+                next_frontier.append(v)
+            if truncated:
+                break
+        if truncated or not next_frontier:
+            break
+        frontier = next_frontier
+
+    edges = []
+    for u in distance:
+        nbrs, weights = neighbors(adjacency, u)
+        for v, w in zip(nbrs.tolist(), weights.tolist()):
+            # Undirected graphs store both directions; report each edge once
+            if v in distance and (reverse is not None or u < v):
+                edges.append((u, v, w))
+    return distance, edges, truncated
+
+def update_citation_cache(db, batch_size: int = 100000) -> sparse.csr_matrix:
+    """Rebuild the CSR citation cache from the citations edge table, streamed in citing order."""
+    from sqlalchemy import func
+    from database import Paper, citations
+
+    n = (db.query(func.max(Paper.id)).scalar() or 0) + 1
+    rows, cols = [], []
+    query = db.query(citations.c.citing_paper_id, citations.c.cited_paper_id).order_by(citations.c.citing_paper_id)
+    for chunk in _chunks(query.yield_per(batch_size), batch_size):
+        edges = np.array(chunk, dtype=np.int64)
+        rows.append(edges[:, 0])
+        cols.append(edges[:, 1])
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+
+    os.makedirs(NETWORK_DIR, exist_ok=True)
+    tmp_path = f"{CITATION_MATRIX_FILE}.{os.getpid()}.tmp.npz"
+    sparse.save_npz(tmp_path, matrix)
+    os.replace(tmp_path, CITATION_MATRIX_FILE)
+    logger.info(f"Citation cache rebuilt with {matrix.nnz} edges.")
+    return matrix
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(tuple(item))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+_ranking_cache: Dict[int, Tuple[sparse.csr_matrix, np.ndarray, np.ndarray]] = {}
+
+def _ranked_nodes(matrix: sparse.csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (weighted degree per node, connected nodes by descending degree), computed once per
+    loaded matrix rather than per request. The entry keeps the matrix, so its id stays unique.
+    """
+    cached = _ranking_cache.get(id(matrix))
+    if cached is None:
+        strength = np.asarray(matrix.sum(axis=1)).ravel()
+        ranked = np.flatnonzero(strength)
+        ranked = ranked[np.argsort(-strength[ranked], kind='stable')]
+        _ranking_cache.clear()
+        cached = _ranking_cache[id(matrix)] = (matrix, strength, ranked)
+    return cached[1], cached[2]
+
+def top_subgraph(matrix: sparse.csr_matrix, top_nodes: int = 100, max_edges: int = 500, min_weight: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pick the top_nodes authors by weighted degree and the heaviest edges among them.
+    Returns (node_ids, node_strength, edge_pairs, edge_weights).
+    """
+    if matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+
+    strength, ranked = _ranked_nodes(matrix)
+    nodes = ranked[:top_nodes]
+
+    sub = sparse.triu(matrix[nodes][:, nodes], k=1).tocoo()
+    keep = sub.data >= min_weight
+    rows, cols, weights = sub.row[keep], sub.col[keep], sub.data[keep]
+    order = np.argsort(-weights, kind='stable')[:max_edges]
+    edges = np.column_stack([nodes[rows[order]], nodes[cols[order]]])
+    return nodes, strength[nodes], edges, weights[order]
+
+def run_influence_metrics(batch_size: int = 10000) -> Dict[str, Dict]:
+    """Scheduled job: compute influence metrics on the cached adjacency and persist them per author."""
+    from database import Author, SessionLocal
+
+    matrix = get_coauthorship_matrix()
+    metrics, convergence = NetworkService().calculate_influence_metrics_sparse(matrix)
+    n = matrix.shape[0]
+    logger.info(f"Influence metrics computed for {n} authors: {convergence}")
+
+    db = SessionLocal()
+    try:
+        author_ids = [a for (a,) in db.query(Author.id).all() if a < n]
+        for start in range(0, len(author_ids), batch_size):
+            ids = np.array(author_ids[start:start + batch_size])
+            db.bulk_update_mappings(Author, [{
+                "id": int(a),
+                # PageRank scaled so that the average author scores 1.0
+                "influence_score": float(pr * n),
+                "pagerank": float(pr),
+                "eigenvector": float(ev),
+                "degree_centrality": float(dg)
+            } for a, pr, ev, dg in zip(ids, metrics["pagerank"][ids], metrics["eigenvector"][ids], metrics["degree"][ids])])
+            db.commit()
+    finally:
+        db.close()
+    return convergence
+
+def update_communities(full: bool = False, top_n: int = 5) -> Dict[str, Any]:
+    """
+    Ingest hook / scheduled job: re-detect the communities touched by papers added to the
+    co-authorship cache since the last run, then persist Author.community_id and
+    per-community stats. full=True re-runs Louvain on the whole graph.
+    """
+    from database import Author, ResearchCommunity, SessionLocal
+    from .corpus_snapshot import CorpusSnapshot
+
+    # The papers the cached matrix covers, whatever was appended to the snapshot since
+    matrix, n_papers = _load_cached_matrix()
+    snapshot = CorpusSnapshot.load()
+    if snapshot is None or matrix.shape[0] == 0:
+        return {"affected": 0}
+    snapshot = snapshot.head(n_papers)
+
+    previous, done = _load_partition()
+    if full or previous is None:
+        previous, changed = None, None
+    elif done == len(snapshot):
+        return {"affected": 0}
+    else:
+        changed = np.unique(np.asarray(snapshot.author_idx[int(snapshot.author_ptr[done]):]))
+
+    partition, affected = NetworkService().detect_communities_incremental(matrix, previous, changed)
+
+    # Communities whose membership may have changed: old and new ids of the re-detected authors
+    touched = set(np.unique(partition[affected]).tolist())
+    if previous is not None:
+        old = previous[affected[affected < len(previous)]]
+        touched |= set(np.unique(old[old >= 0]).tolist())
+    stats = _community_stats(snapshot, matrix, partition, sorted(touched), top_n)
+
+    db = SessionLocal()
+    try:
+        names = dict(db.query(Author.id, Author.name).filter(
+            Author.id.in_([a for s in stats.values() for a in s["top_author_ids"]])
+        ).all()) if stats else {}
+        stale = db.query(ResearchCommunity)
+        if previous is not None:
+            stale = stale.filter(ResearchCommunity.id.in_(list(touched)))
+        stale.delete(synchronize_session=False)
+        db.bulk_insert_mappings(ResearchCommunity, [{
+            "id": cid,
+            "size": s["size"],
+            "top_authors": json.dumps([{"id": a, "name": names.get(a, "")} for a in s["top_author_ids"]]),
+            "dominant_categories": json.dumps(s["categories"]),
+        } for cid, s in stats.items()])
+
+        # Only re-detected authors can have a new community (everyone on a full run)
+        if previous is None:
+            db.query(Author).update({Author.community_id: None}, synchronize_session=False)
+        db.bulk_update_mappings(Author, [{"id": int(a), "community_id": int(partition[a])} for a in affected])
+        db.commit()
+    finally:
+        db.close()
+
+    os.makedirs(NETWORK_DIR, exist_ok=True)
+    # np.savez appends .npz to names without it
+    tmp_path = f"{PARTITION_FILE}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, partition=partition, n_papers=len(snapshot))
+    os.replace(tmp_path, PARTITION_FILE)
+
+    logger.info(f"Communities updated: {len(affected)} authors re-detected, {len(stats)} communities refreshed.")
+    return {"affected": int(len(affected)), "communities": len(stats)}
+
+def _load_partition() -> Tuple[Optional[np.ndarray], int]:
+    try:
+        with np.load(PARTITION_FILE) as f:
+            return f["partition"], int(f["n_papers"])
+    except FileNotFoundError:
+        return None, 0
+
+def _community_stats(snapshot, matrix: sparse.csr_matrix, partition: np.ndarray, community_ids: List[int], top_n: int) -> Dict[int, Dict]:
+    """Size, top authors by weighted degree and dominant categories for the given communities."""
+    if not community_ids:
+        return {}
+    strength = np.asarray(matrix.sum(axis=1)).ravel()
+    paper_rows, author_ids = snapshot.paper_author_pairs()
+    in_range = author_ids < len(partition)
+    paper_rows, author_ids = paper_rows[in_range], author_ids[in_range]
+    author_comm = partition[author_ids]
+    # Count each paper once per community even if several members co-authored it
+    pairs = np.unique(np.column_stack([author_comm, paper_rows])[np.isin(author_comm, community_ids)], axis=0)
+    categories = np.asarray(snapshot.category_codes)[pairs[:, 1]] if len(pairs) else np.zeros(0, dtype=np.int64)
+
+    # Members of all the communities in one sort: by community, then by strength descending
+    members = np.flatnonzero(np.isin(partition, community_ids))
+    members = members[np.lexsort((-strength[members], partition[members]))]
+    cids, starts, sizes = np.unique(partition[members], return_index=True, return_counts=True)
+
+    # Category counts of every community in one bincount, a row per community
+    n_cats = len(snapshot.categories)
+    counts = np.bincount(np.searchsorted(cids, pairs[:, 0]) * n_cats + categories,
+                         minlength=len(cids) * n_cats).reshape(len(cids), n_cats)
+    best = np.argsort(-counts, axis=1, kind='stable')[:, :3]
+
+    stats = {}
+    for row, (cid, start, size) in enumerate(zip(cids, starts, sizes)):
+        stats[int(cid)] = {
+            "size": int(size),
+            "top_author_ids": [int(a) for a in members[start:start + min(size, top_n)]],
+            "categories": [{"category": snapshot.categories[c], "papers": int(counts[row, c])} for c in best[row] if counts[row, c] > 0]
+        }
+    return stats
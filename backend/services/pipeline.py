@@ -0,0 +1,330 @@
+"""
+Post-Ingest Analytics Pipeline
+Declarative DAG of the analytics stages that follow a collection run.
+
+Every stage keeps a checkpoint: the highest paper id it has processed. A run processes the
+id range (checkpoint, until], where until is the newest committed paper id (see
+corpus_snapshot.committed_paper_id: a later commit can't fill in ids below it) capped by the checkpoints
+of the stage's dependencies, so a stage never runs ahead of its inputs. A stage whose
+range is empty is skipped; a failed stage keeps its checkpoint and blocks its dependents,
+so the next run resumes exactly there without redoing the stages that finished.
+
+Stages whose output depends on the whole corpus (changepoints, forecasts, network metrics)
+recompute in full, but only when new papers arrived since they last ran.
+All stages of a run stop at the same paper id, even if collectors insert more meanwhile:
+the whole-corpus stages read the snapshot up to it, and only the coauthorship stage writes
+the co-authorship cache that communities and influence then read.
+"""
+import logging
+import os
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from database import DB_DIR, Paper, PaperAbstract, PipelineCheckpoint, PipelineStageRun, SessionLocal
+from .corpus_snapshot import committed_paper_id
+from .data_version import bump_analytics_version
+from .metrics import PIPELINE_STAGE_SECONDS
+
+try:
+    import fcntl
+except ImportError: # Windows: runs are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Stages are threads; the CPU-heavy ones fan out to their own process pools
+PIPELINE_WORKERS = 4
+# Stages with process pools that can run at the same time: they split the cores between them
+POOL_STAGES = ("changepoints", "forecasts")
+EMBEDDING_CHUNK = 5000
+LOCK_FILE = os.path.join(DB_DIR, "pipeline.lock")
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[Session, int, int], int], depends_on: Tuple[str, ...] = ()):
+        """func(db, since_id, until_id) processes papers with since_id < id <= until_id and returns a row count."""
+        self.name = name
+        self.func = func
+        self.depends_on = depends_on
+
+def _paper_texts(db: Session, since_id: int, until_id: int) -> List[Tuple[int, str]]:
+    from .abstract_store import decompress
+
+    rows = db.query(Paper.id, Paper.title, PaperAbstract.data, PaperAbstract.dictionary_id).outerjoin(
+        PaperAbstract, PaperAbstract.paper_id == Paper.id
+    ).filter(Paper.id > since_id, Paper.id <= until_id).order_by(Paper.id).all()
+    # FR-2.1.1: Abstracts, falling back to the title for papers without one
+    return [(r.id, decompress(db, r.data, r.dictionary_id) if r.data else r.title) for r in rows]
+
+def embed_papers(db: Session, since_id: int, until_id: int) -> int:
+    from .embedding_service import EmbeddingService, MODEL_NAME
+    from .embedding_store import append_embeddings
+
+    papers = _paper_texts(db, since_id, until_id)
+    if not papers:
+        return 0
+    service = EmbeddingService()
+    appended = 0
+    try:
+        for start in range(0, len(papers), EMBEDDING_CHUNK):
+            chunk = papers[start:start + EMBEDDING_CHUNK]
+            vectors = service.generate_embeddings([text for _, text in chunk])
+            appended += append_embeddings(np.array([i for i, _ in chunk]), vectors, MODEL_NAME)
+    finally:
+        service.close()
+    return appended
+
+def assign_topics(db: Session, since_id: int, until_id: int) -> int:
+    from .topic_service import TopicModelingService
+    from .embedding_store import EmbeddingStore
+
+    service = TopicModelingService.load()
+    if service is None:
+        logger.info("No trained topic model yet; skipping topic assignment.")
+        return 0
+    papers = _paper_texts(db, since_id, until_id)
+    store = EmbeddingStore.load()
+    if not papers or store is None:
+        return 0
+
+    ids = np.array([i for i, _ in papers])
+    # Only papers that have an embedding: transform() would otherwise re-embed them
+    ids = ids[np.isin(ids, store.ids)]
+    texts = dict(papers)
+    topics = service.assign_topics([texts[i] for i in ids], store.lookup(ids))
+    db.bulk_update_mappings(Paper, [{"id": int(i), "topic_id": t} for i, t in zip(ids, topics)])
+    db.commit()
+    return len(topics)
+
+def retrain_topics(db: Session) -> Dict[str, int]:
+    """
+    FR-2.2.2: Retrain the topic model on every embedded paper and reassign their topics.
+    Run on demand; the topics stage then assigns newer papers with the new model.
+    Holds the pipeline lock: the topics stage must not load the model while it is replaced.
+    """
+    with pipeline_lock():
+        return _retrain_topics(db)
+
+def _retrain_topics(db: Session) -> Dict[str, int]:
+    from .embedding_store import EmbeddingStore
+
+    store = EmbeddingStore.load()
+    if store is None or not len(store):
+        return {"papers": 0, "topics": 0}
+    from .topic_service import TopicModelingService
+    papers = dict(_paper_texts(db, 0, store.last_paper_id))
+    ids = np.asarray(store.ids)[np.isin(store.ids, list(papers))]
+    service = TopicModelingService()
+    topics, _ = service.train_model([papers[i] for i in ids], store.lookup(ids))
+    service.save()
+
+    db.bulk_update_mappings(Paper, [{"id": int(i), "topic_id": int(t)} for i, t in zip(ids, topics)])
+    checkpoint = db.get(PipelineCheckpoint, "topics") or PipelineCheckpoint(stage="topics", last_paper_id=0)
+    checkpoint.last_paper_id = max(checkpoint.last_paper_id or 0, int(ids.max()))
+    checkpoint.updated_at = datetime.utcnow()
+    db.add(checkpoint)
+    db.commit()
+    bump_analytics_version()
+    return {"papers": len(ids), "topics": len(set(topics) - {-1})}
+
+def update_recommendations(db: Session, since_id: int, until_id: int) -> int:
+    from .recommendation_service import refresh_recommendations
+    return refresh_recommendations(db, since_id, until_id)
+
+def index_signatures(db: Session, since_id: int, until_id: int) -> int:
+    from .dedup_service import index_papers
+    return index_papers(db, since_id, until_id)
+
+def update_keyword_counts(db: Session, since_id: int, until_id: int) -> int:
+    from .keyword_service import update_keywords
+    return update_keywords(db, since_id, until_id)
+
+def compress_abstracts(db: Session, since_id: int, until_id: int) -> int:
+    from .abstract_store import recompress_abstracts
+    return recompress_abstracts(db, since_id, until_id)
+
+def update_aggregates(db: Session, since_id: int, until_id: int) -> int:
+    from .corpus_snapshot import update_snapshot
+    return update_snapshot(db, until_id=until_id)
+
+def detect_online_changepoints(db: Session, since_id: int, until_id: int) -> int:
+    from .changepoint_service import run_online_changepoint_update
+    return len(run_online_changepoint_update(db, until_id))
+
+def _pool_workers() -> int:
+    return max(1, (os.cpu_count() or 1) // len(POOL_STAGES))
+
+def detect_changepoints(db: Session, since_id: int, until_id: int) -> int:
+    from .changepoint_service import run_changepoint_detection
+    return run_changepoint_detection(max_workers=_pool_workers(), until_id=until_id)
+
+def forecast_topics(db: Session, since_id: int, until_id: int) -> int:
+    from .forecasting_service import run_batch_forecasting
+    return run_batch_forecasting(max_workers=_pool_workers(), until_id=until_id)
+
+def update_coauthorship(db: Session, since_id: int, until_id: int) -> int:
+    from .network_service import update_coauthorship_cache
+    return update_coauthorship_cache(until_id).shape[0]
+
+def detect_communities(db: Session, since_id: int, until_id: int) -> int:
+    from .network_service import update_communities
+    return update_communities()["affected"]
+
+def compute_influence(db: Session, since_id: int, until_id: int) -> int:
+    from .network_service import run_influence_metrics, get_coauthorship_matrix
+    run_influence_metrics()
+    return get_coauthorship_matrix().shape[0]
+
+# In dependency order
+STAGES = [
+    Stage("embeddings", embed_papers),
+    Stage("topics", assign_topics, depends_on=("embeddings",)),
+    # Score every profile against the new papers in one batch
+    Stage("recommendations", update_recommendations, depends_on=("embeddings",)),
+    Stage("abstracts", compress_abstracts),
+    # FR-1.2.1: Duplicate detection index for papers not inserted by the collectors
+    Stage("signatures", index_signatures),
+    Stage("aggregates", update_aggregates),
+    # Term x month counts behind /api/keywords/emerging
+    Stage("keywords", update_keyword_counts),
+    # FR-3.1.1: Flag emerging topics as soon as new buckets close
+    Stage("online_changepoints", detect_online_changepoints),
+    Stage("changepoints", detect_changepoints, depends_on=("aggregates",)),
+    # FR-3.2.1
+    Stage("forecasts", forecast_topics, depends_on=("aggregates",)),
+    Stage("coauthorship", update_coauthorship, depends_on=("aggregates",)),
+    # FR-4.1.3: Re-detect only the communities touched by the new papers
+    Stage("communities", detect_communities, depends_on=("coauthorship",)),
+    # FR-4.1.2
+    Stage("influence", compute_influence, depends_on=("coauthorship",)),
+]
+
+def _validate(stages: List[Stage]):
+    names = set()
+    for stage in stages:
+        missing = [d for d in stage.depends_on if d not in names]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on {missing}, which must be listed before it")
+        names.add(stage.name)
+
+def get_checkpoints(db: Session) -> Dict[str, int]:
+    return {c.stage: c.last_paper_id or 0 for c in db.query(PipelineCheckpoint).all()}
+
+def _run_stage(stage: Stage, run_id: str, since_id: int, until_id: int, session_factory) -> Tuple[str, Optional[int]]:
+    """Thread worker: run one stage on its id range, record the run and advance its checkpoint on success."""
+    db = session_factory()
+    try:
+        run = PipelineStageRun(run_id=run_id, stage=stage.name, status="running",
+                               since_paper_id=since_id, until_paper_id=until_id, started_at=datetime.utcnow())
+        db.add(run)
+        db.commit()
+        start = time.perf_counter()
+        try:
+            rows = stage.func(db, since_id, until_id)
+            status = "success"
+        except Exception as e:
+            logger.error(f"Pipeline stage {stage.name} failed: {e}")
+            db.rollback()
+            rows, status = None, "failed"
+            run.error = traceback.format_exc()[-4000:]
+
+        run.status = status
+        run.rows = rows
+        run.finished_at = datetime.utcnow()
+        run.duration_seconds = time.perf_counter() - start
+        if status == "success":
+            checkpoint = db.get(PipelineCheckpoint, stage.name) or PipelineCheckpoint(stage=stage.name)
+            checkpoint.last_paper_id = until_id
+            checkpoint.updated_at = run.finished_at
+            db.add(checkpoint)
+        db.commit()
+        PIPELINE_STAGE_SECONDS.labels(stage.name, status).observe(run.duration_seconds)
+        logger.info(f"Pipeline stage {stage.name}: {status}, {rows} rows in {run.duration_seconds:.1f}s")
+        return status, rows
+    finally:
+        db.close()
+
+def _record(session_factory, run_id: str, stage: Stage, status: str, since_id: int, until_id: int):
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        db.add(PipelineStageRun(run_id=run_id, stage=stage.name, status=status, since_paper_id=since_id,
+                                until_paper_id=until_id, rows=0, started_at=now, finished_at=now, duration_seconds=0.0))
+        db.commit()
+    finally:
+        db.close()
+
+@contextmanager
+def pipeline_lock():
+    """Serializes pipeline runs and topic retraining across processes."""
+    with open(LOCK_FILE, "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def run_pipeline(stages: Optional[List[Stage]] = None, session_factory=SessionLocal,
+                 max_workers: int = PIPELINE_WORKERS) -> Dict[str, str]:
+    """
+    Run the stages in dependency order, independent ones in parallel.
+    Returns stage name -> status (success, failed, skipped or blocked).
+    """
+    stages = stages or STAGES
+    _validate(stages)
+    # The arXiv and PubMed jobs may finish together: the second run waits, then picks up what is left
+    with pipeline_lock():
+        return _run_stages(stages, session_factory, max_workers)
+
+def _run_stages(stages: List[Stage], session_factory, max_workers: int) -> Dict[str, str]:
+    run_id = uuid.uuid4().hex
+
+    db = session_factory()
+    try:
+        head = committed_paper_id(db)
+        checkpoints = get_checkpoints(db)
+    finally:
+        db.close()
+
+    statuses: Dict[str, str] = {}
+    pending = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if any(d not in statuses for d in stage.depends_on):
+                    continue
+                pending.remove(stage)
+                since_id = checkpoints.get(stage.name, 0)
+                # Never run ahead of an input that is itself behind
+                until_id = min([head] + [checkpoints.get(d, 0) for d in stage.depends_on])
+
+                if any(statuses[d] in ("failed", "blocked") for d in stage.depends_on):
+                    statuses[stage.name] = "blocked"
+                elif until_id <= since_id:
+                    statuses[stage.name] = "skipped"
+                else:
+                    running[pool.submit(_run_stage, stage, run_id, since_id, until_id, session_factory)] = (stage, until_id)
+                    continue
+                _record(session_factory, run_id, stage, statuses[stage.name], since_id, until_id)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, until_id = running.pop(future)
+                status, _ = future.result()
+                statuses[stage.name] = status
+                if status == "success":
+                    checkpoints[stage.name] = until_id
+
+    if "success" in statuses.values():
+        # Cached API responses built from derived columns are stale now
+        bump_analytics_version()
+    failed = [name for name, status in statuses.items() if status in ("failed", "blocked")]
+    if failed:
+        logger.warning(f"Pipeline run {run_id} incomplete; will resume at: {failed}")
+    return statuses
@@ -1,7 +1,14 @@
+import base64
+import hashlib
+import hmac
 import json
 import os
+import secrets
+import uuid
+from typing import Optional
 from sqlalchemy.orm import Session
-from database import UserProfile, Paper
+from database import DATABASE_URL, DB_DIR, UserProfile, Paper
+from .metrics import track_llm_call
 import logging
 
 # Configure Google Generative AI
@@ -17,15 +24,80 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
-def get_profile(db: Session):
-    return db.query(UserProfile).first()
+# Profiles are keyed by a user id the API signs: POST /api/session issues a token
+# "<user id>.<signature>" that the client keeps and sends in the X-User-Token header, so a
+# caller can only act as a user it was issued. Requests without a token share the
+# default profile. The key is USER_TOKEN_SECRET, or one generated once in the data directory.
+# With a shared database (not SQLite) the API may run on several hosts with their own data
+# directories, so USER_TOKEN_SECRET is required there.
+USER_TOKEN_HEADER = "x-user-token"
+DEFAULT_USER = "default"
+SECRET_FILE = os.path.join(DB_DIR, "user_token_secret")
 
-def update_profile(db: Session, name: str, title: str, proposal: str):
-    profile = db.query(UserProfile).first()
+_secret_key: Optional[bytes] = None
+
+def _load_secret() -> bytes:
+    if os.environ.get("USER_TOKEN_SECRET"):
+        return os.environ["USER_TOKEN_SECRET"].encode()
+    if not DATABASE_URL.startswith("sqlite"):
+        raise RuntimeError("USER_TOKEN_SECRET must be set when the database is not SQLite: "
+                           "every API host has to sign user tokens with the same key")
+    secret = secrets.token_hex(32).encode()
+    tmp_path = f"{SECRET_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(secret)
+    os.chmod(tmp_path, 0o600)
+    try:
+        # link() fails if the file exists: API workers starting together keep the first one
+        os.link(tmp_path, SECRET_FILE)
+    except FileExistsError:
+        with open(SECRET_FILE, "rb") as f:
+            secret = f.read().strip()
+    finally:
+        os.remove(tmp_path)
+    return secret
+
+def _secret() -> bytes:
+    global _secret_key
+    if _secret_key is None:
+        _secret_key = _load_secret()
+    return _secret_key
+
+def init_user_tokens():
+    """Load the signing key at startup, so a missing USER_TOKEN_SECRET fails there and not on a request."""
+    _secret()
+
+def _sign(user: str) -> str:
+    digest = hmac.new(_secret(), user.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+def issue_user_token() -> str:
+    """A new user id and its signature."""
+    user = uuid.uuid4().hex
+    return f"{user}.{_sign(user)}"
+
+def user_key(request) -> Optional[str]:
+    """The profile key of the request; None when its token is forged or malformed."""
+    token = request.headers.get(USER_TOKEN_HEADER)
+    if not token:
+        return DEFAULT_USER
+    user, _, signature = token.partition(".")
+    if not user or user == DEFAULT_USER or not hmac.compare_digest(signature, _sign(user)):
+        return None
+    return user
+
+def get_profile(db: Session, user: str = DEFAULT_USER):
+    return db.query(UserProfile).filter(UserProfile.user_key == user).first()
+
+def update_profile(db: Session, name: str, title: str, proposal: str, user: str = DEFAULT_USER):
+    profile = get_profile(db, user)
     if not profile:
-        profile = UserProfile(name=name, title=title, proposal=proposal)
+        profile = UserProfile(user_key=user, name=name, title=title, proposal=proposal)
         db.add(profile)
     else:
+        if (profile.title, profile.proposal) != (title, proposal):
+            # Re-embedded and re-scored by the next recommendation refresh
+            profile.embedding = None
         profile.name = name
         profile.title = title
         profile.proposal = proposal
@@ -59,7 +131,8 @@ def analyze_profile(db: Session, profile_id: int):
             }}
             """
             
-            response = model.generate_content(prompt)
+            with track_llm_call("profile_analysis"):
+                response = model.generate_content(prompt)
             # Remove any markdown code block formatting if present
             content = response.text.replace("```json", "").replace("```", "").strip()
             
@@ -0,0 +1,192 @@
+"""
+Request Profiling
+Opt-in CPU profiling of API handlers and slow SQL capture, for diagnosing slow endpoints
+in production without a redeploy.
+
+A request is profiled when it carries an "X-Profile: 1" header (from an admin, see
+is_admin) or, while sampling is enabled, with probability sample_rate. The handler then
+runs under cProfile; the result is kept in a ring buffer listed by /api/admin/profiles.
+SQL statements slower than slow_query_ms are logged with their query plan and kept in a
+second ring buffer, attached to the profile of the request that ran them, if any.
+
+When profiling is off, the per-request cost is a header lookup and a flag check.
+Settings and buffers are per API process.
+"""
+import cProfile
+import functools
+import inspect
+import itertools
+import logging
+import os
+import pstats
+import random
+import secrets
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+PROFILE_BUFFER_SIZE = 50
+SLOW_QUERY_BUFFER_SIZE = 200
+TOP_FUNCTIONS = 40
+
+settings = {
+    "enabled": False, # Sample requests at sample_rate
+    "sample_rate": 0.01,
+    "slow_query_ms": float(os.environ.get("SLOW_QUERY_MS", 200)),
+}
+
+profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+slow_queries = deque(maxlen=SLOW_QUERY_BUFFER_SIZE)
+_ids = itertools.count(1)
+
+# The profile record of the request being handled, None when it is not profiled
+_current: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_profile", default=None)
+
+def is_admin(request) -> bool:
+    """
+    The X-Admin-Token header matches ADMIN_TOKEN. Without ADMIN_TOKEN nobody is an admin,
+    unless ADMIN_ALLOW_ALL=1 opts everyone in (local development only).
+    """
+    token = os.environ.get("ADMIN_TOKEN")
+    if not token:
+        return os.environ.get("ADMIN_ALLOW_ALL") == "1"
+    return secrets.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ""), token)
+
+def update_settings(enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                    slow_query_ms: Optional[float] = None) -> Dict[str, Any]:
+    if enabled is not None:
+        settings["enabled"] = enabled
+    if sample_rate is not None:
+        settings["sample_rate"] = min(max(sample_rate, 0.0), 1.0)
+    if slow_query_ms is not None:
+        settings["slow_query_ms"] = max(slow_query_ms, 0.0)
+    return dict(settings)
+
+async def profiling_middleware(request, call_next):
+    requested = request.headers.get(PROFILE_HEADER) == "1" and is_admin(request)
+    if not requested and not (settings["enabled"] and random.random() < settings["sample_rate"]):
+        return await call_next(request)
+
+    record = {
+        "id": next(_ids),
+        "method": request.method,
+        "path": request.url.path,
+        "started_at": datetime.utcnow().isoformat(),
+        "sampled": not requested,
+        "slow_queries": [],
+        "profile": None,
+    }
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        record["status"] = response.status_code
+        response.headers["X-Profile-Id"] = str(record["id"])
+        return response
+    finally:
+        _current.reset(token)
+        record["route"] = getattr(request.scope.get("route"), "path", None)
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        profiles.append(record)
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [{
+        "function": f"{os.path.basename(filename)}:{line}({name})",
+        "calls": calls,
+        "total_ms": total * 1000, # Time in the function itself
+        "cumulative_ms": cumulative * 1000, # Including callees
+    } for (filename, line, name), (_, calls, total, cumulative, _) in rows]
+
+def _profiled(func):
+    """Run the endpoint under cProfile when the current request is being profiled."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            record = _current.get()
+            if record is None:
+                return await func(*args, **kwargs)
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                record["profile"] = _top_functions(profiler)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record = _current.get()
+            if record is None:
+                return func(*args, **kwargs)
+            # Sync endpoints run in a threadpool thread; cProfile follows the calling thread
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                record["profile"] = _top_functions(profiler)
+    return wrapper
+
+def instrument_routes(app):
+    """Wrap every API route's endpoint; call once all routes are registered."""
+    from fastapi.routing import APIRoute
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not getattr(route.dependant.call, "__wrapped__", None):
+            route.dependant.call = _profiled(route.dependant.call)
+
+def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    dialect = conn.dialect.name
+    if dialect not in ("sqlite", "postgresql") or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    if isinstance(parameters, list): # executemany: plan the first parameter set
+        parameters = parameters[0] if parameters else ()
+    # A raw DBAPI cursor, so the EXPLAIN itself doesn't go through these event hooks
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" | ".join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["profile_query_start"].pop()) * 1000
+    if elapsed_ms < settings["slow_query_ms"]:
+        return
+
+    plan = _explain(conn, statement, parameters)
+    record = _current.get()
+    query = {
+        "statement": statement,
+        "duration_ms": elapsed_ms,
+        "plan": plan,
+        "at": datetime.utcnow().isoformat(),
+        "profile_id": record["id"] if record else None,
+    }
+    slow_queries.append(query)
+    if record is not None:
+        record["slow_queries"].append(query)
+    logger.warning(f"Slow query ({elapsed_ms:.0f} ms): {statement[:500]} | plan: {plan}")
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("profile_query_start"):
+        context.connection.info["profile_query_start"].pop()
@@ -4,14 +4,21 @@ import logging
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from database import Paper, Author, SessionLocal
+from .citation_importer import normalize_doi
+from .data_version import bump_data_version
+from .dedup_service import DuplicateResolver
+from .metrics import COLLECTOR_PAPERS, COLLECTOR_RATE_LIMIT_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RATE_LIMIT_DELAY = 0.34 # ~3 req/s to be safe without key
+
 class PubMedCollector:
     def __init__(self, db: Session):
         self.db = db
+        self.duplicates = DuplicateResolver(db)
         # FR-1.1.2: Tool: Pymed, Email required for 10 req/s limit usually, 
         # simplified here.
         self.pubmed = PubMed(tool="ConferenceTracker", email="user@example.com")
@@ -35,15 +42,21 @@ class PubMedCollector:
 
         logger.info(f"Fetching PubMed papers with query: {query}")
 
+        inserted = 0
         try:
             results = self.pubmed.query(query, max_results=max_results)
             
             for result in results:
-                self._process_paper(result)
+                COLLECTOR_PAPERS.labels("pubmed", "fetched").inc()
+                if self._process_paper(result):
+                    inserted += 1
                 # Internal rate limiting of pymed might handle it, but adding small safety
-                time.sleep(0.34) # ~3 req/s to be safe without key
+                time.sleep(RATE_LIMIT_DELAY)
+                COLLECTOR_RATE_LIMIT_SECONDS.labels("pubmed").inc(RATE_LIMIT_DELAY)
         except Exception as e:
+            COLLECTOR_PAPERS.labels("pubmed", "error").inc()
             logger.error(f"Error during PubMed fetching: {e}")
+        return inserted
 
     def _process_paper(self, result):
         try:
@@ -53,24 +66,34 @@ class PubMedCollector:
             doi = result.doi if result.doi else None
             
             if not pmid and not doi:
+                COLLECTOR_PAPERS.labels("pubmed", "invalid").inc()
                 return 
 
             external_id = f"PMID:{pmid}" if pmid else f"DOI:{doi}"
             
             # FR-1.2.1 Deduplication
             existing = self.db.query(Paper).filter(Paper.external_id == external_id).first()
-            if existing:
+            if existing or self.duplicates.seen(external_id):
+                COLLECTOR_PAPERS.labels("pubmed", "duplicate").inc()
                 return
 
             # Basic Validation
             if not result.abstract or len(str(result.abstract)) < 50:
                  # FR-1.1.2: Filter papers with missing abstracts
+                COLLECTOR_PAPERS.labels("pubmed", "invalid").inc()
+                return
+
+            # Same work from another source (typically its arXiv preprint): link it instead of inserting
+            match = self.duplicates.find(doi, result.title, str(result.abstract))
+            if match:
+                self.duplicates.record("pubmed", external_id, doi, match)
+                COLLECTOR_PAPERS.labels("pubmed", "duplicate").inc()
                 return
 
             paper = Paper(
                 source="pubmed",
                 external_id=external_id,
-                doi=doi,
+                doi=normalize_doi(doi),
                 title=result.title,
                 abstract=result.abstract,
                 published_date=result.publication_date,
@@ -102,9 +125,14 @@ class PubMedCollector:
 
             paper.authors = paper_authors
             self.db.add(paper)
+            self.db.flush()
+            self.duplicates.index(paper.id, result.title, str(result.abstract))
             self.db.commit()
+            COLLECTOR_PAPERS.labels("pubmed", "inserted").inc()
+            return True
 
         except Exception as e:
+            COLLECTOR_PAPERS.labels("pubmed", "error").inc()
             logger.error(f"Failed to process PubMed paper: {e}")
             self.db.rollback()
 
@@ -112,6 +140,7 @@ def run_pubmed_collection():
     db = SessionLocal()
     try:
         collector = PubMedCollector(db)
-        collector.fetch_papers(days_back=7, max_results=20)
+        if collector.fetch_papers(days_back=7, max_results=20):
+            bump_data_version()
     finally:
         db.close()
@@ -0,0 +1,124 @@
+"""
+Recommendation Service
+Keeps the top papers of every profile by cosine similarity between the profile embedding
+(title and proposal) and the paper embeddings in the embedding store.
+
+A refresh scores all profiles against the newly embedded papers only, one matrix multiply
+per chunk of papers, and merges the result into each profile's stored top-k, so its cost
+grows with the new papers rather than profiles x corpus. Profiles that are new or whose
+text changed are embedded and scored against the whole store once.
+"""
+import logging
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from database import UserProfile, ProfileRecommendation
+from .embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_PER_PROFILE = 50
+SCORE_CHUNK = 50000 # Papers per matrix multiply
+IN_CLAUSE = 500
+
+def profile_text(profile: UserProfile) -> str:
+    return ". ".join(part for part in (profile.title, profile.proposal) if part)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per row (profile), the k highest scores and their paper ids, best first. ids has the shape of scores."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return ids, scores
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind="stable"), axis=1)
+    return np.take_along_axis(ids, best, axis=1), np.take_along_axis(scores, best, axis=1)
+
+def score_papers(profiles: np.ndarray, store: EmbeddingStore, lo: int, hi: int,
+                 k: int = RECOMMENDATIONS_PER_PROFILE) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k of the store rows [lo, hi) for every normalized profile vector."""
+    best_ids = np.zeros((len(profiles), 0), dtype=np.int64)
+    best_scores = np.zeros((len(profiles), 0), dtype=np.float32)
+    for start in range(lo, hi, SCORE_CHUNK):
+        end = min(start + SCORE_CHUNK, hi)
+        scores = profiles @ _normalize(store.vectors[start:end]).T
+        ids = np.broadcast_to(np.asarray(store.ids[start:end]), scores.shape)
+        best_ids, best_scores = top_k(np.hstack([best_ids, ids]), np.hstack([best_scores, scores]), k)
+    return best_ids, best_scores
+
+def _embed(texts: List[str]) -> Tuple[np.ndarray, str]:
+    from .embedding_service import EmbeddingService, MODEL_NAME
+    # A few profiles: not worth starting an encoding pool
+    return EmbeddingService(workers=1).generate_embeddings(texts), MODEL_NAME
+
+def _stored_top_k(db: Session, profile_ids: Sequence[int], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Current recommendations as (profiles x k) arrays, padded with id -1 and score -inf."""
+    ids = np.full((len(profile_ids), k), -1, dtype=np.int64)
+    scores = np.full((len(profile_ids), k), -np.inf, dtype=np.float32)
+    row = {profile_id: i for i, profile_id in enumerate(profile_ids)}
+    filled = np.zeros(len(profile_ids), dtype=np.int64)
+    for start in range(0, len(profile_ids), IN_CLAUSE):
+        for r in db.query(ProfileRecommendation).filter(
+            ProfileRecommendation.profile_id.in_(profile_ids[start:start + IN_CLAUSE])
+        ):
+            i = row[r.profile_id]
+            if filled[i] < k:
+                ids[i, filled[i]], scores[i, filled[i]] = r.paper_id, r.score
+                filled[i] += 1
+    return ids, scores
+
+def _write(db: Session, profile_ids: Sequence[int], ids: np.ndarray, scores: np.ndarray) -> int:
+    for start in range(0, len(profile_ids), IN_CLAUSE):
+        db.query(ProfileRecommendation).filter(
+            ProfileRecommendation.profile_id.in_(profile_ids[start:start + IN_CLAUSE])
+        ).delete(synchronize_session=False)
+    rows = [{"profile_id": profile_id, "paper_id": int(paper_id), "score": float(score)}
+            for profile_id, row_ids, row_scores in zip(profile_ids, ids, scores)
+            for paper_id, score in zip(row_ids, row_scores) if paper_id >= 0]
+    if rows:
+        db.execute(ProfileRecommendation.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
+
+def refresh_recommendations(db: Session, since_id: int, until_id: int, store: Optional[EmbeddingStore] = None,
+                            embed: Callable[[List[str]], Tuple[np.ndarray, str]] = _embed,
+                            k: int = RECOMMENDATIONS_PER_PROFILE) -> int:
+    """
+    Merge papers since_id < id <= until_id into every profile's top-k, and score profiles
+    without an up-to-date embedding against all papers up to until_id.
+    Returns the number of recommendations written.
+    """
+    store = store or EmbeddingStore.load()
+    if store is None or not len(store):
+        return 0
+    profiles = [p for p in db.query(UserProfile).order_by(UserProfile.id).all() if profile_text(p)]
+    model = store.meta.get("model")
+    stale = [p for p in profiles if p.embedding is None or p.embedding_model != model]
+    if stale:
+        vectors, embedding_model = embed([profile_text(p) for p in stale])
+        for profile, vector in zip(stale, vectors):
+            profile.embedding = np.asarray(vector, dtype=np.float32).tobytes()
+            profile.embedding_model = embedding_model
+        db.commit()
+        logger.info(f"Embedded {len(stale)} profiles")
+
+    lo = int(np.searchsorted(store.ids, since_id, side="right"))
+    hi = int(np.searchsorted(store.ids, until_id, side="right"))
+    written = 0
+    if stale:
+        matrix = _normalize(np.stack([np.frombuffer(p.embedding, dtype=np.float32) for p in stale]))
+        ids, scores = score_papers(matrix, store, 0, hi, k)
+        written += _write(db, [p.id for p in stale], ids, scores)
+
+    current = [p for p in profiles if p not in stale]
+    if current and lo < hi:
+        profile_ids = [p.id for p in current]
+        matrix = _normalize(np.stack([np.frombuffer(p.embedding, dtype=np.float32) for p in current]))
+        new_ids, new_scores = score_papers(matrix, store, lo, hi, k)
+        old_ids, old_scores = _stored_top_k(db, profile_ids, k)
+        ids, scores = top_k(np.hstack([old_ids, new_ids]), np.hstack([old_scores, new_scores]), k)
+        written += _write(db, profile_ids, ids, scores)
+    return written
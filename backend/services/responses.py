@@ -0,0 +1,24 @@
+"""
+JSON Responses
+List endpoints build plain dicts from row tuples and return FastJSONResponse directly,
+which skips FastAPI's per-row response_model validation and jsonable_encoder pass.
+Content must already be JSON-ready apart from dates, datetimes and numpy values, which
+orjson serializes natively (dates as ISO strings, like the default encoder).
+"""
+from typing import Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Upper bound for the limit parameter of list endpoints
+MAX_PAGE_SIZE = 5000
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(jsonable_encoder(content))
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
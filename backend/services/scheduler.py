@@ -1,41 +1,315 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ProcessPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
+import json
+import multiprocessing
+import os
+import socket
+import threading
 import time
+import traceback
+import uuid
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, SchedulerLease, JobRun
 from .arxiv_collector import run_arxiv_collection
 from .pubmed_collector import run_pubmed_collection
+from .pipeline import run_pipeline
+from .metrics import JOB_SECONDS, init_worker_process
 
 logger = logging.getLogger(__name__)
 
-scheduler = BackgroundScheduler()
+LEASE_NAME = "scheduler"
+LEASE_TTL = timedelta(seconds=60)
+LEASE_RENEW_SECONDS = 15
+# Jobs run in separate processes so CPU-heavy analytics don't compete with the API for the GIL
+JOB_WORKERS = 2
+JOB_HEARTBEAT_SECONDS = 30
+# Hosts' clocks may disagree by this much about when a run started
+MAX_CLOCK_SKEW = timedelta(minutes=5)
 
-def start_scheduler():
-    # FR-1.3.1: Run daily incremental updates at 2:00 AM JST
-    # Note: Server time might not be JST, so we should convert or set timezone. 
-    # For now, assuming local server time is what matches the requirement or handled by timezone arg.
-    
-    # 2:00 AM JST
-    scheduler.add_job(
-        run_arxiv_collection,
-        trigger=CronTrigger(hour=2, minute=0),
-        id='arxiv_daily',
-        name='Daily ArXiv Collection',
-        replace_existing=True
-    )
-    
-    scheduler.add_job(
-        run_pubmed_collection,
-        trigger=CronTrigger(hour=2, minute=15),
-        id='pubmed_daily',
-        name='Daily PubMed Collection',
-        replace_existing=True
-    )
-
-    scheduler.start()
-    logger.info("Scheduler started...")
+# Unique per process: every uvicorn worker competes for the lease, only the holder schedules jobs
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+scheduler = BackgroundScheduler(
+    executors={'default': ProcessPoolExecutor(JOB_WORKERS, pool_kwargs={
+        "mp_context": multiprocessing.get_context("spawn"), "initializer": init_worker_process})},
+    # Overlap prevention: one instance per job, and missed runs collapse into one. A new leader
+    # first drops the runs its predecessor already started (see skip_runs_started_elsewhere)
+    job_defaults={'max_instances': 1, 'coalesce': True, 'misfire_grace_time': 3600}
+)
+
+def run_post_ingest():
+    """Bring every analytics stage up to date with the newly ingested papers."""
+    return run_pipeline()
+
+def run_daily_arxiv():
+    run_arxiv_collection()
+    run_post_ingest()
+
+def run_daily_pubmed():
+    run_pubmed_collection()
+    run_post_ingest()
 
 def run_manual_update():
     """Trigger manual update for testing"""
     logger.info("Manual update triggered.")
+    report_progress(0.0, "Collecting arXiv papers")
     run_arxiv_collection()
+    report_progress(0.3, "Collecting PubMed papers")
     run_pubmed_collection()
+    report_progress(0.6, "Running the analytics pipeline")
+    return {"pipeline": run_post_ingest()}
+
+def run_profile_analysis(profile_id: int):
+    from .profile_service import analyze_profile
+    db = SessionLocal()
+    try:
+        profile = analyze_profile(db, profile_id)
+        return {
+            "trajectory": profile.trajectory,
+            "suggested_conferences": json.loads(profile.suggested_conferences) if profile.suggested_conferences else [],
+            "suggested_papers": json.loads(profile.suggested_papers) if profile.suggested_papers else []
+        }
+    finally:
+        db.close()
+
+def run_topic_retraining():
+    """FR-2.2.2: Retrain the topic model on all embedded papers."""
+    from .pipeline import retrain_topics
+    db = SessionLocal()
+    try:
+        return retrain_topics(db)
+    finally:
+        db.close()
+
+def run_recommendation_refresh():
+    """Score new and edited profiles; the recommendations stage keeps the others current."""
+    from .pipeline import get_checkpoints
+    from .recommendation_service import refresh_recommendations
+    db = SessionLocal()
+    try:
+        checkpoint = get_checkpoints(db).get("recommendations", 0)
+        return {"recommendations": refresh_recommendations(db, checkpoint, checkpoint)}
+    finally:
+        db.close()
+
+# job id -> (function, trigger, name)
+# FR-1.3.1: Run daily incremental updates at 2:00 AM JST
+# Note: Server time might not be JST, so we should convert or set timezone.
+# For now, assuming local server time is what matches the requirement or handled by timezone arg.
+JOBS = {
+    'arxiv_daily': (run_daily_arxiv, CronTrigger(hour=2, minute=0), 'Daily ArXiv Collection'),
+    'pubmed_daily': (run_daily_pubmed, CronTrigger(hour=2, minute=15), 'Daily PubMed Collection'),
+    # Resumes stages that failed after the collections (a no-op when everything is up to date)
+    'pipeline_daily': (run_post_ingest, CronTrigger(hour=3, minute=0), 'Daily Analytics Pipeline'),
+}
+
+JOB_FUNCTIONS = {job_id: func for job_id, (func, _, _) in JOBS.items()}
+# On demand, see services/jobs.py
+JOB_FUNCTIONS['manual_update'] = run_manual_update
+JOB_FUNCTIONS['profile_analysis'] = run_profile_analysis
+JOB_FUNCTIONS['topic_retraining'] = run_topic_retraining
+JOB_FUNCTIONS['recommendation_refresh'] = run_recommendation_refresh
+
+# The JobRun this worker process is executing; a worker runs one job at a time
+_current_run_id = None
+
+def _update_run(run_id: int, values: dict):
+    db = SessionLocal()
+    try:
+        db.query(JobRun).filter(JobRun.id == run_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def report_progress(progress: float, message: Optional[str] = None):
+    """Record the progress (0..1) of the job being run. A no-op outside a job."""
+    if _current_run_id is None:
+        return
+    try:
+        _update_run(_current_run_id, {"progress": progress, "message": message, "updated_at": datetime.utcnow()})
+    except Exception as e:
+        logger.warning(f"Could not record job progress: {e}")
+
+class Heartbeat(threading.Thread):
+    """Refreshes updated_at while a job runs, so a run whose worker died can be told from a slow one."""
+    def __init__(self, run_id: int):
+        super().__init__(name=f"job-heartbeat-{run_id}", daemon=True)
+        self.run_id = run_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                _update_run(self.run_id, {"updated_at": datetime.utcnow()})
+            except Exception as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def run_job(job_id: str, run_id: Optional[int] = None, params: Optional[dict] = None):
+    """
+    Entry point executed in the worker process: runs a registered job and records it in job_runs.
+    On-demand jobs pass the id of their queued run; scheduled runs create their own.
+    """
+    global _current_run_id
+    func = JOB_FUNCTIONS[job_id]
+    db = SessionLocal()
+    try:
+        run = db.get(JobRun, run_id) if run_id else None
+        if run is None:
+            run = JobRun(job_id=job_id)
+            db.add(run)
+        run.status = "running"
+        run.started_at = run.updated_at = datetime.utcnow()
+        run.worker = f"{socket.gethostname()}:{os.getpid()}"
+        db.commit()
+        _current_run_id = run.id
+        heartbeat = Heartbeat(run.id)
+        heartbeat.start()
+        start = time.perf_counter()
+        try:
+            result = func(**(params or {}))
+            run.status = "success"
+            run.progress = 1.0
+            run.result = json.dumps(result) if result is not None else None
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            run.status = "failed"
+            run.error = traceback.format_exc()[-4000:]
+        finally:
+            heartbeat.stop()
+            _current_run_id = None
+        run.finished_at = run.updated_at = datetime.utcnow()
+        run.duration_seconds = time.perf_counter() - start
+        # Frees the deduplication key: later submissions start a new run
+        run.dedup_key = None
+        db.commit()
+        JOB_SECONDS.labels(job_id, run.status).observe(run.duration_seconds)
+    finally:
+        db.close()
+
+def try_acquire_lease(db, owner: str = OWNER_ID, ttl: timedelta = LEASE_TTL) -> bool:
+    """
+    Take or renew the scheduler lease. The conditional UPDATE is atomic in the database,
+    so at most one process holds an unexpired lease.
+    """
+    now = datetime.utcnow()
+    updated = db.query(SchedulerLease).filter(
+        SchedulerLease.name == LEASE_NAME,
+        or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now)
+    ).update({SchedulerLease.owner: owner, SchedulerLease.expires_at: now + ttl}, synchronize_session=False)
+    if updated:
+        db.commit()
+        return True
+    if db.query(SchedulerLease).filter(SchedulerLease.name == LEASE_NAME).first() is not None:
+        db.rollback()
+        return False
+    try:
+        db.add(SchedulerLease(name=LEASE_NAME, owner=owner, expires_at=now + ttl))
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another process created the lease first
+        db.rollback()
+        return False
+
+def release_lease(db, owner: str = OWNER_ID):
+    db.query(SchedulerLease).filter(SchedulerLease.name == LEASE_NAME, SchedulerLease.owner == owner).delete(synchronize_session=False)
+    db.commit()
+
+def skip_runs_started_elsewhere(db, sched=None) -> int:
+    """
+    Before a new leader resumes: runs that came due while it was paused belong to the previous
+    leader. Jobs it already started move on to their next fire time instead of running again
+    within misfire_grace_time; runs it never started still happen. Returns the number skipped.
+    """
+    sched = sched or scheduler
+    skipped = 0
+    for job in sched.get_jobs():
+        due = job.next_run_time
+        if due is None:
+            continue
+        now = datetime.now(due.tzinfo)
+        if due > now:
+            continue
+        # job_runs times are naive UTC
+        due_utc = due.astimezone(timezone.utc).replace(tzinfo=None) - MAX_CLOCK_SKEW
+        if db.query(JobRun.id).filter(JobRun.job_id == job.id, JobRun.started_at >= due_utc).first() is None:
+            continue
+        job.modify(next_run_time=job.trigger.get_next_fire_time(None, now))
+        logger.info(f"Job {job.id} due at {due} was already started by the previous leader; skipping it.")
+        skipped += 1
+    return skipped
+
+class LeaderElector(threading.Thread):
+    """Keeps trying to hold the lease; resumes the scheduler while leader and pauses it otherwise."""
+    def __init__(self):
+        super().__init__(name="scheduler-leader-election", daemon=True)
+        self.stopped = threading.Event()
+        self.is_leader = False
+
+    def run(self):
+        while not self.stopped.is_set():
+            db = SessionLocal()
+            try:
+                leader = try_acquire_lease(db)
+            except Exception as e:
+                logger.error(f"Scheduler lease check failed: {e}")
+                leader = False
+            finally:
+                db.close()
+
+            if leader and not self.is_leader:
+                logger.info(f"Acquired scheduler lease as {OWNER_ID}; scheduling jobs.")
+                db = SessionLocal()
+                try:
+                    skip_runs_started_elsewhere(db)
+                except Exception as e:
+                    logger.error(f"Could not check for runs started by the previous leader: {e}")
+                finally:
+                    db.close()
+                scheduler.resume()
+            elif not leader and self.is_leader:
+                logger.warning(f"Lost scheduler lease; pausing jobs in {OWNER_ID}.")
+                scheduler.pause()
+            self.is_leader = leader
+            self.stopped.wait(LEASE_RENEW_SECONDS)
+
+    def stop(self):
+        self.stopped.set()
+        if self.is_leader:
+            scheduler.pause()
+            db = SessionLocal()
+            try:
+                release_lease(db)
+            finally:
+                db.close()
+
+elector = LeaderElector()
+
+def start_scheduler():
+    for job_id, (_, trigger, name) in JOBS.items():
+        scheduler.add_job(
+            run_job,
+            args=[job_id],
+            trigger=trigger,
+            id=job_id,
+            name=name,
+            replace_existing=True
+        )
+
+    # Start paused: only the lease holder resumes it
+    scheduler.start(paused=True)
+    elector.start()
+    logger.info("Scheduler started, waiting for leader election...")
+
+def stop_scheduler():
+    elector.stop()
+    scheduler.shutdown(wait=False)
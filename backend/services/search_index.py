@@ -0,0 +1,96 @@
+"""
+Abstract Search Index
+Full abstracts are stored compressed (see abstract_store), so keyword search can't match
+them with LIKE. Their words are indexed when they are written instead: in SQLite a
+contentless FTS5 table, which keeps the index but no second copy of the text; in
+PostgreSQL a tsvector per paper with a GIN index. Neither stems words, so a keyword
+matches any word starting with it, like the substring match on titles.
+
+Writes through the Paper.abstract property are indexed by abstract_store's mapper events;
+bulk inserts of paper_abstracts rows must call index_abstracts themselves.
+"""
+import re
+from typing import Iterable, List, Tuple
+from sqlalchemy import column, false, inspect, or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import ColumnElement
+from database import Paper
+
+SEARCH_TABLE = "paper_search"
+BACKFILL_BATCH = 5000
+
+def _dialect(conn) -> str:
+    """Of a Connection or a Session."""
+    return (conn if isinstance(conn, Connection) else conn.get_bind()).dialect.name
+
+def create_search_table(conn: Connection):
+    """Create the index if missing. Other databases have none: search falls back to previews."""
+    if inspect(conn).has_table(SEARCH_TABLE):
+        return
+    if conn.dialect.name == "sqlite":
+        conn.execute(text(f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(abstract, content='')"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text(f"CREATE TABLE {SEARCH_TABLE} (paper_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"))
+        conn.execute(text(f"CREATE INDEX ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"))
+
+def index_abstracts(conn, rows: List[Tuple[int, str]]):
+    """Add (paper id, abstract) pairs to the index; the papers' previous abstracts must have been removed."""
+    if not rows:
+        return
+    params = [{"paper_id": paper_id, "abstract": abstract} for paper_id, abstract in rows]
+    dialect = _dialect(conn)
+    if dialect == "sqlite":
+        conn.execute(text(f"INSERT INTO {SEARCH_TABLE} (rowid, abstract) VALUES (:paper_id, :abstract)"), params)
+    elif dialect == "postgresql":
+        conn.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (paper_id, document) VALUES (:paper_id, to_tsvector('simple', :abstract)) "
+            "ON CONFLICT (paper_id) DO UPDATE SET document = excluded.document"
+        ), params)
+
+def unindex_abstracts(conn, rows: List[Tuple[int, str]]):
+    """Remove (paper id, abstract) pairs. A contentless FTS5 table needs the indexed text to remove it."""
+    if not rows:
+        return
+    params = [{"paper_id": paper_id, "abstract": abstract} for paper_id, abstract in rows]
+    dialect = _dialect(conn)
+    if dialect == "sqlite":
+        conn.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, abstract) VALUES ('delete', :paper_id, :abstract)"
+        ), params)
+    elif dialect == "postgresql":
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE paper_id = :paper_id"), params)
+
+def backfill(conn: Connection) -> int:
+    """Index every stored abstract. Returns the number indexed."""
+    from .abstract_store import decompress
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT paper_id, data, dictionary_id FROM paper_abstracts WHERE paper_id > :last_id AND data IS NOT NULL "
+            "ORDER BY paper_id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BACKFILL_BATCH}).all()
+        if not rows:
+            return indexed
+        last_id = rows[-1].paper_id
+        index_abstracts(conn, [(r.paper_id, decompress(conn, r.data, r.dictionary_id)) for r in rows])
+        indexed += len(rows)
+
+def _words(keywords: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(w for kw in keywords for w in re.findall(r"\w+", kw.lower())))
+
+def abstract_matches(db, keywords: List[str]) -> ColumnElement:
+    """Filter for papers whose abstract contains a word starting with any keyword."""
+    words = _words(keywords)
+    if not words:
+        return false()
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        query = " OR ".join(f'"{w}"*' for w in words) # Quoted: words like OR and NOT aren't operators
+        ids = text(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :search_query")
+        return Paper.id.in_(ids.bindparams(search_query=query).columns(column("rowid")))
+    if dialect == "postgresql":
+        query = " | ".join(f"{w}:*" for w in words)
+        ids = text(f"SELECT paper_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', :search_query)")
+        return Paper.id.in_(ids.bindparams(search_query=query).columns(column("paper_id")))
+    return or_(*[Paper.abstract_preview.ilike(f"%{w}%") for w in words])
@@ -0,0 +1,84 @@
+"""
+Topic Time Series
+Builds the topic x month count matrix consumed by the changepoint and forecasting services.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func, extract, cast, Integer
+from database import Paper
+
+def year_of(column):
+    """Dialect-neutral year of a date column: strftime on SQLite, EXTRACT on Postgres."""
+    return cast(extract('year', column), Integer)
+
+def month_of(column):
+    return cast(extract('month', column), Integer)
+
+def primary_category(categories: str) -> str:
+    """Same topic rule as /api/trends: the first listed category."""
+    return categories.split(',')[0].strip() if categories else "Uncategorized"
+
+def build_topic_month_matrix(db: Session) -> Tuple[List[str], pd.DatetimeIndex, np.ndarray]:
+    """
+    Aggregate paper counts per (primary category, month).
+    Returns (topics, months, matrix) where matrix[i, j] is the count of topic i in month j.
+    Months are contiguous so that missing months are explicit zeros.
+    """
+    year, month = year_of(Paper.published_date).label('year'), month_of(Paper.published_date).label('month')
+    rows = db.query(
+        year,
+        month,
+        Paper.categories,
+        func.count(Paper.id).label('count')
+    ).group_by(year, month, Paper.categories).all()
+
+    rows = [r for r in rows if r.year]
+    if not rows:
+        return [], pd.DatetimeIndex([]), np.zeros((0, 0))
+
+    topic_of_row = [primary_category(r.categories) for r in rows]
+    topics = sorted(set(topic_of_row))
+    month_of_row = pd.DatetimeIndex([pd.Timestamp(r.year, r.month, 1) for r in rows])
+    months = pd.date_range(month_of_row.min(), month_of_row.max(), freq='MS')
+
+    topic_idx = {t: i for i, t in enumerate(topics)}
+    row_idx = np.array([topic_idx[t] for t in topic_of_row])
+    col_idx = months.get_indexer(month_of_row)
+    counts = np.array([r.count for r in rows], dtype=float)
+
+    matrix = np.zeros((len(topics), len(months)))
+    # Several raw category strings can share a primary category, so accumulate
+    np.add.at(matrix, (row_idx, col_idx), counts)
+    return topics, months, matrix
+
+def load_topic_month_matrix(db: Session, until_id: Optional[int] = None) -> Tuple[List[str], pd.DatetimeIndex, np.ndarray]:
+    """
+    Same result as build_topic_month_matrix, computed from the columnar corpus snapshot
+    (brought up to date first) instead of an aggregate query over the papers table.
+    until_id: count only papers with ids up to it.
+    """
+    from .corpus_snapshot import CorpusSnapshot, update_snapshot
+
+    update_snapshot(db, until_id=until_id)
+    snapshot = CorpusSnapshot.load(until_id=until_id)
+    if snapshot is None:
+        return build_topic_month_matrix(db)
+    return snapshot.topic_month_matrix()
+
+_matrix_cache: Dict[Tuple[int, int], Tuple[List[str], pd.DatetimeIndex, np.ndarray]] = {}
+
+def cached_topic_month_matrix(db: Session) -> Tuple[List[str], pd.DatetimeIndex, np.ndarray]:
+    """
+    load_topic_month_matrix for API reads, recomputed only when the data version or the
+    committed corpus changed since the last call.
+    """
+    from .corpus_snapshot import committed_paper_id
+    from .data_version import get_data_version
+
+    key = (get_data_version(), committed_paper_id(db))
+    if key not in _matrix_cache:
+        _matrix_cache.clear()
+        _matrix_cache[key] = load_topic_month_matrix(db, until_id=key[1])
+    return _matrix_cache[key]
@@ -1,13 +1,19 @@
 from bertopic import BERTopic
-from sklearn.feature_extraction.text import CountVectorizer
 from umap import UMAP
 from hdbscan import HDBSCAN
 import pandas as pd
+import numpy as np
 import logging
-from typing import List, Dict, Tuple
+import os
+from typing import List, Dict, Optional, Tuple
+from database import DB_DIR
+from .keyword_service import make_vectorizer
 
 logger = logging.getLogger(__name__)
 
+# Trained model, used to assign topics to newly ingested papers
+TOPIC_MODEL_FILE = os.path.join(DB_DIR, "models", "bertopic.pkl")
+
 class TopicModelingService:
     def __init__(self):
         # FR-2.1.2: Topic Clustering configuration
@@ -29,7 +35,7 @@ class TopicModelingService:
         )
         
         # c-TF-IDF for keyword extraction (FR-2.1.3)
-        self.vectorizer_model = CountVectorizer(stop_words="english")
+        self.vectorizer_model = make_vectorizer()
         
         # Initialize BERTopic
         self.topic_model = BERTopic(
@@ -61,6 +67,32 @@ class TopicModelingService:
             logger.error(f"Error training topic model: {e}")
             raise e
 
+    def save(self, path: str = TOPIC_MODEL_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # Embeddings are passed in explicitly, so the embedding model is not pickled with it
+        self.topic_model.save(tmp_path, serialization="pickle", save_embedding_model=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = TOPIC_MODEL_FILE) -> Optional["TopicModelingService"]:
+        """The saved model, or None if none has been trained yet."""
+        if not os.path.exists(path):
+            return None
+        service = cls()
+        service.topic_model = BERTopic.load(path)
+        service.is_trained = True
+        return service
+
+    def assign_topics(self, docs: List[str], embeddings: Optional[np.ndarray] = None) -> List[int]:
+        """
+        FR-2.2.1: Assign new papers to the existing topics without retraining.
+        """
+        if not self.is_trained or not docs:
+            return []
+        topics, _ = self.topic_model.transform(docs, embeddings=embeddings)
+        return [int(t) for t in topics]
+
     def get_topic_info(self) -> pd.DataFrame:
         if not self.is_trained:
             return pd.DataFrame()
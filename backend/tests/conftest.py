@@ -0,0 +1,27 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Before services.metrics is imported: the test run's samples go to a scratch directory, not data/metrics
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+atexit.register(shutil.rmtree, os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh database with the current schema. A file, not in-memory: some tests use it from threads."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def db_session(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
@@ -0,0 +1,35 @@
+from datetime import date
+import numpy as np
+from database import Paper, PaperAbstract
+from services import abstract_store
+from services.abstract_store import recompress_abstracts
+from benchmarks.synthetic import VOCABULARY
+
+def test_abstract_round_trips_through_compressed_storage(db_session):
+    text = "Transformers " * 40
+    db_session.add(Paper(source="arxiv", external_id="a", title="A", abstract=text, published_date=date(2024, 1, 1)))
+    db_session.commit()
+    db_session.expunge_all()
+
+    paper = db_session.query(Paper).one()
+    assert paper.abstract_preview == text[:300] + "..."
+    assert paper.abstract == text
+    assert len(db_session.query(PaperAbstract).one().data) < len(text)
+
+def test_pipeline_stage_trains_dictionary_and_recompresses(monkeypatch, db_session):
+    monkeypatch.setattr(abstract_store, "MIN_TRAINING_SAMPLES", 100)
+    monkeypatch.setattr(abstract_store, "DICTIONARY_SIZE", 8 * 1024)
+    rng = np.random.default_rng(0)
+    texts = [" ".join(VOCABULARY[i] for i in rng.integers(0, len(VOCABULARY), 60)) for _ in range(400)]
+    db_session.add_all([Paper(source="arxiv", external_id=str(i), title="T", abstract=t) for i, t in enumerate(texts)])
+    db_session.commit()
+    before = sum(len(r.data) for r in db_session.query(PaperAbstract).all())
+
+    # Trained on the first run, so everything stored before is rewritten whatever the range
+    assert recompress_abstracts(db_session, 200, 400) == 400
+    assert recompress_abstracts(db_session, 0, 400) == 0
+    db_session.expire_all()
+    records = db_session.query(PaperAbstract).all()
+    assert {r.dictionary_id for r in records} != {None}
+    assert sum(len(r.data) for r in records) < before
+    assert [p.abstract for p in db_session.query(Paper).order_by(Paper.id)] == texts
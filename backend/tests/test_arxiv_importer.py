@@ -0,0 +1,65 @@
+import datetime
+import gzip
+import json
+from database import Paper, PaperAbstract, Author, paper_authors
+from services import data_version
+from services.arxiv_importer import AuthorResolver, import_snapshot, load_batch, parse_record
+
+ABSTRACT = "We study a problem at length and report results that are long enough to pass validation."
+
+def _record(arxiv_id, categories="cs.LG", authors=(("Lovelace", "Ada", ""),), **extra):
+    return {
+        "id": arxiv_id,
+        "title": "A  Paper\n  Title",
+        "abstract": f"  {ABSTRACT}\n",
+        "categories": categories,
+        "authors_parsed": [list(a) for a in authors],
+        "versions": [{"version": "v1", "created": "Mon, 1 Jan 2024 10:00:00 GMT"},
+                     {"version": "v2", "created": "Fri, 5 Jan 2024 10:00:00 GMT"}],
+        **extra,
+    }
+
+def test_parse_record_matches_collector_shape():
+    row, authors = parse_record(_record("2401.00001", "cs.LG stat.ML", comments="Accepted at NeurIPS 2024", doi="10.1/x"))
+    assert row == ("http://arxiv.org/abs/2401.00001v2", "10.1/x", "A Paper Title", ABSTRACT,
+                   datetime.date(2024, 1, 1), "cs.LG, stat.ML", "NEURIPS", None)
+    assert authors == ["Ada Lovelace"]
+    # Filtered categories and records failing validation are dropped
+    assert parse_record(_record("2401.00002", "hep-th"), frozenset(["cs.LG"])) is None
+    assert parse_record(_record("2401.00003", authors=())) is None
+
+def test_import_skips_stored_papers_and_reuses_authors(tmp_path, monkeypatch, session_factory, db_session):
+    monkeypatch.setattr(data_version, "SessionLocal", session_factory)
+    ada = Author(name="Ada Lovelace", normalized_name="ada lovelace")
+    db_session.add(Paper(source="arxiv", external_id="http://arxiv.org/abs/2401.00001v1", title="Stored",
+                 published_date=datetime.date(2024, 1, 1), authors=[ada]))
+    db_session.commit()
+
+    records = [
+        _record("2401.00001"), # Stored at an earlier version
+        _record("2401.00002", authors=(("Lovelace", "Ada", ""), ("Hopper", "Grace", ""))),
+        _record("2401.00003", "hep-th"),
+        _record("2401.00004", **{"journal-ref": "ICML 2024"}),
+    ]
+    path = tmp_path / "snapshot.json.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(json.dumps(r) for r in records) + "\n")
+
+    stats = import_snapshot(db_session, str(path), max_workers=2)
+    assert stats == {"lines": 4, "parsed": 3, "duplicates": 1, "inserted": 2}
+    papers = {p.external_id: p for p in db_session.query(Paper).all()}
+    assert set(papers) == {"http://arxiv.org/abs/2401.00001v1", "http://arxiv.org/abs/2401.00002v2",
+                           "http://arxiv.org/abs/2401.00004v2"}
+    assert [a.name for a in papers["http://arxiv.org/abs/2401.00002v2"].authors] == ["Ada Lovelace", "Grace Hopper"]
+    assert papers["http://arxiv.org/abs/2401.00004v2"].venue == "ICML 2024"
+    assert db_session.query(Author).count() == 2
+
+def test_batch_adds_no_rows_for_papers_stored_meanwhile(db_session):
+    batch = [parse_record(_record("2401.00005")), parse_record(_record("2401.00006"))]
+    assert load_batch(db_session, batch[:1], AuthorResolver(db_session)) == 1
+    # Another import stored the first paper after this one read the stored ids
+    assert load_batch(db_session, batch, AuthorResolver(db_session)) == 1
+
+    assert db_session.query(Paper).count() == db_session.query(PaperAbstract).count() == 2
+    assert db_session.query(paper_authors).count() == 2
+
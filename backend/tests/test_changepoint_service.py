@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from services.changepoint_service import ChangepointService
+
+def _step_matrix():
+    rng = np.random.default_rng(0)
+    flat = rng.normal(5, 0.5, 40)
+    step = np.concatenate([rng.normal(1, 0.3, 20), rng.normal(10, 0.3, 20)])
+    return np.vstack([flat, step])
+
+def test_batch_detection_finds_step():
+    service = ChangepointService()
+    dates = pd.date_range("2020-01-01", periods=40, freq="MS")
+    results = service.detect_changepoints_batch(_step_matrix(), dates, ["flat", "step"], max_workers=1)
+
+    assert set(results.keys()) == {"flat", "step"}
+    assert any(cp["type"] == "Explosion" for cp in results["step"])
+
+def test_long_series_uses_linear_cost_model():
+    service = ChangepointService()
+    signal = np.concatenate([np.zeros(150), np.full(150, 8.0)]) + np.random.default_rng(1).normal(0, 0.2, 300)
+    dates = pd.date_range("2000-01-01", periods=300, freq="D")
+    cps = service.detect_changepoints(signal, dates)
+
+    assert len(cps) == 1
+    assert 145 <= cps[0]["index"] <= 155
+
+def test_l2_penalty_uses_noise_not_the_shift():
+    signal = np.concatenate([np.zeros(150), np.full(150, 8.0)]) + np.random.default_rng(1).normal(0, 0.2, 300)
+    # The step dominates the total variance (~16); the penalty scales with the noise (0.04)
+    assert 0.02 < ChangepointService._noise_variance(signal) < 0.08
+    assert ChangepointService._noise_variance(np.array([0, 0, 0, 3, 0, 0.0])) == np.var([0, 0, 0, 3, 0, 0.0])
+
+def test_online_detector_flags_explosion_and_roundtrips_state():
+    from services.changepoint_service import OnlineChangepointDetector
+
+    rng = np.random.default_rng(2)
+    detector = OnlineChangepointDetector()
+    events = [detector.update(c) for c in rng.poisson(2, 40)]
+    # State survives serialization between ingests
+    detector = OnlineChangepointDetector(detector.to_state())
+    events += [detector.update(c) for c in rng.poisson(20, 10)]
+    flagged = [e for e in events if e]
+
+    assert any(e["type"] == "Explosion" and 38 <= e["index"] <= 42 for e in flagged)
+    assert len(detector.log_probs) <= OnlineChangepointDetector.MAX_RUN_LENGTH
+
+def test_all_pairs_crossovers_match_pairwise():
+    service = ChangepointService()
+    rng = np.random.default_rng(3)
+    matrix = rng.poisson(5, (6, 24)).astype(float)
+    dates = pd.date_range("2020-01-01", periods=24, freq="MS")
+    topics = [f"t{i}" for i in range(6)]
+
+    # Tiny chunks force several blocks
+    all_pairs = service.detect_crossovers_all_pairs(matrix, dates, topics, max_chunk_elements=50)
+
+    expected = []
+    for a in range(6):
+        for b in range(a + 1, 6):
+            expected += service.detect_crossovers(pd.Series(matrix[a], index=dates), pd.Series(matrix[b], index=dates), topics[a], topics[b])
+    key = lambda c: (c["date"], c["event"], c["magnitude"])
+    assert sorted(map(key, all_pairs)) == sorted(map(key, expected))
+
+def test_online_update_counts_papers_that_arrive_after_their_bucket(db_session, monkeypatch):
+    import json
+    from datetime import date, timedelta
+    from database import Paper, TopicStreamState
+    from services import changepoint_service
+    from services.changepoint_service import run_online_changepoint_update
+
+    def add(days_ago, n):
+        db_session.add_all([Paper(source="arxiv", external_id=f"{days_ago}-{n}-{i}",
+                                  title="T", categories="cs.AI", published_date=date.today() - timedelta(days=days_ago))
+                            for i in range(n)])
+        db_session.commit()
+
+    def fed():
+        return sum(json.loads(db_session.query(TopicStreamState).one().state)["history"])
+
+    settle = changepoint_service.SETTLE_DAYS
+    for days_ago in range(settle, settle + 20):
+        add(days_ago, 2)
+    run_online_changepoint_update(db_session)
+    assert fed() == 40
+
+    # Late: in buckets already consumed, one recent enough to count and one back-filled
+    add(settle + 3, 5)
+    add(settle + changepoint_service.LATE_ARRIVAL_DAYS + 5, 7)
+    # Nothing to feed yet: the late papers wait rather than being skipped
+    run_online_changepoint_update(db_session)
+    monkeypatch.setattr(changepoint_service, "SETTLE_DAYS", settle - 1)
+    add(settle - 1, 1)
+    run_online_changepoint_update(db_session)
+    assert fed() == 46
@@ -0,0 +1,43 @@
+import datetime
+import gzip
+import json
+from database import Paper, Author, citations
+from services import data_version
+from services.citation_importer import import_citations, normalize_arxiv_id
+
+def test_normalize_arxiv_id():
+    assert normalize_arxiv_id("http://arxiv.org/abs/2401.01234v2") == "2401.01234"
+    assert normalize_arxiv_id("arXiv:hep-th/9901001") == "hep-th/9901001"
+
+def test_import_matches_by_doi_pmid_and_arxiv(tmp_path, monkeypatch, session_factory, db_session):
+    monkeypatch.setattr(data_version, "SessionLocal", session_factory)
+    author = Author(name="Ada", normalized_name="ada")
+    a = Paper(source="arxiv", external_id="http://arxiv.org/abs/2401.00001v1", title="A", published_date=datetime.date(2024, 1, 1), authors=[author])
+    b = Paper(source="pubmed", external_id="PMID:42", title="B", published_date=datetime.date(2024, 1, 1), authors=[author])
+    c = Paper(source="pubmed", external_id="DOI:10.1/C", doi="10.1/C", title="C", published_date=datetime.date(2024, 1, 1))
+    db_session.add_all([a, b, c])
+    db_session.commit()
+
+    works = [
+        {"id": "W1", "doi": "https://doi.org/10.48550/arXiv.2401.00001", "referenced_works": ["W2", "W3", "W9"]},
+        {"id": "W2", "ids": {"pmid": "https://pubmed.ncbi.nlm.nih.gov/42"}, "referenced_works": ["W3"]},
+        {"id": "W3", "doi": "https://doi.org/10.1/c", "referenced_works": []},
+        {"id": "W9", "doi": "https://doi.org/10.9/outside", "referenced_works": ["W3", "W1"]},
+    ]
+    path = tmp_path / "works.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(json.dumps(w) for w in works))
+
+    result = import_citations(db_session, str(path))
+    db_session.expire_all()
+
+    edges = set(db_session.query(citations.c.citing_paper_id, citations.c.cited_paper_id).all())
+    assert edges == {(a.id, b.id), (a.id, c.id), (b.id, c.id)}
+    # Citations from works outside the corpus still count
+    assert (a.citation_count, b.citation_count, c.citation_count) == (1, 1, 3)
+    assert author.citation_count == 2
+    assert result["matched"] == 3
+
+    # Re-importing is idempotent
+    import_citations(db_session, str(path))
+    assert db_session.query(citations).count() == 3
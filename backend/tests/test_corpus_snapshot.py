@@ -0,0 +1,59 @@
+import datetime
+import numpy as np
+from database import Paper, Author
+from services import corpus_snapshot, data_version, timeseries
+from services.corpus_snapshot import CorpusSnapshot, update_snapshot
+from services.timeseries import build_topic_month_matrix
+
+def _add_papers(db, start, count):
+    authors = db.query(Author).order_by(Author.id).all() or [Author(name=f"Author {i}", normalized_name=f"author {i}") for i in range(5)]
+    for i in range(start, start + count):
+        db.add(Paper(
+            source="arxiv" if i % 2 else "pubmed",
+            external_id=f"paper-{i}",
+            title=f"Paper {i}",
+            published_date=datetime.date(2020 + i % 3, 1 + i % 12, 1),
+            categories=["cs.LG, cs.AI", "cs.CV", "Medical AI"][i % 3],
+            authors=authors[i % 3:i % 3 + 2]
+        ))
+    db.commit()
+
+def test_incremental_snapshot_matches_orm_aggregation(tmp_path, db_session):
+    _add_papers(db_session, 0, 30)
+    assert update_snapshot(db_session, path=str(tmp_path), batch_size=7) == 30
+    _add_papers(db_session, 30, 20)
+    assert update_snapshot(db_session, path=str(tmp_path)) == 20
+
+    snapshot = CorpusSnapshot.load(str(tmp_path))
+    assert len(snapshot) == 50
+    assert snapshot.author_ptr[-1] == len(snapshot.author_idx) == 100
+
+    topics, months, matrix = snapshot.topic_month_matrix()
+    expected_topics, expected_months, expected_matrix = build_topic_month_matrix(db_session)
+    assert topics == expected_topics
+    assert list(months) == list(expected_months)
+    assert np.array_equal(matrix, expected_matrix)
+
+def test_loading_up_to_an_id_hides_later_papers(tmp_path, db_session):
+    _add_papers(db_session, 0, 30)
+    until_id = db_session.query(Paper.id).order_by(Paper.id).offset(19).limit(1).scalar()
+    assert update_snapshot(db_session, path=str(tmp_path), until_id=until_id) == 20
+    assert update_snapshot(db_session, path=str(tmp_path)) == 10
+
+    snapshot = CorpusSnapshot.load(str(tmp_path), until_id=until_id)
+    assert len(snapshot) == 20 and snapshot.ids[-1] == until_id
+    assert len(snapshot.author_idx) == snapshot.author_ptr[-1] == 40
+
+def test_cached_matrix_is_rebuilt_only_when_papers_arrive(tmp_path, monkeypatch, session_factory, db_session):
+    monkeypatch.setattr(corpus_snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(data_version, "SessionLocal", session_factory)
+    monkeypatch.setattr(timeseries, "_matrix_cache", {})
+    _add_papers(db_session, 0, 30)
+
+    first = timeseries.cached_topic_month_matrix(db_session)
+    assert timeseries.cached_topic_month_matrix(db_session) is first
+    assert first[2].sum() == 30
+
+    _add_papers(db_session, 30, 6)
+    data_version.bump_data_version()
+    assert timeseries.cached_topic_month_matrix(db_session)[2].sum() == 36
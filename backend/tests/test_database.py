@@ -0,0 +1,66 @@
+import os
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from database import Base, Paper
+import migrations
+from migrations import run_migrations
+from services.timeseries import year_of, build_topic_month_matrix
+
+def test_migrations_apply_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, "LOCK_FILE", str(tmp_path / "migrations.lock"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+
+    assert run_migrations(engine) == [m[0] for m in migrations.MIGRATIONS]
+    assert run_migrations(engine) == []
+    indexes = {i["name"] for i in inspect(engine).get_indexes("paper_authors")}
+    assert {"ix_paper_authors_paper_id", "ix_paper_authors_author_id"} <= indexes
+
+def test_date_bucketing_is_portable():
+    sql = str(year_of(Paper.published_date).compile(dialect=postgresql.dialect()))
+    assert "EXTRACT(year FROM papers.published_date)" in sql
+    assert "strftime" not in sql.lower()
+
+@pytest.mark.skipif(not os.environ.get("TEST_DATABASE_URL"), reason="set TEST_DATABASE_URL to run against Postgres")
+def test_topic_month_matrix_on_server_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, "LOCK_FILE", str(tmp_path / "migrations.lock"))
+    engine = create_engine(os.environ["TEST_DATABASE_URL"])
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add_all([
+            Paper(source="arxiv", external_id="a", title="A", categories="cs.LG", published_date=date(2024, 1, 5)),
+            Paper(source="arxiv", external_id="b", title="B", categories="cs.LG, cs.AI", published_date=date(2024, 3, 9)),
+            Paper(source="arxiv", external_id="c", title="C", categories="cs.CV", published_date=date(2024, 3, 1)),
+        ])
+        db.commit()
+        topics, months, matrix = build_topic_month_matrix(db)
+        assert topics == ["cs.CV", "cs.LG"]
+        assert len(months) == 3
+        assert matrix.tolist() == [[0, 0, 1], [1, 0, 1]]
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+
+def test_abstracts_move_out_of_the_papers_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrations, "LOCK_FILE", str(tmp_path / "migrations.lock"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Papers as stored before migration 3
+        conn.execute(text("ALTER TABLE papers ADD COLUMN abstract TEXT"))
+        conn.execute(text("INSERT INTO papers (id, source, external_id, title, abstract) VALUES (1, 'arxiv', 'a', 'A', :abstract)"),
+                     {"abstract": "x" * 400})
+
+    run_migrations(engine)
+    assert "abstract" not in {c["name"] for c in inspect(engine).get_columns("papers")}
+    db = sessionmaker(bind=engine)()
+    paper = db.query(Paper).one()
+    assert paper.abstract == "x" * 400
+    assert paper.abstract_preview == "x" * 300 + "..."
+    db.close()
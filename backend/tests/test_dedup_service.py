@@ -0,0 +1,55 @@
+from database import Paper, PaperDuplicate, PaperSignature
+from services import dedup_service
+from services.dedup_service import DuplicateResolver, index_papers, minhash, similarity
+
+ABSTRACT = ("We propose a retrieval augmented language model that detects medication errors in electronic "
+            "prescriptions by grounding its predictions in structured drug interaction databases. On three "
+            "hospital datasets it reduces missed errors by a third compared with rule based systems, and its "
+            "explanations were preferred by pharmacists in a blinded study of two hundred prescriptions.")
+OTHER = ("Graph neural networks learn representations of molecules for property prediction. We study how "
+         "message passing depth affects oversmoothing on large benchmark suites and propose a residual "
+         "gating scheme that keeps accuracy stable as depth grows beyond thirty layers.")
+
+def test_signatures_estimate_similarity():
+    title = "Retrieval-Augmented Detection of Medication Errors"
+    same = similarity(minhash(title, ABSTRACT), minhash(title.upper() + ".", ABSTRACT + " "))
+    edited = similarity(minhash(title, ABSTRACT), minhash(title, ABSTRACT.replace("a third", "one third")))
+    unrelated = similarity(minhash(title, ABSTRACT), minhash("Deep Message Passing", OTHER))
+    assert same == 1.0 and 0.8 <= edited < 1.0 and unrelated < 0.1
+    assert minhash("", None) is None
+
+def test_resolver_matches_by_doi_then_minhash(db_session):
+    title = "Retrieval-Augmented Detection of Medication Errors"
+    db_session.add_all([
+        Paper(id=1, source="arxiv", external_id="http://arxiv.org/abs/2401.00001v1", doi="10.1000/abc", title=title),
+        Paper(id=2, source="arxiv", external_id="http://arxiv.org/abs/2401.00002v1", title="Deep Message Passing"),
+    ])
+    db_session.commit()
+    resolver = DuplicateResolver(db_session)
+    resolver.index(1, title, ABSTRACT)
+    resolver.index(2, "Deep Message Passing", OTHER)
+    db_session.commit()
+
+    assert resolver.find("https://doi.org/10.1000/ABC", "Another title", None) == (1, "doi", 1.0)
+    match = resolver.find(None, title.lower(), ABSTRACT.replace("a third", "one third"))
+    assert match.canonical_id == 1 and match.method == "minhash"
+    assert resolver.find(None, "Unrelated Work on Protein Folding", OTHER[:60] + ABSTRACT[-80:]) is None
+
+    resolver.record("pubmed", "PMID:123", None, match)
+    assert resolver.seen("PMID:123") and not resolver.seen("PMID:124")
+    assert db_session.query(PaperDuplicate).one().canonical_id == 1
+    db_session.close()
+
+def test_index_papers_backfills_missing_signatures(db_session, monkeypatch):
+    db_session.add_all([Paper(id=i, source="arxiv", external_id=str(i), title=f"Paper number {i}") for i in (1, 2, 3)])
+    db_session.commit()
+    assert index_papers(db_session, 0, 2) == 2
+    assert index_papers(db_session, 0, 3) == 1
+    assert db_session.query(PaperSignature).count() == 3
+
+    # Larger ranges are indexed in batches
+    db_session.add_all([Paper(id=i, source="arxiv", external_id=str(i), title=f"Paper number {i}") for i in range(4, 10)])
+    db_session.commit()
+    monkeypatch.setattr(dedup_service, "INDEX_BATCH", 4)
+    assert index_papers(db_session, 0, 9) == 6
+    db_session.close()
@@ -0,0 +1,39 @@
+import json
+from datetime import date
+from database import Paper
+from services.discovery_service import search_papers, get_recommended_papers
+from services.responses import FastJSONResponse
+
+def test_list_items_are_built_from_projected_columns(db_session):
+    db_session.add_all([
+        Paper(source="arxiv", external_id="a", title="Attention models", abstract="y" * 400,
+              published_date=date(2024, 2, 1), categories="cs.LG", venue="ICML"),
+        Paper(source="pubmed", external_id="b", title="Clinical attention", abstract="short",
+              published_date=date(2024, 1, 1), categories="q-bio"),
+    ])
+    db_session.commit()
+
+    results = search_papers(db_session, "attention")
+    assert [r["venue"] for r in results] == ["ICML", "PUBMED"]
+    assert results[0]["abstract"] == "y" * 300 + "..."
+    assert results[0]["date"] == "2024-02-01"
+    assert get_recommended_papers(db_session)[0]["abstract"] == "y" * 200 + "..."
+
+    body = json.loads(FastJSONResponse({"results": results, "day": date(2024, 1, 1)}).body)
+    assert body["results"] == results and body["day"] == "2024-01-01"
+
+def test_search_matches_the_whole_compressed_abstract(db_session):
+    paper = Paper(source="arxiv", external_id="a", title="A study", abstract="x " * 300 + "transformers for sepsis",
+                  published_date=date(2024, 2, 1))
+    db_session.add(paper)
+    db_session.commit()
+    assert [r["id"] for r in search_papers(db_session, "sepsis")] == [paper.id]
+    assert [r["id"] for r in search_papers(db_session, "transform")] == [paper.id] # Word prefixes match
+
+    # Rewritten abstracts are reindexed, deleted ones unindexed
+    paper.abstract = "x " * 300 + "delirium"
+    db_session.commit()
+    assert search_papers(db_session, "sepsis") == [] and len(search_papers(db_session, "delirium")) == 1
+    paper.abstract = None
+    db_session.commit()
+    assert search_papers(db_session, "delirium") == []
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from services.embedding_service import EmbeddingService
 
 def test_embedding_generation():
@@ -8,3 +9,12 @@ def test_embedding_generation():
     
     assert embeddings is not None
     assert embeddings.shape == (2, 384) # 2 texts, 384 dimensions
+
+def test_token_batches_group_similar_lengths_within_budget():
+    from services.embedding_service import token_batches
+    lengths = np.array([10, 500, 12, 480, 11, 9])
+    batches = token_batches(lengths, token_budget=1000, max_batch=3)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(6))
+    assert [b.tolist() for b in batches] == [[1, 3], [2, 4, 0], [5]]
+    for batch in batches:
+        assert len(batch) * lengths[batch].max() <= 1000
@@ -0,0 +1,29 @@
+import json
+import numpy as np
+import pandas as pd
+from services.forecasting_service import ForecastingService
+
+def _seasonal_matrix(n_topics=3, n_months=48):
+    rng = np.random.default_rng(0)
+    t = np.arange(n_months)
+    return np.vstack([10 + 0.5 * t + 3 * np.sin(2 * np.pi * t / 12) + rng.normal(0, 0.5, n_months) for _ in range(n_topics)])
+
+def test_batch_forecast_is_json_friendly_with_bands():
+    service = ForecastingService()
+    months = pd.date_range("2018-01-01", periods=48, freq="MS")
+    results = service.forecast_topics_batch(_seasonal_matrix(), months, ["a", "b", "c"], periods=6, max_workers=1)
+
+    r = results["a"]
+    assert len(r["forecast_values"]) == 6
+    assert all(lo <= v <= hi for lo, v, hi in zip(r["lower"], r["forecast_values"], r["upper"]))
+    json.dumps(r) # model_params must serialize
+
+def test_warm_start_from_previous_params():
+    service = ForecastingService()
+    months = pd.date_range("2018-01-01", periods=48, freq="MS")
+    matrix = _seasonal_matrix(1)
+    first = service.forecast_topics_batch(matrix, months, ["a"], max_workers=1)["a"]
+    warm = service.forecast_topics_batch(matrix, months, ["a"], previous_params={"a": first["model_params"]}, max_workers=1)["a"]
+
+    assert "error" not in warm
+    assert np.allclose(warm["forecast_values"], first["forecast_values"], rtol=0.1)
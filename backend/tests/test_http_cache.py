@@ -0,0 +1,51 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+from services import data_version, http_cache
+
+def _client(session_factory, monkeypatch):
+    monkeypatch.setattr(data_version, "SessionLocal", session_factory)
+    calls = []
+    app = FastAPI()
+    app.middleware("http")(http_cache.conditional_get_middleware)
+    app.add_middleware(GZipMiddleware, minimum_size=http_cache.COMPRESS_MIN_BYTES)
+
+    @app.get("/api/stats")
+    def stats():
+        calls.append(1)
+        return {"topics": ["topic"] * 500}
+
+    return TestClient(app), calls
+
+def test_unchanged_data_is_not_modified_without_running_the_handler(session_factory, monkeypatch):
+    client, calls = _client(session_factory, monkeypatch)
+    data_version.bump_data_version()
+
+    first = client.get("/api/stats")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag == 'W/"1.0"' and "last-modified" in first.headers
+
+    cached = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["etag"] == etag and len(calls) == 1
+    # Weak or strong, anywhere in the list
+    assert client.get("/api/stats", headers={"If-None-Match": '"other", "1.0"'}).status_code == 304
+    since = client.get("/api/stats", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304 and len(calls) == 1
+
+    # Recomputed influence scores or a new ingest change the tag
+    data_version.bump_analytics_version()
+    fresh = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["etag"] == 'W/"1.1"' and len(calls) == 2
+
+def test_large_responses_are_compressed(session_factory, monkeypatch):
+    client, _ = _client(session_factory, monkeypatch)
+    response = client.get("/api/stats", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["topics"][0] == "topic"
+
+def test_brotli_when_accepted(session_factory, monkeypatch):
+    pytest.importorskip("brotli")
+    client, _ = _client(session_factory, monkeypatch)
+    response = client.get("/api/stats", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "br" and "etag" in response.headers
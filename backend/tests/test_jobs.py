@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from database import JobRun
+from services import jobs, scheduler
+
+class RecordingExecutor:
+    """Queues submissions without running them."""
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, func, *args):
+        from concurrent.futures import Future
+        self.calls.append((func, args))
+        return Future()
+
+def _setup(session_factory, monkeypatch):
+    monkeypatch.setattr(scheduler, "SessionLocal", session_factory)
+    monkeypatch.setattr(jobs, "SessionLocal", session_factory)
+
+def test_duplicate_submissions_collapse_until_the_run_finishes(session_factory, monkeypatch):
+    _setup(session_factory, monkeypatch)
+
+    def job(n):
+        scheduler.report_progress(0.5, "halfway")
+        return {"doubled": n * 2}
+
+    monkeypatch.setitem(scheduler.JOB_FUNCTIONS, "double", job)
+    executor = RecordingExecutor()
+    db = session_factory()
+
+    run, created = jobs.submit(db, "double", {"n": 21}, executor=executor)
+    again, created_again = jobs.submit(db, "double", {"n": 21}, executor=executor)
+    other, _ = jobs.submit(db, "double", {"n": 1}, executor=executor)
+    assert created and not created_again and again.id == run.id
+    assert other.id != run.id and len(executor.calls) == 2
+    assert jobs.serialize_run(run)["status"] == "queued"
+
+    func, args = executor.calls[0]
+    func(*args) # What the pool worker runs
+    db.expire_all()
+    status = jobs.serialize_run(db.get(JobRun, run.id))
+    assert status["status"] == "success" and status["result"] == {"doubled": 42}
+    assert status["progress"] == 1.0 and status["message"] == "halfway"
+    assert status["queue_seconds"] >= 0 and status["duration_seconds"] >= 0
+
+    rerun, created = jobs.submit(db, "double", {"n": 21}, executor=executor)
+    assert created and rerun.id != run.id
+    db.close()
+
+def test_stale_runs_no_longer_block_submissions(session_factory, monkeypatch):
+    _setup(session_factory, monkeypatch)
+    monkeypatch.setitem(scheduler.JOB_FUNCTIONS, "noop", lambda: None)
+    executor = RecordingExecutor()
+    db = session_factory()
+
+    run, _ = jobs.submit(db, "noop", executor=executor)
+    run.status = "running"
+    run.updated_at = datetime.utcnow() - jobs.STALE_RUNNING_AFTER - timedelta(seconds=1)
+    db.commit()
+
+    fresh, created = jobs.submit(db, "noop", executor=executor)
+    assert created and fresh.id != run.id
+    assert db.get(JobRun, run.id).status == "failed"
+    db.close()
+
+def test_runs_queued_by_a_stopped_process_are_failed(session_factory, monkeypatch):
+    import os
+    import subprocess
+    import sys
+    _setup(session_factory, monkeypatch)
+    monkeypatch.setitem(scheduler.JOB_FUNCTIONS, "noop", lambda n: None)
+    executor = RecordingExecutor()
+    db = session_factory()
+
+    exited = subprocess.Popen([sys.executable, "-c", ""])
+    exited.wait()
+    owners = [f"{jobs.HOST}:{exited.pid}:0", f"{jobs.HOST}:{os.getpid()}:restarted", "elsewhere:1:0", jobs.OWNER]
+    runs = []
+    for n, owner in enumerate(owners):
+        run, _ = jobs.submit(db, "noop", {"n": n}, executor=executor)
+        run.owner = owner
+        runs.append(run)
+    db.commit()
+
+    assert jobs.fail_orphaned_runs(db) == 2
+    assert [db.get(JobRun, run.id).status for run in runs] == ["failed", "failed", "queued", "queued"]
+    # The dead process's run no longer blocks resubmission
+    run, _ = jobs.submit(db, "noop", {"n": 0}, executor=executor)
+    assert run.id != runs[0].id
+    db.close()
+
+def test_user_jobs_are_visible_to_their_user_only(session_factory, monkeypatch):
+    _setup(session_factory, monkeypatch)
+    monkeypatch.setitem(scheduler.JOB_FUNCTIONS, "profile_analysis", lambda profile_id: None)
+    executor = RecordingExecutor()
+    db = session_factory()
+
+    run, _ = jobs.submit(db, "profile_analysis", {"profile_id": 1}, executor=executor, user="alice")
+    assert run.user_key == "alice"
+    assert jobs.can_read(run, "alice") and not jobs.can_read(run, "mallory") and jobs.can_read(run, "mallory", admin=True)
+
+    run.error = "Traceback (most recent call last):\n  File \"secret.py\"\nValueError: boom"
+    assert jobs.serialize_run(run, details=False)["error"] == "ValueError: boom"
+    db.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import scipy.sparse as sp
+from services.keyword_service import TermMonthMatrix
+
+def _corpus():
+    texts, months = [], []
+    for month in range(24):
+        for i in range(20):
+            texts.append(f"neural network training paper {i}")
+            months.append(600 + month)
+        if month >= 21: # "diffusion" spikes in the last three months
+            texts += ["diffusion models for images"] * 15
+            months += [600 + month] * 15
+    texts.append("diffusion of innovations")
+    months.append(600)
+    return texts, months
+
+def test_incremental_updates_match_a_single_build(tmp_path):
+    texts, months = _corpus()
+    whole = TermMonthMatrix.empty()
+    whole.add(texts, months)
+
+    # Newer papers first, then older ones: months are prepended
+    path = str(tmp_path / "keywords.npz")
+    half = len(texts) // 2
+    incremental = TermMonthMatrix.empty()
+    incremental.add(texts[half:], months[half:])
+    incremental.save(path)
+    incremental = TermMonthMatrix.load(path)
+    incremental.add(texts[:half], months[:half])
+
+    assert incremental.first_month == whole.first_month == 600
+    assert np.array_equal(incremental.papers, whole.papers)
+    assert incremental.months()[0] == "2020-01"
+    order = np.argsort(incremental.terms)
+    assert np.array_equal(incremental.terms[order], np.sort(whole.terms))
+    assert (incremental.counts[order] != whole.counts[np.argsort(whole.terms)]).nnz == 0
+
+def test_emerging_ranks_spiking_terms_first():
+    texts, months = _corpus()
+    matrix = TermMonthMatrix.empty()
+    matrix.add(texts, months)
+    emerging = matrix.emerging(limit=3)
+    assert emerging[0]["term"] in ("diffusion", "models", "images")
+    assert emerging[0]["recent"] == 45 and emerging[0]["growth"] > 10
+    assert "network" not in [k["term"] for k in emerging]
+    # Stop words are dropped like in the topic model's keywords
+    assert "for" not in matrix.terms.tolist()
+
+def test_ranking_a_large_vocabulary():
+    # Its speed is measured by benchmarks/run.py
+    rng = np.random.default_rng(0)
+    n_terms, n_months = 100000, 120
+    counts = sp.random(n_terms, n_months, density=0.05, format="csc", random_state=0, dtype=np.float64)
+    counts.data = rng.integers(1, 50, counts.nnz).astype(np.int32)
+    matrix = TermMonthMatrix(np.array([f"t{i}" for i in range(n_terms)]), counts.astype(np.int32),
+                             np.full(n_months, 10000), 600)
+    emerging = matrix.emerging(limit=50)
+    assert len(emerging) == 50
+    assert [k["score"] for k in emerging] == sorted((k["score"] for k in emerging), reverse=True)
+
+def test_rare_old_terms_are_pruned(tmp_path):
+    matrix = TermMonthMatrix.empty()
+    long_term = "x" * 5000
+    matrix.add([f"{long_term} rare common"] + ["common"] * 3, [600, 600, 601, 602])
+    matrix.add(["common recent"], [640])
+    assert matrix.prune(min_papers=3, after_months=24) == 2
+    assert sorted(matrix.terms.tolist()) == ["common", "recent"] # Rare, but seen in the last 24 months
+    assert matrix.counts.shape == (2, 41) and matrix.counts.sum() == 6
+
+    # A long term doesn't widen the others
+    matrix.add([long_term], [640])
+    path = str(tmp_path / "keywords.npz")
+    matrix.save(path)
+    loaded = TermMonthMatrix.load(path)
+    assert loaded.terms.tolist() == matrix.terms.tolist() and loaded.terms.dtype == object
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import text
+from database import engine
+from services.metrics import compact_dead_processes, metrics_middleware, render_metrics
+
+def _sample(name, labels):
+    for family in text_string_to_metric_families(render_metrics().decode()):
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                return sample.value
+    return 0.0
+
+def test_request_latency_and_query_counts_per_route():
+    app = FastAPI()
+    app.middleware("http")(metrics_middleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    labels = {"method": "GET", "route": "/items/{item_id}"}
+    # Other tests' requests share the multiprocess directory, so compare deltas
+    requests_before = _sample("http_request_duration_seconds_count", labels)
+    queries_before = _sample("http_request_db_queries_sum", labels)
+
+    client = TestClient(app)
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+
+    assert _sample("http_request_duration_seconds_count", labels) - requests_before == 2
+    assert _sample("http_request_db_queries_sum", labels) - queries_before == 6
+
+def _write_samples(path, pid, value):
+    samples = MmapedDict(str(path / f"counter_{pid}.db"))
+    samples.write_value(mmap_key("jobs", "jobs_total", [], [], "Jobs run"), value, 0.0)
+    samples.close()
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+def _total(path):
+    metric, = MultiProcessCollector(None, path=str(path)).collect()
+    return metric.samples[0].value
+
+def test_exited_processes_are_folded_into_the_archive(tmp_path):
+    _write_samples(tmp_path, os.getpid(), 1.0)
+    _write_samples(tmp_path, _exited_pid(), 2.0)
+    _write_samples(tmp_path, _exited_pid(), 3.0)
+
+    assert compact_dead_processes(str(tmp_path)) == 2
+    assert sorted(f for f in os.listdir(tmp_path) if f.endswith(".db")) == sorted(["counter_archive.db", f"counter_{os.getpid()}.db"])
+    assert _total(tmp_path) == 6.0
+
+    _write_samples(tmp_path, _exited_pid(), 4.0)
+    assert compact_dead_processes(str(tmp_path)) == 1
+    assert compact_dead_processes(str(tmp_path)) == 0
+    assert _total(tmp_path) == 10.0
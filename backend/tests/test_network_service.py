@@ -0,0 +1,109 @@
+import numpy as np
+from services.network_service import NetworkService, top_subgraph
+
+PAPERS = [
+    {"authors": ["a", "b", "c"]},
+    {"authors": ["a", "b"]},
+    {"authors": ["c"]},
+    {"authors": ["b", "d"]},
+]
+IDS = {"a": 0, "b": 1, "c": 2, "d": 3}
+
+def _csr(papers):
+    author_idx = [IDS[a] for p in papers for a in p["authors"]]
+    author_ptr = np.concatenate([[0], np.cumsum([len(p["authors"]) for p in papers])])
+    return author_ptr, np.array(author_idx)
+
+def test_sparse_matrix_matches_graph_builder():
+    service = NetworkService()
+    G = service.build_coauthorship_graph(PAPERS)
+    matrix = service.coauthorship_matrix(*_csr(PAPERS))
+
+    assert G.nodes["b"]["paper_count"] == 3
+    for u, v, data in G.edges(data=True):
+        assert matrix[IDS[u], IDS[v]] == matrix[IDS[v], IDS[u]] == data["weight"]
+    assert matrix.nnz == 2 * G.number_of_edges()
+
+def test_top_subgraph_filters_nodes_and_weights():
+    matrix = NetworkService().coauthorship_matrix(*_csr(PAPERS))
+    nodes, strength, edges, weights = top_subgraph(matrix, top_nodes=2, min_weight=2)
+
+    assert set(nodes.tolist()) == {IDS["a"], IDS["b"]}
+    assert edges.tolist() in ([[IDS["b"], IDS["a"]]], [[IDS["a"], IDS["b"]]])
+    assert weights.tolist() == [2]
+
+def test_sparse_influence_matches_networkx():
+    import networkx as nx
+
+    service = NetworkService()
+    G = nx.karate_club_graph()
+    matrix = nx.to_scipy_sparse_array(G, nodelist=range(len(G)), weight="weight", format="csr")
+    metrics, convergence = service.calculate_influence_metrics_sparse(matrix)
+
+    assert convergence["pagerank"]["converged"] and convergence["eigenvector"]["converged"]
+    expected_pagerank = nx.pagerank(G, weight="weight")
+    expected_eigenvector = nx.eigenvector_centrality(G, weight="weight", max_iter=1000)
+    assert np.allclose(metrics["pagerank"], [expected_pagerank[n] for n in range(len(G))], atol=1e-4)
+    assert np.allclose(metrics["eigenvector"], [expected_eigenvector[n] for n in range(len(G))], atol=1e-4)
+    assert np.argmax(metrics["degree"]) == max(G.degree, key=lambda d: d[1])[0]
+
+def test_incremental_communities_only_touch_changed_part():
+    from scipy import sparse
+
+    # Two disjoint triangles
+    edges = [(0, 1), (1, 2), (0, 2), (3, 4), (4, 5), (3, 5)]
+    def adjacency(edges, n):
+        rows, cols = zip(*edges)
+        upper = sparse.coo_matrix((np.ones(len(edges)), (rows, cols)), shape=(n, n)).tocsr()
+        return upper + upper.T
+
+    service = NetworkService()
+    partition, affected = service.detect_communities_incremental(adjacency(edges, 6))
+    assert len(affected) == 6
+    assert partition[0] == partition[1] == partition[2] != partition[3] == partition[4] == partition[5]
+
+    # A new author joins the second triangle
+    grown = adjacency(edges + [(5, 6), (4, 6)], 7)
+    updated, affected = service.detect_communities_incremental(grown, partition, changed=np.array([4, 5, 6]))
+    assert sorted(affected.tolist()) == [3, 4, 5, 6]
+    assert updated[6] == updated[3] == partition[3] # Community id is stable
+    assert (updated[:3] == partition[:3]).all()
+
+def test_ego_network_is_bounded():
+    from services.network_service import ego_network
+
+    # d is only reachable from a through b
+    matrix = NetworkService().coauthorship_matrix(*_csr(PAPERS))
+    distance, edges, truncated = ego_network(matrix, IDS["a"], hops=1)
+    assert distance == {IDS["a"]: 0, IDS["b"]: 1, IDS["c"]: 1}
+    assert not truncated
+    assert len(edges) == 3 # a-b, a-c, b-c
+
+    distance, _, truncated = ego_network(matrix, IDS["a"], hops=2, max_nodes=2)
+    # The strongest tie (a-b, weight 2) is kept when the cap cuts the hop short
+    assert distance == {IDS["a"]: 0, IDS["b"]: 1} and truncated
+
+def test_coauthorship_cache_adds_each_paper_once(tmp_path, monkeypatch):
+    from services import network_service
+    from services.corpus_snapshot import CorpusSnapshot
+
+    class Snapshot:
+        def __init__(self, papers):
+            self.author_ptr, self.author_idx = _csr(papers)
+        def __len__(self):
+            return len(self.author_ptr) - 1
+
+    snapshot = Snapshot(PAPERS[:2])
+    monkeypatch.setattr(CorpusSnapshot, "load", classmethod(lambda cls, until_id=None: snapshot))
+    monkeypatch.setattr(network_service, "NETWORK_DIR", str(tmp_path))
+    monkeypatch.setattr(network_service, "COAUTHOR_MATRIX_FILE", str(tmp_path / "coauthor_matrix.npz"))
+
+    network_service.update_coauthorship_cache()
+    snapshot = Snapshot(PAPERS)
+    network_service.update_coauthorship_cache()
+    # Up to date: nothing is added again
+    network_service.update_coauthorship_cache()
+
+    matrix, done = network_service._load_cached_matrix()
+    assert done == len(PAPERS)
+    assert (matrix != NetworkService().coauthorship_matrix(*_csr(PAPERS))).nnz == 0
@@ -0,0 +1,67 @@
+from datetime import date
+from database import Paper, PipelineStageRun
+from services import data_version, pipeline
+from services.pipeline import Stage, run_pipeline, get_checkpoints
+
+def _add_papers(session_factory, n_papers):
+    db = session_factory()
+    db.add_all([Paper(source="arxiv", external_id=f"p{i}", title=f"Paper {i}", published_date=date(2024, 1, 1)) for i in range(n_papers)])
+    db.commit()
+    db.close()
+
+def test_stages_resume_from_their_checkpoints(tmp_path, monkeypatch, session_factory):
+    monkeypatch.setattr(pipeline, "LOCK_FILE", str(tmp_path / "pipeline.lock"))
+    monkeypatch.setattr(data_version, "SessionLocal", session_factory)
+    _add_papers(session_factory, 5)
+    calls = []
+    fail = {"b"}
+
+    def stage(name):
+        def func(db, since_id, until_id):
+            calls.append((name, since_id, until_id))
+            if name in fail:
+                raise RuntimeError("boom")
+            return until_id - since_id
+        return func
+
+    stages = [
+        Stage("a", stage("a")),
+        Stage("b", stage("b"), depends_on=("a",)),
+        Stage("c", stage("c"), depends_on=("b",)),
+        Stage("d", stage("d"), depends_on=("a",)),
+    ]
+
+    statuses = run_pipeline(stages, session_factory=session_factory)
+    assert statuses == {"a": "success", "b": "failed", "c": "blocked", "d": "success"}
+    db = session_factory()
+    assert get_checkpoints(db) == {"a": 5, "d": 5}
+    assert db.query(PipelineStageRun).filter(PipelineStageRun.stage == "a").one().rows == 5
+
+    # Resuming reruns only the failed stage and what it blocked
+    fail.clear()
+    calls.clear()
+    statuses = run_pipeline(stages, session_factory=session_factory)
+    assert statuses == {"a": "skipped", "b": "success", "c": "success", "d": "skipped"}
+    assert sorted(calls) == [("b", 0, 5), ("c", 0, 5)]
+
+    # New papers are processed incrementally
+    db.add(Paper(source="arxiv", external_id="p5", title="Paper 5"))
+    db.commit()
+    calls.clear()
+    run_pipeline(stages, session_factory=session_factory)
+    assert sorted(calls) == [("a", 5, 6), ("b", 5, 6), ("c", 5, 6), ("d", 5, 6)]
+    db.close()
+
+def test_topic_retraining_waits_for_a_running_pipeline(tmp_path, monkeypatch, db_session):
+    import threading
+    from services.embedding_store import EmbeddingStore
+    monkeypatch.setattr(pipeline, "LOCK_FILE", str(tmp_path / "pipeline.lock"))
+    monkeypatch.setattr(EmbeddingStore, "load", classmethod(lambda cls, *args: None))
+
+    finished = threading.Event()
+    with pipeline.pipeline_lock():
+        retrain = threading.Thread(target=lambda: (pipeline.retrain_topics(db_session), finished.set()))
+        retrain.start()
+        assert not finished.wait(0.3)
+    retrain.join(5)
+    assert finished.is_set()
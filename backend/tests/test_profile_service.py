@@ -0,0 +1,25 @@
+from starlette.requests import Request
+from services import profile_service
+from services.profile_service import DEFAULT_USER, issue_user_token, user_key
+
+def _request(token=None):
+    headers = [(b"x-user-token", token.encode())] if token else []
+    return Request({"type": "http", "headers": headers})
+
+def test_only_issued_user_tokens_are_accepted(tmp_path, monkeypatch):
+    monkeypatch.delenv("USER_TOKEN_SECRET", raising=False)
+    monkeypatch.setattr(profile_service, "SECRET_FILE", str(tmp_path / "secret"))
+    monkeypatch.setattr(profile_service, "_secret_key", None)
+
+    token = issue_user_token()
+    user = token.split(".")[0]
+    assert user_key(_request(token)) == user
+    assert user_key(_request()) == DEFAULT_USER
+    # Another user's id, or the default one, with a made-up signature
+    assert user_key(_request(f"{user}.forged")) is None
+    assert user_key(_request(f"{DEFAULT_USER}.{token.split('.')[1]}")) is None
+    assert user_key(_request(user)) is None
+
+    # The generated key is persisted, so tokens survive a restart
+    monkeypatch.setattr(profile_service, "_secret_key", None)
+    assert user_key(_request(token)) == user
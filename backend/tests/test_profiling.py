@@ -0,0 +1,48 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from database import engine
+from services import profiling
+
+def _app():
+    app = FastAPI()
+    app.middleware("http")(profiling.profiling_middleware)
+
+    @app.get("/slow")
+    def slow():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"total": sum(range(10000))}
+
+    profiling.instrument_routes(app)
+    return TestClient(app)
+
+def test_profile_requested_by_header(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    monkeypatch.setenv("ADMIN_ALLOW_ALL", "1")
+    monkeypatch.setitem(profiling.settings, "slow_query_ms", 0.0)
+    client = _app()
+
+    assert "X-Profile-Id" not in client.get("/slow").headers
+
+    response = client.get("/slow", headers={"X-Profile": "1"})
+    profile_id = int(response.headers["X-Profile-Id"])
+    record = next(p for p in profiling.profiles if p["id"] == profile_id)
+    assert record["route"] == "/slow" and record["status"] == 200
+    assert any("slow" in f["function"] for f in record["profile"])
+    # Every statement is over a 0 ms threshold, and gets a query plan
+    assert record["slow_queries"][0]["statement"] == "SELECT 1"
+    assert record["slow_queries"][0]["plan"] is not None
+
+def test_profile_header_requires_admin_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = _app()
+    assert "X-Profile-Id" not in client.get("/slow", headers={"X-Profile": "1"}).headers
+    assert "X-Profile-Id" in client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"}).headers
+
+def test_nobody_is_admin_without_a_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    monkeypatch.delenv("ADMIN_ALLOW_ALL", raising=False)
+    client = _app()
+    assert "X-Profile-Id" not in client.get("/slow", headers={"X-Profile": "1"}).headers
+    assert "X-Profile-Id" not in client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": ""}).headers
@@ -0,0 +1,60 @@
+import numpy as np
+from database import Paper, ProfileRecommendation, UserProfile
+from services import recommendation_service
+from services.embedding_store import EmbeddingStore, append_embeddings
+from services.profile_service import update_profile
+
+DIM = 8
+
+def _vector(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i % DIM] = 1.0
+    v[(i + 1) % DIM] = i / 100 # Breaks ties: lower ids score higher
+    return v
+
+def _embed(texts):
+    # A profile titled "topic <n>" points along axis n
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in zip(vectors, texts):
+        row[int(text.split()[1].rstrip("."))] = 1.0
+    return vectors, "test-model"
+
+def _recommended(db, profile):
+    rows = db.query(ProfileRecommendation).filter(ProfileRecommendation.profile_id == profile.id).order_by(
+        ProfileRecommendation.score.desc()).all()
+    return [r.paper_id for r in rows]
+
+def test_refresh_merges_new_papers_into_each_profiles_top_k(tmp_path, db_session):
+    db_session.add_all([Paper(id=i, title=f"paper {i}", source="arxiv") for i in range(1, 41)])
+    alice = update_profile(db_session, "Alice", "topic 1", "", user="alice")
+    bob = update_profile(db_session, "Bob", "topic 2", "", user="bob")
+
+    path = str(tmp_path / "store")
+    ids = np.arange(1, 21)
+    append_embeddings(ids, np.stack([_vector(i) for i in ids]), "test-model", path=path)
+    store = EmbeddingStore.load(path)
+    assert recommendation_service.refresh_recommendations(db_session, 0, 20, store=store, embed=_embed, k=3) == 6
+    assert _recommended(db_session, alice) == [1, 9, 17]
+    assert alice.embedding_model == "test-model"
+
+    # Only papers 21..40 are scored; the merged top-k matches scoring everything at once
+    ids = np.arange(21, 41)
+    append_embeddings(ids, np.stack([_vector(i) for i in ids]), "test-model", path=path)
+    store = EmbeddingStore.load(path)
+    recommendation_service.refresh_recommendations(db_session, 20, 40, store=store, embed=_embed, k=3)
+    assert _recommended(db_session, alice) == [1, 9, 17]
+    assert _recommended(db_session, bob) == [2, 10, 18]
+
+    # An edited profile is re-embedded and rescored against everything
+    update_profile(db_session, "Bob", "topic 3", "", user="bob")
+    recommendation_service.refresh_recommendations(db_session, 40, 40, store=store, embed=_embed, k=5)
+    assert _recommended(db_session, bob) == [3, 11, 19, 27, 35]
+    assert len(_recommended(db_session, alice)) == 3
+    db_session.close()
+
+def test_top_k_ignores_padding():
+    ids = np.array([[5, -1, 7, -1]])
+    scores = np.array([[0.2, -np.inf, 0.9, -np.inf]], dtype=np.float32)
+    best_ids, best_scores = recommendation_service.top_k(ids, scores, 2)
+    assert best_ids.tolist() == [[7, 5]]
+    assert np.allclose(best_scores, [[0.9, 0.2]])
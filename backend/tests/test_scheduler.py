@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from database import JobRun
+from services.scheduler import try_acquire_lease, release_lease, skip_runs_started_elsewhere
+
+def test_only_one_process_holds_the_lease(session_factory):
+    a, b = session_factory(), session_factory()
+
+    assert try_acquire_lease(a, owner="worker-a")
+    assert not try_acquire_lease(b, owner="worker-b")
+    assert try_acquire_lease(a, owner="worker-a") # Renewal
+
+    release_lease(a, owner="worker-a")
+    assert try_acquire_lease(b, owner="worker-b")
+
+def test_expired_lease_can_be_taken_over(session_factory):
+    a, b = session_factory(), session_factory()
+
+    assert try_acquire_lease(a, owner="worker-a", ttl=timedelta(seconds=-1))
+    assert try_acquire_lease(b, owner="worker-b")
+    assert not try_acquire_lease(a, owner="worker-a")
+
+def test_new_leader_skips_runs_the_previous_one_started(db_session):
+    sched = BackgroundScheduler(timezone=timezone.utc)
+    sched.start(paused=True)
+    try:
+        due = datetime.now(timezone.utc) - timedelta(minutes=10)
+        for job_id in ("arxiv_daily", "pubmed_daily"):
+            sched.add_job(lambda: None, CronTrigger(hour=2, timezone=timezone.utc), id=job_id, next_run_time=due)
+        # The previous leader ran the arXiv collection, but died before the PubMed one
+        db_session.add(JobRun(job_id="arxiv_daily", status="success", started_at=due.replace(tzinfo=None) + timedelta(seconds=1)))
+        db_session.commit()
+
+        assert skip_runs_started_elsewhere(db_session, sched) == 1
+        assert sched.get_job("arxiv_daily").next_run_time > datetime.now(timezone.utc)
+        assert sched.get_job("pubmed_daily").next_run_time == due
+    finally:
+        sched.shutdown(wait=False)
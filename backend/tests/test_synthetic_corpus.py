@@ -0,0 +1,24 @@
+import sqlite3
+from sqlalchemy import create_engine
+from database import Base
+from benchmarks.synthetic import populate
+
+def _corpus(path, n_papers, seed):
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    populate(str(path), n_papers, seed)
+    conn = sqlite3.connect(str(path))
+    try:
+        papers = conn.execute("SELECT id, title, published_date, categories FROM papers ORDER BY id").fetchall()
+        links = conn.execute("SELECT paper_id, author_id FROM paper_authors ORDER BY paper_id, author_id").fetchall()
+        return papers, links
+    finally:
+        conn.close()
+
+def test_synthetic_corpus_is_deterministic(tmp_path):
+    papers, links = _corpus(tmp_path / "a.db", 500, seed=7)
+    assert len(papers) == 500
+    assert {p for p, _ in links} == set(range(1, 501)) # Every paper has an author
+    assert all(1 <= a <= 250 for _, a in links)
+
+    assert _corpus(tmp_path / "b.db", 500, seed=7) == (papers, links)
+    assert _corpus(tmp_path / "c.db", 500, seed=8)[0] != papers
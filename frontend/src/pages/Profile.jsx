@@ -1,5 +1,19 @@
 import React, { useState, useEffect } from 'react';
 import { Save, Sparkles, BookOpen, GraduationCap, User } from 'lucide-react';
+import { userFetch } from '../session';
+
+// Analysis runs as a background job: poll it until it finishes
+const waitForJob = (jobId, interval = 1500) => new Promise((resolve, reject) => {
+    const poll = () => userFetch(`http://localhost:8000/api/jobs/${jobId}`)
+        .then(res => res.json())
+        .then(job => {
+            if (job.status === 'success') resolve(job.result);
+            else if (job.status === 'failed' || job.error) reject(new Error(job.error));
+            else setTimeout(poll, interval);
+        })
+        .catch(reject);
+    poll();
+});
 
 const Profile = () => {
     const [formData, setFormData] = useState({
@@ -17,7 +31,7 @@ const Profile = () => {
 
     useEffect(() => {
         setLoading(true);
-        fetch('http://localhost:8000/api/profile')
+        userFetch('http://localhost:8000/api/profile')
             .then(res => res.json())
             .then(data => {
                 setFormData({
@@ -36,7 +50,7 @@ const Profile = () => {
     }, []);
 
     const handleSave = () => {
-        fetch('http://localhost:8000/api/profile', {
+        userFetch('http://localhost:8000/api/profile', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(formData)
@@ -50,13 +64,14 @@ const Profile = () => {
         setAnalyzing(true);
 
         // First save, then analyze
-        fetch('http://localhost:8000/api/profile', {
+        userFetch('http://localhost:8000/api/profile', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(formData)
         })
-            .then(() => fetch('http://localhost:8000/api/profile/analyze', { method: 'POST' }))
+            .then(() => userFetch('http://localhost:8000/api/profile/analyze', { method: 'POST' }))
             .then(res => res.json())
+            .then(job => waitForJob(job.job_id))
             .then(data => {
                 setAnalysis({
                     trajectory: data.trajectory,
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Search, TrendingUp, Lightbulb, BookOpen, Target, Sparkles, RefreshCw, ChevronRight } from 'lucide-react';
+import { userFetch } from '../session';
 
 const Topics = () => {
     const [insights, setInsights] = useState(null);
@@ -19,9 +20,9 @@ const Topics = () => {
         setLoading(true);
         try {
             const [insightsRes, topicsRes, recommendedRes] = await Promise.all([
-                fetch('http://localhost:8000/api/research/insights'),
+                userFetch('http://localhost:8000/api/research/insights'),
                 fetch('http://localhost:8000/api/topics/clusters'),
-                fetch('http://localhost:8000/api/research/recommended')
+                userFetch('http://localhost:8000/api/research/recommended')
             ]);
 
             const insightsData = await insightsRes.json();
@@ -60,7 +61,7 @@ const Topics = () => {
     const refreshInsights = async () => {
         setRefreshingInsights(true);
         try {
-            const res = await fetch('http://localhost:8000/api/research/insights');
+            const res = await userFetch('http://localhost:8000/api/research/insights');
             const data = await res.json();
             setInsights(data);
         } catch (err) {
@@ -0,0 +1,31 @@
+// Profiles belong to a user identity issued by the API: fetch it once, keep it in
+// localStorage, and send it with every profile and research request.
+const API_URL = 'http://localhost:8000';
+const TOKEN_KEY = 'userToken';
+
+let pending = null;
+
+const userToken = () => {
+    const stored = localStorage.getItem(TOKEN_KEY);
+    if (stored) return Promise.resolve(stored);
+    // One request even when several pages ask at once
+    pending = pending || fetch(`${API_URL}/api/session`, { method: 'POST' })
+        .then(res => res.json())
+        .then(({ token }) => {
+            localStorage.setItem(TOKEN_KEY, token);
+            return token;
+        })
+        .finally(() => { pending = null; });
+    return pending;
+};
+
+export const userFetch = (url, options = {}) => userToken().then(token => fetch(url, {
+    ...options,
+    headers: { ...options.headers, 'X-User-Token': token }
+}).then(res => {
+    if (res.status === 401) {
+        // Issued under another secret: start over with a new identity
+        localStorage.removeItem(TOKEN_KEY);
+    }
+    return res;
+}));